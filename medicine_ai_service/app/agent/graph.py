@@ -1,35 +1,79 @@
 # app/agent/graph.py
 import sqlite3
+from contextlib import asynccontextmanager
 from pathlib import Path
 from langgraph.graph import START, END, StateGraph
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from app.agent.state import AgentState
-from app.agent.nodes import extract_node, plan_node, need_info_node, approval_node, execute_node, route_after_plan
-from app.db.db_config import get_sqlite_connection
+from app.agent.nodes import (
+    extract_node, plan_node, need_info_node, approval_node, execute_node, route_after_plan,
+    extract_node_async, plan_node_async,
+)
+from app.db.db_config import DB_PATH, get_sqlite_connection
 
-builder = StateGraph(AgentState)
+def build_graph(checkpointer, *, use_async: bool = False):
+    """
+    Compile the medication agent graph.
+    use_async=True wires the async LLM nodes (for ainvoke + AsyncSqliteSaver).
+    """
+    builder = StateGraph(AgentState)
 
-builder.add_node("extract", extract_node)
-builder.add_node("plan", plan_node)
-builder.add_node("need_info", need_info_node)
-builder.add_node("approval", approval_node)
-builder.add_node("execute", execute_node)
+    builder.add_node("extract", extract_node_async if use_async else extract_node)
+    builder.add_node("plan", plan_node_async if use_async else plan_node)
+    builder.add_node("need_info", need_info_node)
+    builder.add_node("approval", approval_node)
+    builder.add_node("execute", execute_node)
 
-builder.add_edge(START, "extract")
-builder.add_edge("extract", "plan")
+    builder.add_edge(START, "extract")
+    builder.add_edge("extract", "plan")
 
-builder.add_conditional_edges("plan", route_after_plan, {
-    "need_info": "need_info",
-    "approval": "approval",
-})
+    builder.add_conditional_edges("plan", route_after_plan, {
+        "need_info": "need_info",
+        "approval": "approval",
+    })
 
-builder.add_edge("need_info", "plan")
-builder.add_edge("approval", "execute")
-builder.add_edge("execute", END)
+    builder.add_edge("need_info", "plan")
+    builder.add_edge("approval", "execute")
+    builder.add_edge("execute", END)
+
+    return builder.compile(checkpointer=checkpointer)
 
 # ✅ Use centralized DB config
 conn = get_sqlite_connection()
 memory = SqliteSaver(conn)
 
-med_graph = builder.compile(checkpointer=memory)
\ No newline at end of file
+# sync graph (scripts / non-async callers)
+med_graph = build_graph(memory)
+
+def iter_plan_states():
+    """Latest state of every persisted plan (one checkpoint thread per plan_id)."""
+    try:
+        rows = conn.execute("SELECT DISTINCT thread_id FROM checkpoints").fetchall()
+    except sqlite3.OperationalError:  # no checkpoint written yet
+        return
+    for (thread_id,) in rows:
+        state = med_graph.get_state({"configurable": {"thread_id": thread_id}}).values
+        if state:
+            yield state
+
+# async graph (API routes); needs a running loop, so it's opened in the app lifespan
+_async_graph = None
+
+@asynccontextmanager
+async def async_graph_lifespan():
+    """Open the AsyncSqliteSaver on the same checkpoint DB and expose the async graph."""
+    global _async_graph
+    async with AsyncSqliteSaver.from_conn_string(str(DB_PATH)) as saver:
+        await saver.setup()
+        _async_graph = build_graph(saver, use_async=True)
+        try:
+            yield _async_graph
+        finally:
+            _async_graph = None
+
+def get_async_graph():
+    if _async_graph is None:
+        raise RuntimeError("Async graph is not initialised (app lifespan not started).")
+    return _async_graph
@@ -1,53 +1,226 @@
 # app/agent/nodes.py
-from typing import Any, Dict, List
+import asyncio
+import functools
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from langgraph.types import interrupt
 from app.agent.state import AgentState
 from app.schemas.models import Medication, Dose
-from app.services.extraction import simple_extract_meds
+from app.services.extraction import simple_extract_meds, heuristic_fastpath
 from app.services.planning import build_plan
 from app.services.tools import execute_action
-from app.core.llm_config import USE_LLM_EXTRACTION
-from app.services.llm.extraction import llm_extract_meds
+from app.core.llm_config import USE_LLM_EXTRACTION, HEURISTIC_FASTPATH_ENABLED, HEURISTIC_CONFIDENCE_THRESHOLD
+from app.services.llm.extraction import (
+    llm_extract_meds,
+    llm_extract_meds_async,
+    llm_extract_meds_chunked,
+    llm_extract_meds_chunked_async,
+    llm_extract_meds_chunked_stream,
+    merge_chunk_meds,
+    should_chunk,
+)
 from app.services.extraction import simple_extract_meds  # keep fallback
-from app.core.llm_config import USE_LLM_PLANNING
-from app.services.llm.planner import llm_build_plan
+from app.core.llm_config import USE_LLM_PLANNING, USE_LLM_FUSED
+from app.services.llm.planner import llm_build_plan, llm_build_plan_async
+from app.services.llm.fused import llm_extract_and_plan, llm_extract_and_plan_async
+from app.core.deadline import llm_timeout_s, remaining_s
+from app.core.metrics import NODE_SECONDS, HEURISTIC_PATHS, timed
+from app.services.occurrences import start_date_for
+from app.services.reminder_scheduler import REMINDERS
 
 def _audit(state: AgentState, event: str, extra: Dict[str, Any] | None = None) -> Dict[str, Any]:
     audit = list(state.get("audit") or [])
     audit.append({"event": event, **(extra or {})})
     return {"audit": audit}
 
-def extract_node(state: AgentState) -> Dict[str, Any]:
-    if state.get("meds"):
-        return _audit(state, "extract.skip", {"reason": "meds already provided"})
+def _budget_row(state: AgentState, node: str, t0: float) -> Dict[str, Any]:
+    left = remaining_s(state.get("deadline_ts"))
+    return {
+        "event": f"{node}.budget",
+        "used_ms": round((time.monotonic() - t0) * 1000.0, 1),
+        "remaining_ms": None if left is None else round(left * 1000.0, 1),
+    }
 
-    ocr = (state.get("extracted_text") or "").strip()
-    if ocr:
-        try:
-            if USE_LLM_EXTRACTION:
-                meds = llm_extract_meds(ocr)
-                return {"meds": meds, **_audit(state, "extract.llm.done", {"count": len(meds)})}
-        except Exception as e:
-            extracted = simple_extract_meds(ocr)
-            return {
-                "meds": [m.model_dump() for m in extracted],
-                **_audit(state, "extract.fallback.done", {"count": len(extracted), "error": str(e)}),
-            }
+def _with_budget(node: str, update: Dict[str, Any], state: AgentState, t0: float) -> Dict[str, Any]:
+    audit = list(update.get("audit") if "audit" in update else state.get("audit") or [])
+    audit.append(_budget_row(state, node, t0))
+    return {**update, "audit": audit}
+
+def budgeted(node: str):
+    """Append a `<node>.budget` audit row (time used, deadline budget left) to the node's update."""
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(state: AgentState) -> Dict[str, Any]:
+                t0 = time.monotonic()
+                return _with_budget(node, await fn(state), state, t0)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(state: AgentState) -> Dict[str, Any]:
+            t0 = time.monotonic()
+            return _with_budget(node, fn(state), state, t0)
+        return run
+    return wrap
+
+async def _within(coro, timeout_s):
+    # hard stop at the deadline for async calls (coalesced work keeps running for other callers)
+    return await (asyncio.wait_for(coro, timeout_s) if timeout_s else coro)
+
+def _extract_deadline_fallback(state: AgentState, ocr: str, extra: Dict[str, Any]) -> Dict[str, Any]:
+    HEURISTIC_PATHS.inc(node="extract", reason="deadline")
+    extracted = simple_extract_meds(ocr)
+    return {
+        "meds": [m.model_dump() for m in extracted],
+        **_audit(state, "extract.deadline.fallback", {"count": len(extracted), **extra}),
+    }
+
+def _extract_fallback(state: AgentState, ocr: str, e: Exception) -> Dict[str, Any]:
+    HEURISTIC_PATHS.inc(node="extract", reason="error")
+    extracted = simple_extract_meds(ocr)
+    return {
+        "meds": [m.model_dump() for m in extracted],
+        **_audit(state, "extract.fallback.done", {"count": len(extracted), "error": str(e)}),
+    }
 
+def _extract_heuristic(state: AgentState) -> Dict[str, Any]:
     # no ocr -> heuristic from input_text (optional)
     txt = state.get("input_text") or ""
     extracted = simple_extract_meds(txt)
     return {"meds": [m.model_dump() for m in extracted], **_audit(state, "extract.heuristic.done", {"count": len(extracted)})}
 
+def _extract_fastpath(state: AgentState, ocr: str):
+    """
+    Confidence-gated heuristic: returns (node update or None, audit extras).
+    The LLM is skipped only when every line clears HEURISTIC_CONFIDENCE_THRESHOLD.
+    """
+    if not HEURISTIC_FASTPATH_ENABLED:
+        return None, {}
+    meds, report = heuristic_fastpath(ocr, HEURISTIC_CONFIDENCE_THRESHOLD)
+    extra = {"heuristic_score": report["min_score"], "threshold": HEURISTIC_CONFIDENCE_THRESHOLD}
+    if meds is None:
+        return None, extra
+    HEURISTIC_PATHS.inc(node="extract", reason="fastpath")
+    return {
+        "meds": [m.model_dump() for m in meds],
+        **_audit(state, "extract.heuristic.fastpath", {"count": len(meds), **extra}),
+    }, extra
+
+def _use_fused() -> bool:
+    return USE_LLM_FUSED and USE_LLM_EXTRACTION and USE_LLM_PLANNING
 
-def plan_node(state: AgentState) -> Dict[str, Any]:
-    plan_id = state["plan_id"]
-    input_text = state.get("input_text") or ""
-    timezone = state.get("timezone") or "Asia/Kolkata"
+def _fused_update(state: AgentState, meds: List[Dict[str, Any]], plan: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "meds": meds,
+        "fused_plan": plan,
+        **_audit(state, "extract.fused.done", {"count": len(meds), "schedule_count": len(plan.get("schedule") or []), **extra}),
+    }
 
-    meds_dicts = state.get("meds") or []
-    meds = [Medication(**m) for m in meds_dicts] if meds_dicts else []
+def extract_route(state: AgentState) -> Tuple[str, Optional[Dict[str, Any]], Dict[str, Any], Optional[int]]:
+    """
+    How extract_node handles a state, decided without calling the LLM (also used by /ai/plan_stream).
+    Returns (route, update, audit extras, timeout_s):
+      "skip" / "heuristic" / "fastpath" / "deadline": update is the finished node update
+      "chunked" / "fused" / "single": update is None; the LLM call gets timeout_s
+    """
+    if state.get("meds"):
+        return "skip", _audit(state, "extract.skip", {"reason": "meds already provided"}), {}, None
 
+    ocr = (state.get("extracted_text") or "").strip()
+    if not ocr or not USE_LLM_EXTRACTION:
+        return "heuristic", _extract_heuristic(state), {}, None
+
+    fast, extra = _extract_fastpath(state, ocr)
+    if fast is not None:
+        return "fastpath", fast, extra, None
+    timeout_s = llm_timeout_s(state.get("deadline_ts"))
+    if timeout_s == 0:
+        return "deadline", _extract_deadline_fallback(state, ocr, extra), extra, 0
+    if should_chunk(ocr):
+        # long documents: med-bearing chunks in parallel (plan_node plans the merged meds)
+        return "chunked", None, extra, timeout_s
+    if _use_fused():
+        return "fused", None, extra, timeout_s
+    return "single", None, extra, timeout_s
+
+@timed(NODE_SECONDS, node="extract")
+@budgeted("extract")
+def extract_node(state: AgentState) -> Dict[str, Any]:
+    ocr = (state.get("extracted_text") or "").strip()
+    try:
+        route, update, extra, timeout_s = extract_route(state)
+        if update is not None:
+            return update
+        if route == "chunked":
+            meds = llm_extract_meds_chunked(ocr, timeout_s)
+            return {"meds": meds, **_audit(state, "extract.llm.chunked", {"count": len(meds), **extra})}
+        if route == "fused":
+            meds, plan = llm_extract_and_plan(
+                ocr, state.get("input_text") or "", state.get("timezone") or "Asia/Kolkata", timeout_s
+            )
+            return _fused_update(state, meds, plan, extra)
+        meds = llm_extract_meds(ocr, timeout_s)
+        return {"meds": meds, **_audit(state, "extract.llm.done", {"count": len(meds), **extra})}
+    except Exception as e:
+        return _extract_fallback(state, ocr, e)
+
+@timed(NODE_SECONDS, node="extract")
+@budgeted("extract")
+async def extract_node_async(state: AgentState) -> Dict[str, Any]:
+    """Same as extract_node, but awaits the LLM instead of blocking a thread."""
+    ocr = (state.get("extracted_text") or "").strip()
+    try:
+        route, update, extra, timeout_s = extract_route(state)
+        if update is not None:
+            return update
+        if route == "chunked":
+            meds = await _within(llm_extract_meds_chunked_async(ocr, timeout_s), timeout_s)
+            return {"meds": meds, **_audit(state, "extract.llm.chunked", {"count": len(meds), **extra})}
+        if route == "fused":
+            meds, plan = await _within(llm_extract_and_plan_async(
+                ocr, state.get("input_text") or "", state.get("timezone") or "Asia/Kolkata", timeout_s
+            ), timeout_s)
+            return _fused_update(state, meds, plan, extra)
+        meds = await _within(llm_extract_meds_async(ocr, timeout_s), timeout_s)
+        return {"meds": meds, **_audit(state, "extract.llm.done", {"count": len(meds), **extra})}
+    except Exception as e:
+        return _extract_fallback(state, ocr, e)
+
+async def extract_node_stream(state: AgentState) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    extract_node_async for streaming callers: the same route, but medicines are yielded as
+    ("med", med) as soon as they are known, then ("extract", node update).
+    The "fused" route is not run here: it yields ("fused", {"timeout_s", "extra"}) and the
+    caller streams the fused call itself (meds and schedule come from one prompt).
+    """
+    ocr = (state.get("extracted_text") or "").strip()
+    try:
+        route, update, extra, timeout_s = extract_route(state)
+        if route == "fused":
+            yield "fused", {"timeout_s": timeout_s, "extra": extra}
+            return
+        if update is None and route == "chunked":
+            items = []
+            async for item in llm_extract_meds_chunked_stream(ocr, timeout_s):
+                items.append(item)
+                for m in item["meds"]:
+                    yield "med", m  # per-chunk preview; the merged list below is de-duplicated
+            meds = merge_chunk_meds(items)
+            update = {"meds": meds, **_audit(state, "extract.llm.chunked", {"count": len(meds), **extra})}
+        elif update is None:
+            meds = await _within(llm_extract_meds_async(ocr, timeout_s), timeout_s)
+            for m in meds:
+                yield "med", m
+            update = {"meds": meds, **_audit(state, "extract.llm.done", {"count": len(meds), **extra})}
+        elif route != "skip":
+            for m in update.get("meds") or []:
+                yield "med", m
+    except Exception as e:
+        update = _extract_fallback(state, ocr, e)
+        yield "fallback", {"error": str(e)}
+    yield "extract", update
+
+def _plan_audit(state: AgentState):
     # ✅ local audit accumulator (prevents overwrite)
     audit = list(state.get("audit") or [])
 
@@ -57,59 +230,51 @@ def plan_node(state: AgentState) -> Dict[str, Any]:
             row.update(extra)
         audit.append(row)
 
-    # ---------------------------
-    # 1) LLM planning path (preferred)
-    # ---------------------------
-    if USE_LLM_PLANNING and meds_dicts:
-        add_audit("plan.llm.try", {"enabled": True, "meds_count": len(meds_dicts)})
-        try:
-            llm_out = llm_build_plan(meds_dicts, input_text, timezone)
-
-            schedule_llm = llm_out.get("schedule", []) or []
-            precautions = llm_out.get("precautions", []) or []
-            why = llm_out.get("why", []) or []
-            actions = llm_out.get("actions", []) or []
-
-            needs_info = bool(llm_out.get("needs_info", False))
-            questions: List[str] = list(llm_out.get("questions", []) or [])
-
-            if meds_dicts and len(schedule_llm) == 0:
-                needs_info = True
-                if not questions:
-                    questions.append(
-                        "I couldn't create reminder times. Confirm frequency (OD/BID/TID) for each medicine."
-                    )
-
-            plan = {
-                "plan_id": plan_id,
-                "status": "PROPOSED",
-                "schedule": schedule_llm,
-                "precautions": precautions,
-                "why": why,
-                "actions": actions,
-            }
-
-            next_step = "NEED_INFO" if needs_info else "NEED_APPROVAL"
-            add_audit("plan.llm.done", {"needs_info": needs_info, "schedule_count": len(schedule_llm)})
-
-            return {
-                "plan": plan,
-                "needs_info": needs_info,
-                "questions": questions,
-                "next_step": next_step,
-                "audit": audit,
-            }
+    return audit, add_audit
 
-        except Exception as e:
-            add_audit("plan.llm.error", {"error": str(e)})
-            # fall through to heuristic
+def _plan_from_llm(state: AgentState, llm_out: Dict[str, Any], audit: List[Dict[str, Any]], add_audit) -> Dict[str, Any]:
+    meds_dicts = state.get("meds") or []
 
-    else:
-        add_audit("plan.llm.skip", {"enabled": USE_LLM_PLANNING, "meds_count": len(meds_dicts)})
+    schedule_llm = llm_out.get("schedule", []) or []
+    precautions = llm_out.get("precautions", []) or []
+    why = llm_out.get("why", []) or []
+    actions = llm_out.get("actions", []) or []
+
+    needs_info = bool(llm_out.get("needs_info", False))
+    questions: List[str] = list(llm_out.get("questions", []) or [])
+
+    if meds_dicts and len(schedule_llm) == 0:
+        needs_info = True
+        if not questions:
+            questions.append(
+                "I couldn't create reminder times. Confirm frequency (OD/BID/TID) for each medicine."
+            )
+
+    plan = {
+        "plan_id": state["plan_id"],
+        "status": "PROPOSED",
+        "schedule": schedule_llm,
+        "precautions": precautions,
+        "why": why,
+        "actions": actions,
+    }
+
+    next_step = "NEED_INFO" if needs_info else "NEED_APPROVAL"
+    add_audit("plan.llm.done", {"needs_info": needs_info, "schedule_count": len(schedule_llm)})
+
+    return {
+        "plan": plan,
+        "needs_info": needs_info,
+        "questions": questions,
+        "next_step": next_step,
+        "audit": audit,
+    }
+
+def _plan_heuristic(state: AgentState, audit: List[Dict[str, Any]], add_audit) -> Dict[str, Any]:
+    input_text = state.get("input_text") or ""
+    meds_dicts = state.get("meds") or []
+    meds = [Medication(**m) for m in meds_dicts] if meds_dicts else []
 
-    # ---------------------------
-    # 2) Heuristic planning fallback
-    # ---------------------------
     schedule, precautions, why, actions = build_plan(meds, input_text) if meds else (
         [],
         [
@@ -128,7 +293,7 @@ def plan_node(state: AgentState) -> Dict[str, Any]:
         questions.append("I found medicines but couldn't create reminder times. Confirm frequency and timing.")
 
     plan = {
-        "plan_id": plan_id,
+        "plan_id": state["plan_id"],
         "status": "PROPOSED",
         "schedule": [d.model_dump() for d in schedule],
         "precautions": precautions,
@@ -147,6 +312,80 @@ def plan_node(state: AgentState) -> Dict[str, Any]:
         "audit": audit,
     }
 
+def _consume_fused_plan(state: AgentState, add_audit) -> Dict[str, Any] | None:
+    # plan already produced by the fused extract+plan call: no second LLM round trip
+    fused = state.get("fused_plan")
+    if not fused or not state.get("meds"):
+        return None
+    add_audit("plan.fused.used", {"meds_count": len(state.get("meds") or [])})
+    return fused
+
+@timed(NODE_SECONDS, node="plan")
+@budgeted("plan")
+def plan_node(state: AgentState) -> Dict[str, Any]:
+    input_text = state.get("input_text") or ""
+    timezone = state.get("timezone") or "Asia/Kolkata"
+    meds_dicts = state.get("meds") or []
+    audit, add_audit = _plan_audit(state)
+
+    fused = _consume_fused_plan(state, add_audit)
+    if fused is not None:
+        return {**_plan_from_llm(state, fused, audit, add_audit), "fused_plan": None}
+
+    # ---------------------------
+    # 1) LLM planning path (preferred)
+    # ---------------------------
+    timeout_s = llm_timeout_s(state.get("deadline_ts"))
+    if USE_LLM_PLANNING and meds_dicts and timeout_s == 0:
+        add_audit("plan.llm.skip", {"reason": "deadline", "meds_count": len(meds_dicts)})
+        HEURISTIC_PATHS.inc(node="plan", reason="deadline")
+    elif USE_LLM_PLANNING and meds_dicts:
+        add_audit("plan.llm.try", {"enabled": True, "meds_count": len(meds_dicts), "timeout_s": timeout_s})
+        try:
+            llm_out = llm_build_plan(meds_dicts, input_text, timezone, timeout_s)
+            return _plan_from_llm(state, llm_out, audit, add_audit)
+        except Exception as e:
+            add_audit("plan.llm.error", {"error": str(e)})
+            HEURISTIC_PATHS.inc(node="plan", reason="error")
+            # fall through to heuristic
+    else:
+        add_audit("plan.llm.skip", {"enabled": USE_LLM_PLANNING, "meds_count": len(meds_dicts)})
+
+    # ---------------------------
+    # 2) Heuristic planning fallback
+    # ---------------------------
+    return _plan_heuristic(state, audit, add_audit)
+
+@timed(NODE_SECONDS, node="plan")
+@budgeted("plan")
+async def plan_node_async(state: AgentState) -> Dict[str, Any]:
+    """Same as plan_node, but awaits the LLM instead of blocking a thread."""
+    input_text = state.get("input_text") or ""
+    timezone = state.get("timezone") or "Asia/Kolkata"
+    meds_dicts = state.get("meds") or []
+    audit, add_audit = _plan_audit(state)
+
+    fused = _consume_fused_plan(state, add_audit)
+    if fused is not None:
+        return {**_plan_from_llm(state, fused, audit, add_audit), "fused_plan": None}
+
+    timeout_s = llm_timeout_s(state.get("deadline_ts"))
+    if USE_LLM_PLANNING and meds_dicts and timeout_s == 0:
+        add_audit("plan.llm.skip", {"reason": "deadline", "meds_count": len(meds_dicts)})
+        HEURISTIC_PATHS.inc(node="plan", reason="deadline")
+    elif USE_LLM_PLANNING and meds_dicts:
+        add_audit("plan.llm.try", {"enabled": True, "meds_count": len(meds_dicts), "timeout_s": timeout_s})
+        try:
+            llm_out = await _within(llm_build_plan_async(meds_dicts, input_text, timezone, timeout_s), timeout_s)
+            return _plan_from_llm(state, llm_out, audit, add_audit)
+        except Exception as e:
+            add_audit("plan.llm.error", {"error": str(e)})
+            HEURISTIC_PATHS.inc(node="plan", reason="error")
+    else:
+        add_audit("plan.llm.skip", {"enabled": USE_LLM_PLANNING, "meds_count": len(meds_dicts)})
+
+    return _plan_heuristic(state, audit, add_audit)
+
 def route_after_plan(state: AgentState) -> str:
     # conditional edge target
     return "need_info" if state.get("needs_info") else "approval"
@@ -194,6 +433,7 @@ def approval_node(state: AgentState) -> Dict[str, Any]:
     resume_value = interrupt(payload)  # approval payload via Command(resume=...) :contentReference[oaicite:5]{index=5}
     return {"approval": resume_value, **_audit(state, "approval.resumed")}
 
+@timed(NODE_SECONDS, node="execute")
 def execute_node(state: AgentState) -> Dict[str, Any]:
     plan = state["plan"]
     approval = state.get("approval") or {}
@@ -220,10 +460,16 @@ def execute_node(state: AgentState) -> Dict[str, Any]:
         ).model_dump()
 
     plan["status"] = "APPROVED"
+    # day 0 for occurrence expansion (app.services.occurrences)
+    plan.setdefault("start_date", start_date_for(state).isoformat())
+
+    reminded = 0
+    if (executed.get("CREATE_REMINDERS") or {}).get("ok"):
+        reminded = REMINDERS.schedule_plan(plan["plan_id"], schedule, plan["start_date"], state.get("timezone"))
 
     return {
         "plan": plan,
         "executed": executed,
         "next_step": "DONE",  # ✅ this is correct
-        **_audit(state, "execute.done", {"executed": list(executed.keys())}),
+        **_audit(state, "execute.done", {"executed": list(executed.keys()), "reminders_indexed": reminded}),
     }
\ No newline at end of file
@@ -9,6 +9,10 @@ class AgentState(TypedDict, total=False):
     input_text: str
     extracted_text: str
     meds: List[Dict[str, Any]]
+    # sanitized plan produced by the fused extract+plan call (consumed by plan_node)
+    fused_plan: Optional[Dict[str, Any]]
+    # absolute request deadline (epoch seconds); None = unbounded
+    deadline_ts: Optional[float]
 
     # outputs
     plan: Dict[str, Any]
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException
-from app.agent.graph import med_graph
+from app.agent.graph import get_async_graph
 from app.schemas.models import AdherenceMarkRequest, AdherenceEvent, AdherenceSummary
 from app.services.adherence_store import append_event, list_events
 from app.services.tools import mock_send_alert
@@ -20,8 +20,8 @@ def _delay_minutes(action_time_iso: str, scheduled_hhmm: str):
         return None
 
 @router.post("/mark", response_model=AdherenceEvent)
-def mark(req: AdherenceMarkRequest):
-    snap = med_graph.get_state(_config(req.plan_id))
+async def mark(req: AdherenceMarkRequest):
+    snap = await get_async_graph().aget_state(_config(req.plan_id))
     state = snap.values or {}
     plan = (state.get("plan") or {})
     schedule = plan.get("schedule", [])
@@ -50,7 +50,7 @@ def mark(req: AdherenceMarkRequest):
     return ev
 
 @router.get("/summary", response_model=AdherenceSummary)
-def summary(plan_id: str, days: int = 7):
+async def summary(plan_id: str, days: int = 7):
     cutoff = datetime.utcnow() - timedelta(days=days)
     events = []
     for e in list_events():
@@ -1,20 +1,44 @@
 # app/api/routes_ai.py
+import asyncio
+import json
 import uuid
 import os
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
 from langgraph.types import Command
-from app.agent.graph import med_graph
+from app.agent.graph import get_async_graph
+from app.agent.nodes import extract_node_stream
 from app.schemas.models import (
     PlanRequest, PlanResponse,
     ApproveRequest, ApproveResponse,
     QueryRequest, QueryResponse,
     Dose, ToolResult, Medication
 )
-from app.schemas.models import PlanTextRequest
-from app.services.llm.extraction import llm_extract_meds
-from app.core.llm_config import USE_LLM_EXTRACTION
+from app.schemas.models import PlanTextRequest, ExtractBatchRequest
+from app.schemas.models import ApproveEdits, FacilityRoundsRequest, FacilityRoundsResponse
+from app.services.llm.extraction import llm_extract_meds_async, llm_extract_meds_batch
+from app.core.llm_config import (
+    USE_LLM_EXTRACTION,
+    USE_LLM_PLANNING,
+    EXTRACT_BATCH_MAX_ITEMS,
+    FACILITY_ROUNDS_MAX_PLANS,
+    HEURISTIC_FASTPATH_ENABLED,
+    HEURISTIC_CONFIDENCE_THRESHOLD,
+)
+from app.services.extraction import heuristic_fastpath
+from app.services.llm.streaming import stream_plan_events
+from app.services.facility_rounds import optimize_rounds
+from app.services.reminder_scheduler import REMINDERS
+from fastapi.responses import StreamingResponse
 from fastapi import Depends
 from app.services.security import verify_internal_service
+from app.services.hf_client import hf_client_pool_stats, hf_usage_stats
+from app.services.llm.cache import EXTRACT_CACHE, PLAN_CACHE
+from app.services.llm.singleflight import HF_FLIGHT, OLLAMA_FLIGHT, EXTRACT_FLIGHT, PLAN_FLIGHT
+from app.services.llm.capabilities import CAPABILITIES
+from app.services.llm.routing import ROUTER
+from app.services.llm.backends import backends_stats
+from app.services.llm.cassette import CASSETTES
+from app.core.deadline import DEADLINE_HEADER, request_deadline, llm_timeout_s
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
@@ -23,8 +47,8 @@ router = APIRouter(prefix="/ai", tags=["ai"])
 def _config(plan_id: str):
     return {"configurable": {"thread_id": plan_id}}
 
-def _current_plan_response(plan_id: str):
-    snap = med_graph.get_state(_config(plan_id))
+async def _current_plan_response(plan_id: str):
+    snap = await get_async_graph().aget_state(_config(plan_id))
     state = snap.values or {}
     plan = state.get("plan") or {}
     return snap, state, plan
@@ -53,11 +77,22 @@ def _pending_interrupt_type(snap):
     return payload.get("type") if isinstance(payload, dict) else None
 
 @router.post("/plan_text", response_model=PlanResponse)
-def ai_plan_text(req: PlanTextRequest):
+async def ai_plan_text(
+    req: PlanTextRequest,
+    deadline_ms: Optional[int] = Header(default=None, alias=DEADLINE_HEADER),
+):
+    deadline_ts = request_deadline(deadline_ms)
+
     # 1) Convert plain text -> meds[]
     meds = []
     if USE_LLM_EXTRACTION and req.free_text.strip():
-        meds = llm_extract_meds(req.free_text)
+        fast = heuristic_fastpath(req.free_text, HEURISTIC_CONFIDENCE_THRESHOLD)[0] if HEURISTIC_FASTPATH_ENABLED else None
+        timeout_s = llm_timeout_s(deadline_ts)
+        if fast is not None:
+            meds = [m.model_dump() for m in fast]
+        elif timeout_s != 0:
+            # out of budget -> leave meds empty; extract_node falls back to the heuristic on input_text
+            meds = await llm_extract_meds_async(req.free_text, timeout_s)
 
     # 2) Reuse the same graph invoke as /ai/plan
     #    (Important: pass meds directly so extract_node can skip)
@@ -72,10 +107,11 @@ def ai_plan_text(req: PlanTextRequest):
         "input_text": req.free_text,      # keep original text for context
         "extracted_text": "",             # not OCR
         "meds": meds or None,
+        "deadline_ts": deadline_ts,
         "audit": [],
     }
 
-    result = med_graph.invoke(initial_state, config=_config(plan_id))
+    result = await get_async_graph().ainvoke(initial_state, config=_config(plan_id))
 
     plan = result.get("plan")
     if not plan:
@@ -95,8 +131,30 @@ def ai_plan_text(req: PlanTextRequest):
         questions=result.get("questions", []) or [],
     )
 
+@router.post("/extract_batch")
+async def ai_extract_batch(req: ExtractBatchRequest):
+    """
+    Bulk extraction. Streams NDJSON, one line per text as soon as it completes:
+    {"index", "source": "llm"|"heuristic", "meds", "error", "elapsed_ms"}
+    """
+    if not req.texts:
+        raise HTTPException(status_code=400, detail="Provide at least one text.")
+    if len(req.texts) > EXTRACT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {EXTRACT_BATCH_MAX_ITEMS} texts per batch.")
+
+    async def ndjson():
+        async for item in llm_extract_meds_batch(
+            req.texts, concurrency=req.concurrency, item_timeout_s=req.item_timeout_s
+        ):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 @router.post("/plan", response_model=PlanResponse)
-def ai_plan(req: PlanRequest):
+async def ai_plan(
+    req: PlanRequest,
+    deadline_ms: Optional[int] = Header(default=None, alias=DEADLINE_HEADER),
+):
     plan_id = "plan_" + uuid.uuid4().hex
 
     initial_state = {
@@ -107,10 +165,11 @@ def ai_plan(req: PlanRequest):
         "input_text": req.input_text or "",
         "extracted_text": req.extracted_text or "",
         "meds": [m.model_dump() for m in (req.meds or [])] or None,
+        "deadline_ts": request_deadline(deadline_ms),
         "audit": [],
     }
 
-    result = med_graph.invoke(initial_state, config=_config(plan_id))
+    result = await get_async_graph().ainvoke(initial_state, config=_config(plan_id))
 
     plan = result.get("plan")
     if not plan:
@@ -130,9 +189,104 @@ def ai_plan(req: PlanRequest):
         questions=result.get("questions", []),
     )
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/plan_stream")
+async def ai_plan_stream(
+    req: PlanRequest,
+    deadline_ms: Optional[int] = Header(default=None, alias=DEADLINE_HEADER),
+):
+    """
+    SSE variant of /ai/plan. Events:
+      start          {"plan_id"}
+      med            one extracted medicine, as soon as it is known (OCR/text input)
+      schedule_item  one raw schedule entry, as soon as it is parseable
+      fallback       an LLM step failed; the graph falls back as usual
+      plan           final, fully sanitized PlanResponse (same as /ai/plan)
+    Extraction takes the same route as /ai/plan (extract_route: fast path, chunked,
+    fused or single-shot), so both endpoints extract the same input the same way.
+    """
+    plan_id = "plan_" + uuid.uuid4().hex
+    meds_in = [m.model_dump() for m in (req.meds or [])] or None
+
+    initial_state = {
+        "plan_id": plan_id,
+        "patient_id": req.patient_id,
+        "actor_role": req.actor_role,
+        "timezone": req.timezone,
+        "input_text": req.input_text or "",
+        "extracted_text": req.extracted_text or "",
+        "meds": meds_in,
+        "deadline_ts": request_deadline(deadline_ms),
+        "audit": [],
+    }
+
+    async def plan_events(meds, text, timeout_s):
+        try:
+            async for kind, data in stream_plan_events(
+                meds=meds, text=text, input_text=req.input_text or "", timezone=req.timezone, timeout_s=timeout_s,
+            ):
+                if kind == "llm_done":
+                    # hand the sanitized result to the graph (extract skips, plan consumes fused_plan)
+                    initial_state["meds"] = data["meds"] or None
+                    initial_state["fused_plan"] = data["plan"]
+                else:
+                    yield _sse(kind, data)
+        except Exception as e:
+            yield _sse("fallback", {"error": str(e)})
+
+    async def events():
+        yield _sse("start", {"plan_id": plan_id})
+
+        fused = None
+        async for kind, data in extract_node_stream(initial_state):
+            if kind == "fused":
+                fused = data
+            elif kind == "extract":
+                # the graph's extract node then skips (or redoes the same route if nothing was found)
+                initial_state.update(data)
+                initial_state["meds"] = data.get("meds") or initial_state["meds"]
+            else:
+                yield _sse(kind, data)
+
+        if fused is not None:
+            # fused route: one streamed call yields the meds and the schedule
+            async for ev in plan_events(None, (req.extracted_text or "").strip(), fused["timeout_s"]):
+                yield ev
+        elif USE_LLM_PLANNING and initial_state["meds"]:
+            timeout_s = llm_timeout_s(initial_state["deadline_ts"])
+            if timeout_s != 0:
+                async for ev in plan_events(initial_state["meds"], "", timeout_s):
+                    yield ev
+
+        result = await get_async_graph().ainvoke(initial_state, config=_config(plan_id))
+        plan = result.get("plan") or {}
+        itype = _interrupt_type(result)
+        resp = PlanResponse(
+            plan_id=plan_id,
+            status=plan.get("status", "PROPOSED"),
+            schedule=[Dose(**d) for d in plan.get("schedule", [])],
+            precautions=plan.get("precautions", []),
+            why=plan.get("why", []),
+            actions=plan.get("actions", []),
+            next_step="NEED_INFO" if itype == "NEED_INFO" else "NEED_APPROVAL",
+            questions=result.get("questions", []),
+        )
+        yield _sse("plan", resp.model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/continue", response_model=PlanResponse)
-def ai_continue(req: ContinueRequest):
-    snap, state, plan = _current_plan_response(req.plan_id)
+async def ai_continue(
+    req: ContinueRequest,
+    deadline_ms: Optional[int] = Header(default=None, alias=DEADLINE_HEADER),
+):
+    snap, state, plan = await _current_plan_response(req.plan_id)
     if not plan:
         raise HTTPException(status_code=404, detail="plan_id not found")
 
@@ -176,7 +330,11 @@ def ai_continue(req: ContinueRequest):
     if req.extracted_text:
         resume_payload["extracted_text"] = req.extracted_text
 
-    result = med_graph.invoke(Command(resume=resume_payload), config=_config(req.plan_id))
+    # fresh budget for this request (the stored deadline belongs to the original /ai/plan call)
+    result = await get_async_graph().ainvoke(
+        Command(resume=resume_payload, update={"deadline_ts": request_deadline(deadline_ms)}),
+        config=_config(req.plan_id),
+    )
 
     plan2 = result.get("plan") or {}
     if not plan2:
@@ -197,7 +355,7 @@ def ai_continue(req: ContinueRequest):
     )
 
 @router.post("/approve", response_model=ApproveResponse)
-def ai_approve(
+async def ai_approve(
     req: ApproveRequest,
     _ = Depends(verify_internal_service)
 ):
@@ -210,7 +368,7 @@ def ai_approve(
 
     plan_id = req.plan_id
 
-    snap, state, plan = _current_plan_response(plan_id)
+    snap, state, plan = await _current_plan_response(plan_id)
     itype = _pending_interrupt_type(snap)
 
     if itype != "APPROVAL_REQUIRED":
@@ -225,7 +383,7 @@ def ai_approve(
         "edits": (req.edits.model_dump() if req.edits else {}),
     }
 
-    final_state = med_graph.invoke(
+    final_state = await get_async_graph().ainvoke(
         Command(resume=resume_payload),
         config=_config(plan_id)
     )
@@ -250,14 +408,77 @@ def ai_approve(
 
     return ApproveResponse(plan=plan_resp, executed=executed)
 
+@router.post("/facility/rounds", response_model=FacilityRoundsResponse)
+async def ai_facility_rounds(
+    req: FacilityRoundsRequest,
+    _ = Depends(verify_internal_service),
+):
+    """
+    Proposes dose-time edits across many residents' plans so no medication round
+    exceeds capacity_per_slot. PROPOSED plans get edits (apply via /ai/approve);
+    APPROVED plans stay as they are but count toward each slot's load.
+    """
+    plan_ids = list(dict.fromkeys(req.plan_ids))
+    if not plan_ids:
+        raise HTTPException(status_code=400, detail="Provide at least one plan_id.")
+    if len(plan_ids) > FACILITY_ROUNDS_MAX_PLANS:
+        raise HTTPException(status_code=413, detail=f"At most {FACILITY_ROUNDS_MAX_PLANS} plans per request.")
+
+    snaps = await asyncio.gather(*(get_async_graph().aget_state(_config(pid)) for pid in plan_ids))
+    plans, missing = [], []
+    for pid, snap in zip(plan_ids, snaps):
+        state = snap.values or {}
+        plan = state.get("plan") or {}
+        status = plan.get("status")
+        if not plan.get("schedule") or status == "REJECTED":
+            missing.append(pid)
+            continue
+        plans.append({
+            "plan_id": pid,
+            "patient_id": state.get("patient_id") or pid,
+            "schedule": plan["schedule"],
+            "fixed": status != "PROPOSED",
+        })
+
+    try:
+        result = optimize_rounds(
+            plans,
+            capacity_per_slot=req.capacity_per_slot,
+            slot_minutes=req.slot_minutes,
+            slot_capacity=req.slot_capacity,
+            patient_spacing_minutes=req.patient_spacing_minutes,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid slot_capacity: {e}")
+
+    return FacilityRoundsResponse(
+        edits={pid: ApproveEdits(dose_time_overrides=o) for pid, o in result["dose_time_overrides"].items()},
+        unplaced=result["unplaced"],
+        slot_load=result["slot_load"],
+        missing_plan_ids=missing,
+        doses=result["doses"],
+        moved=result["moved"],
+        elapsed_ms=result["elapsed_ms"],
+    )
+
+@router.get("/reminders/upcoming")
+def ai_reminders_upcoming(
+    within_s: float = 60.0,
+    limit: int = 1000,
+    _ = Depends(verify_internal_service),
+):
+    """Doses due across all approved plans in the next within_s seconds (from the in-process scheduler)."""
+    due = REMINDERS.upcoming(within_s=max(0.0, within_s), limit=max(1, min(limit, 10000)))
+    return {"due": [r._asdict() for r in due], "scheduler": REMINDERS.stats()}
+
 @router.get("/audit")
-def ai_audit(plan_id: str):
-    snap = med_graph.get_state(_config(plan_id))  # persistence via thread_id :contentReference[oaicite:7]{index=7}
+async def ai_audit(plan_id: str):
+    snap = await get_async_graph().aget_state(_config(plan_id))  # persistence via thread_id :contentReference[oaicite:7]{index=7}
     return {"plan_id": plan_id, "audit": (snap.values or {}).get("audit", [])}
 
 @router.get("/debug_state")
-def debug_state(plan_id: str):
-    snap = med_graph.get_state(_config(plan_id))
+async def debug_state(plan_id: str):
+    snap = await get_async_graph().aget_state(_config(plan_id))
     return {
         "interrupt_type": _pending_interrupt_type(snap),
         "state_keys": list((snap.values or {}).keys()),
@@ -266,6 +487,20 @@ def debug_state(plan_id: str):
 
 # in any router
 import os
+@router.get("/debug_llm")
+def debug_llm():
+    return {
+        "hf_clients": hf_client_pool_stats(),
+        "extract_cache": EXTRACT_CACHE.stats(),
+        "plan_cache": PLAN_CACHE.stats(),
+        "singleflight": [f.stats() for f in (HF_FLIGHT, OLLAMA_FLIGHT, EXTRACT_FLIGHT, PLAN_FLIGHT)],
+        "capabilities": CAPABILITIES.stats(),
+        "routing": ROUTER.stats(),
+        "usage": hf_usage_stats(),
+        "backends": backends_stats(),
+        "cassettes": CASSETTES.stats(),
+    }
+
 @router.get("/debug_hf")
 def debug_hf():
     import os
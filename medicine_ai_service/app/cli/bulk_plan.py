@@ -0,0 +1,352 @@
+# app/cli/bulk_plan.py
+"""
+Offline bulk re-planning: prescriptions in, one plan per prescription out,
+without the HTTP API, the graph or checkpoint writes.
+
+    cd medicine_ai_service
+    python -m app.cli.bulk_plan rx.jsonl --out plans.jsonl [--extract llm] [--plan llm] [--workers 8]
+    python -m app.cli.bulk_plan rx.csv --out plans_parquet/ --format parquet
+
+Input: JSONL or CSV rows with "text" (or "extracted_text"), optional "id",
+"patient_id", "input_text", "timezone".
+
+Pipeline per batch: LLM extraction/planning (--extract llm / --plan llm) runs
+in an async pool of --llm-concurrency calls; heuristic extraction,
+sanitize_extracted_meds, build_plan/sanitize_plan_output and
+resolve_time_conflicts run in a pool of --workers processes.
+
+Output: JSONL (one line per plan) or a directory of Parquet part files.
+Progress is checkpointed in <out>.progress.json after every batch; rerunning
+the same command resumes after the last completed batch (--restart starts over).
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.env import load_env
+
+load_env()
+
+from app.schemas.models import Medication  # noqa: E402
+from app.services.extraction import simple_extract_meds  # noqa: E402
+from app.services.planning import build_plan  # noqa: E402
+from app.services.llm.extraction import llm_extract_meds_batch  # noqa: E402
+from app.services.llm.extraction_sanitize import sanitize_extracted_meds  # noqa: E402
+from app.services.llm.planner import llm_plan_raw_async  # noqa: E402
+from app.services.llm.sanitize import sanitize_plan_output  # noqa: E402
+from app.utils.time_conflict import resolve_time_conflicts  # noqa: E402
+
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+# ---------------------------
+# input
+# ---------------------------
+def iter_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            raw_rows: Iterator[Dict[str, Any]] = csv.DictReader(f)
+        else:
+            raw_rows = (json.loads(line) for line in f if line.strip())
+        for i, row in enumerate(raw_rows):
+            yield {
+                "id": row.get("id") or i,
+                "patient_id": row.get("patient_id") or "",
+                "text": row.get("text") or row.get("extracted_text") or "",
+                "input_text": row.get("input_text") or "",
+                "timezone": row.get("timezone") or DEFAULT_TIMEZONE,
+            }
+
+# ---------------------------
+# CPU-bound part (runs in worker processes)
+# ---------------------------
+def _heuristic_plan(meds: List[Dict[str, Any]], input_text: str) -> Dict[str, Any]:
+    """Same outcome as plan_node's heuristic path, plus time-conflict resolution."""
+    schedule, precautions, why, actions = build_plan([Medication(**m) for m in meds], input_text)
+    questions: List[str] = []
+    if not meds:
+        questions.append("Please add at least one medicine with frequency (OD/BID/TID).")
+    elif not schedule:
+        questions.append("I found medicines but couldn't create reminder times. Confirm frequency and timing.")
+    return {
+        "needs_info": not meds or not schedule,
+        "questions": questions,
+        "schedule": resolve_time_conflicts([d.model_dump() for d in schedule], step_minutes=10),
+        "precautions": precautions,
+        "why": why,
+        "actions": [a.model_dump() for a in actions],
+    }
+
+def plan_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One prescription -> output record. item may carry LLM results from the async stage:
+    "meds" (sanitized extraction) and "raw_plan" (unsanitized LLM plan).
+    """
+    t0 = time.perf_counter()
+    meds = item.get("meds")
+    if meds is None:
+        meds = [m.model_dump() for m in simple_extract_meds(item["text"])]
+    meds = sanitize_extracted_meds({"meds": meds})
+
+    raw_plan = item.get("raw_plan")
+    if raw_plan is not None:
+        plan = sanitize_plan_output(raw_plan, meds)
+    else:
+        plan = _heuristic_plan(meds, item["input_text"])
+
+    return {
+        "id": item["id"],
+        "patient_id": item["patient_id"],
+        "meds": meds,
+        **plan,
+        "extract_source": item.get("extract_source", "heuristic"),
+        "plan_source": "llm" if raw_plan is not None else "heuristic",
+        "errors": item.get("errors") or [],
+        "cpu_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+# ---------------------------
+# LLM part (async pool)
+# ---------------------------
+async def _llm_extract(batch: List[Dict[str, Any]], concurrency: int) -> None:
+    async for res in llm_extract_meds_batch([it["text"] for it in batch], concurrency=concurrency):
+        it = batch[res["index"]]
+        it["meds"] = res["meds"]
+        it["extract_source"] = res["source"]
+        if res["error"]:
+            it["errors"].append(f"extract: {res['error']}")
+
+async def _llm_plan(batch: List[Dict[str, Any]], concurrency: int) -> None:
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(it: Dict[str, Any]) -> None:
+        meds = it.get("meds")
+        if meds is None:
+            meds = it["meds"] = [m.model_dump() for m in simple_extract_meds(it["text"])]
+        meds = it["meds"] = sanitize_extracted_meds({"meds": meds})
+        if not meds:
+            return
+        async with sem:
+            try:
+                it["raw_plan"] = await llm_plan_raw_async(meds, it["input_text"], it["timezone"])
+            except Exception as e:
+                it["errors"].append(f"plan: {e}")  # heuristic plan in the worker
+
+    await asyncio.gather(*(one(it) for it in batch))
+
+# ---------------------------
+# output + checkpoint
+# ---------------------------
+class JsonlSink:
+    def __init__(self, path: Path, resume_bytes: int):
+        self.path = path
+        mode = "r+b" if resume_bytes and path.exists() else "wb"
+        self._f = path.open(mode)
+        # drop whatever a crashed run wrote after its last checkpoint
+        self._f.truncate(resume_bytes if mode == "r+b" else 0)
+        self._f.seek(0, os.SEEK_END)
+
+    def write(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self._f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {"out_bytes": self._f.tell()}
+
+    def close(self) -> None:
+        self._f.close()
+
+class ParquetSink:
+    """One part file per batch; nested fields are stored as JSON strings."""
+
+    def __init__(self, path: Path, resume_parts: int):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)") from e
+        self.path = path
+        path.mkdir(parents=True, exist_ok=True)
+        self.parts = resume_parts
+        for stale in path.glob("part-*.parquet"):
+            if int(stale.stem.split("-")[1]) >= resume_parts:
+                stale.unlink()
+
+    def write(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        import pandas as pd
+
+        rows = [{
+            "id": str(r["id"]),
+            "patient_id": r["patient_id"],
+            "needs_info": r["needs_info"],
+            "extract_source": r["extract_source"],
+            "plan_source": r["plan_source"],
+            "dose_count": len(r["schedule"]),
+            **{k: json.dumps(r[k], ensure_ascii=False) for k in ("meds", "schedule", "questions", "precautions", "why", "actions", "errors")},
+        } for r in records]
+        tmp = self.path / f".part-{self.parts:05d}.parquet.tmp"
+        pd.DataFrame(rows).to_parquet(tmp, index=False)
+        os.replace(tmp, self.path / f"part-{self.parts:05d}.parquet")
+        self.parts += 1
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        pass
+
+def _progress_path(out: Path) -> Path:
+    return out.with_name(out.name + ".progress.json")
+
+def _load_progress(out: Path, run_key: Dict[str, Any]) -> Dict[str, Any]:
+    p = _progress_path(out)
+    if not p.exists():
+        return {}
+    progress = json.loads(p.read_text(encoding="utf-8"))
+    if progress.get("run") != run_key:
+        raise SystemExit(f"{p} belongs to a different run ({progress.get('run')}); pass --restart to start over")
+    return progress
+
+def _save_progress(out: Path, progress: Dict[str, Any]) -> None:
+    p = _progress_path(out)
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_text(json.dumps(progress), encoding="utf-8")
+    os.replace(tmp, p)
+
+# ---------------------------
+# driver
+# ---------------------------
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+async def run_pipeline(
+    rows: Iterator[Dict[str, Any]],
+    *,
+    extract: str = "heuristic",
+    plan: str = "heuristic",
+    workers: int = os.cpu_count() or 1,
+    llm_concurrency: int = 16,
+    batch_size: int = 512,
+    sink: Optional[Any] = None,
+    on_batch: Optional[Any] = None,
+) -> Dict[str, Any]:
+    """
+    Plans every row; returns {"rows", "elapsed_s", "plans_per_s", "llm_s", "cpu_s"}.
+    Each finished batch goes to sink.write(records) and then on_batch(rows_in_batch, sink_state).
+    workers <= 1 runs the CPU stage inline (no process pool).
+    """
+    loop = asyncio.get_running_loop()
+    pool: Optional[Executor] = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    stats = {"rows": 0, "llm_s": 0.0, "cpu_s": 0.0, "extract_llm": 0, "plan_llm": 0, "errors": 0}
+    t_start = time.perf_counter()
+    try:
+        for batch in _batches(rows, batch_size):
+            for it in batch:
+                it["errors"] = []
+
+            t0 = time.perf_counter()
+            if extract == "llm":
+                await _llm_extract(batch, llm_concurrency)
+            if plan == "llm":
+                await _llm_plan(batch, llm_concurrency)
+            t1 = time.perf_counter()
+
+            if pool is None:
+                records = [plan_row(it) for it in batch]
+            else:
+                chunk = max(1, len(batch) // (workers * 4))
+                records = await loop.run_in_executor(None, lambda: list(pool.map(plan_row, batch, chunksize=chunk)))
+            t2 = time.perf_counter()
+
+            state = sink.write(records) if sink is not None else {}
+            stats["rows"] += len(records)
+            stats["llm_s"] += t1 - t0
+            stats["cpu_s"] += t2 - t1
+            stats["extract_llm"] += sum(1 for r in records if r["extract_source"] == "llm")
+            stats["plan_llm"] += sum(1 for r in records if r["plan_source"] == "llm")
+            stats["errors"] += sum(1 for r in records if r["errors"])
+            if on_batch is not None:
+                on_batch(len(records), state)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - t_start
+    return {
+        **stats,
+        "elapsed_s": round(elapsed, 3),
+        "plans_per_s": round(stats["rows"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "llm_s": round(stats["llm_s"], 3),
+        "cpu_s": round(stats["cpu_s"], 3),
+    }
+
+# --out suffix -> format when --format is not given; no suffix means a Parquet directory
+_FORMAT_BY_SUFFIX = {".jsonl": "jsonl", ".ndjson": "jsonl", "": "parquet", ".parquet": "parquet"}
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input", type=Path)
+    ap.add_argument("--out", type=Path, required=True)
+    ap.add_argument("--format", choices=("jsonl", "parquet"), default=None, help="default: from --out suffix (.jsonl/.ndjson = jsonl, none/.parquet = parquet)")
+    ap.add_argument("--extract", choices=("heuristic", "llm"), default="heuristic")
+    ap.add_argument("--plan", choices=("heuristic", "llm"), default="heuristic")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="CPU worker processes (1 = inline)")
+    ap.add_argument("--llm-concurrency", type=int, default=16)
+    ap.add_argument("--batch-size", type=int, default=512, help="rows per checkpoint")
+    ap.add_argument("--restart", action="store_true", help="ignore saved progress and overwrite the output")
+    args = ap.parse_args(argv)
+
+    fmt = args.format or _FORMAT_BY_SUFFIX.get(args.out.suffix.lower())
+    if fmt is None:
+        ap.error(f"cannot infer the output format from {args.out.name!r}; pass --format jsonl or --format parquet")
+    if fmt == "parquet" and args.out.is_file():
+        ap.error(f"{args.out} is a file; Parquet output is a directory of part files")
+    run_key = {
+        "input": str(args.input.resolve()),
+        "input_size": args.input.stat().st_size,
+        "format": fmt,
+        "extract": args.extract,
+        "plan": args.plan,
+    }
+    progress = {} if args.restart else _load_progress(args.out, run_key)
+    done = int(progress.get("rows_done", 0))
+    if fmt == "jsonl":
+        sink: Any = JsonlSink(args.out, int(progress.get("out_bytes", 0)))
+    else:
+        sink = ParquetSink(args.out, int(progress.get("parts", 0)))
+    if done:
+        print(f"resuming after {done} rows", file=sys.stderr)
+
+    def on_batch(n: int, state: Dict[str, Any]) -> None:
+        nonlocal done
+        done += n
+        _save_progress(args.out, {"run": run_key, "rows_done": done, **state})
+        print(f"rows={done}", file=sys.stderr)
+
+    rows = itertools.islice(iter_rows(args.input), done, None)
+    try:
+        stats = asyncio.run(run_pipeline(
+            rows,
+            extract=args.extract,
+            plan=args.plan,
+            workers=args.workers,
+            llm_concurrency=args.llm_concurrency,
+            batch_size=args.batch_size,
+            sink=sink,
+            on_batch=on_batch,
+        ))
+    finally:
+        sink.close()
+
+    print(json.dumps({"rows_total": done, **stats}))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# app/cli/shadow_extract.py
+"""
+Shadow-mode report: heuristic vs LLM extraction on a corpus, to tune
+HEURISTIC_CONFIDENCE_THRESHOLD.
+
+    cd medicine_ai_service
+    python -m app.cli.shadow_extract corpus.jsonl [--out rows.jsonl] [--concurrency 8]
+
+Corpus: JSONL with {"text": "...", "id": optional} per line, or a .txt file
+with one prescription per line.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from app.core.env import load_env
+
+load_env()
+
+from app.services.extraction import simple_extract_meds_scored  # noqa: E402
+from app.services.llm.extraction import iter_llm_extract_meds_batch  # noqa: E402
+
+MedKey = Tuple[str, str, str]
+
+def _med_key(m: Dict[str, Any]) -> MedKey:
+    return (
+        " ".join(str(m.get("name") or "").split()).lower(),
+        "".join(str(m.get("strength") or "").split()).lower(),
+        str(m.get("frequency") or "").upper(),
+    )
+
+def _load_corpus(path: Path) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    with path.open(encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            if path.suffix == ".jsonl":
+                row = json.loads(line)
+                items.append({"id": row.get("id", i), "text": row.get("text") or ""})
+            else:
+                items.append({"id": i, "text": line})
+    return items
+
+def _threshold_table(rows: List[Dict[str, Any]], thresholds: Iterable[float]) -> List[Dict[str, Any]]:
+    compared = [r for r in rows if r["llm_source"] == "llm"]
+    out = []
+    for t in thresholds:
+        taken = [r for r in compared if r["heuristic_count"] and r["score"] >= t]
+        agree = sum(1 for r in taken if r["agree"])
+        out.append({
+            "threshold": round(t, 2),
+            "fastpath_rate": round(len(taken) / len(compared), 3) if compared else 0.0,
+            "fastpath_items": len(taken),
+            "agreement": round(agree / len(taken), 3) if taken else None,
+            "disagreements": len(taken) - agree,
+        })
+    return out
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("corpus", type=Path)
+    ap.add_argument("--out", type=Path, default=None, help="write per-item rows as JSONL")
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args(argv)
+
+    items = _load_corpus(args.corpus)
+    texts = [it["text"] for it in items]
+
+    rows: List[Dict[str, Any]] = []
+    for res in iter_llm_extract_meds_batch(texts, concurrency=args.concurrency):
+        item = items[res["index"]]
+        meds, report = simple_extract_meds_scored(item["text"])
+        heur: Set[MedKey] = {_med_key(m.model_dump()) for m in meds}
+        llm: Set[MedKey] = {_med_key(m) for m in res["meds"]}
+        rows.append({
+            "id": item["id"],
+            "score": report["min_score"],
+            "heuristic_count": len(heur),
+            "llm_count": len(llm),
+            "llm_source": res["source"],
+            "llm_error": res["error"],
+            "agree": heur == llm,
+            "only_heuristic": sorted(heur - llm),
+            "only_llm": sorted(llm - heur),
+            "lines": report["lines"],
+        })
+
+    rows.sort(key=lambda r: str(r["id"]))
+    if args.out:
+        with args.out.open("w", encoding="utf-8") as f:
+            for r in rows:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    table = _threshold_table(rows, [0.5 + 0.05 * i for i in range(11)])
+    errors = sum(1 for r in rows if r["llm_source"] != "llm")
+    print(f"items={len(rows)} compared={len(rows) - errors} llm_errors={errors}")
+    print(f"{'threshold':>9} {'fastpath':>9} {'items':>6} {'agree':>6} {'diff':>5}")
+    for t in table:
+        agreement = "-" if t["agreement"] is None else f"{t['agreement']:.3f}"
+        print(f"{t['threshold']:>9.2f} {t['fastpath_rate']:>9.3f} {t['fastpath_items']:>6} {agreement:>6} {t['disagreements']:>5}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
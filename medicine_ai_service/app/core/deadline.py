@@ -0,0 +1,42 @@
+# app/core/deadline.py
+import math
+import time
+from typing import Optional
+
+from app.core.llm_config import HF_TIMEOUT_S, REQUEST_BUDGET_MS, LLM_MIN_BUDGET_S
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+# LLM timeouts snap down to one of these, so the client pools (keyed by timeout) stay small
+_TIMEOUT_STEPS = (2, 3, 5, 8, 12, 20, 30, 45, 60, 75, 90, 120, 180)
+
+def request_deadline(budget_ms: Optional[int] = None) -> Optional[float]:
+    """
+    Absolute deadline (epoch seconds) for a request: the header budget if given,
+    else REQUEST_BUDGET_MS. None means unbounded. Epoch time so it survives the checkpointer.
+    """
+    budget = budget_ms if budget_ms and budget_ms > 0 else REQUEST_BUDGET_MS
+    return time.time() + budget / 1000.0 if budget > 0 else None
+
+def remaining_s(deadline_ts: Optional[float]) -> Optional[float]:
+    if deadline_ts is None:
+        return None
+    return max(0.0, deadline_ts - time.time())
+
+def llm_timeout_s(deadline_ts: Optional[float]) -> Optional[int]:
+    """
+    Timeout for the next LLM call.
+      None -> no deadline (or plenty left): use the default HF_TIMEOUT_S
+      0    -> not enough budget left; go straight to the heuristic
+    """
+    left = remaining_s(deadline_ts)
+    if left is None or left >= HF_TIMEOUT_S:
+        return None
+    if left < LLM_MIN_BUDGET_S:
+        return 0
+    return snap_timeout_s(left)
+
+def snap_timeout_s(seconds: float) -> int:
+    """Largest of _TIMEOUT_STEPS that fits in seconds (whole seconds, at least 1, below the first step)."""
+    fitting = [s for s in _TIMEOUT_STEPS if s <= seconds]
+    return fitting[-1] if fitting else max(1, math.floor(seconds))
@@ -23,4 +23,97 @@ HF_MAX_TOKENS = int(os.getenv("HF_MAX_TOKENS", "900"))
 HF_TIMEOUT_S = int(os.getenv("HF_TIMEOUT_S", "90"))
 
 USE_LLM_EXTRACTION = os.getenv("USE_LLM_EXTRACTION", "true").lower() == "true"
-USE_LLM_PLANNING = os.getenv("USE_LLM_PLANNING", "true").lower() == "true"
\ No newline at end of file
+USE_LLM_PLANNING = os.getenv("USE_LLM_PLANNING", "true").lower() == "true"
+
+# pooled InferenceClient instances (keyed by provider/token/timeout/base_url)
+HF_CLIENT_POOL_MAX = int(os.getenv("HF_CLIENT_POOL_MAX", "8"))
+
+# LLM response cache (memory LRU + SQLite)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+EXTRACT_CACHE_TTL_S = int(os.getenv("EXTRACT_CACHE_TTL_S", str(7 * 24 * 3600)))
+EXTRACT_CACHE_MEMORY_MAX = int(os.getenv("EXTRACT_CACHE_MEMORY_MAX", "512"))
+EXTRACT_CACHE_DISK_MAX = int(os.getenv("EXTRACT_CACHE_DISK_MAX", "20000"))
+PLAN_CACHE_TTL_S = int(os.getenv("PLAN_CACHE_TTL_S", str(7 * 24 * 3600)))
+PLAN_CACHE_MEMORY_MAX = int(os.getenv("PLAN_CACHE_MEMORY_MAX", "512"))
+PLAN_CACHE_DISK_MAX = int(os.getenv("PLAN_CACHE_DISK_MAX", "20000"))
+
+# coalesce identical concurrent LLM calls into one upstream request
+LLM_SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+# /ai/extract_batch (bulk imports)
+EXTRACT_BATCH_CONCURRENCY = int(os.getenv("EXTRACT_BATCH_CONCURRENCY", "8"))
+EXTRACT_BATCH_ITEM_TIMEOUT_S = float(os.getenv("EXTRACT_BATCH_ITEM_TIMEOUT_S", "30"))
+EXTRACT_BATCH_MAX_ITEMS = int(os.getenv("EXTRACT_BATCH_MAX_ITEMS", "1000"))
+
+# long OCR documents: keep only med-bearing lines and extract them in parallel chunks
+EXTRACT_CHUNK_ENABLED = os.getenv("EXTRACT_CHUNK_ENABLED", "true").lower() == "true"
+EXTRACT_CHUNK_MIN_LINES = int(os.getenv("EXTRACT_CHUNK_MIN_LINES", "40"))  # shorter texts: one call
+EXTRACT_CHUNK_MAX_LINES = int(os.getenv("EXTRACT_CHUNK_MAX_LINES", "15"))  # med-bearing lines per chunk
+EXTRACT_CHUNK_CONCURRENCY = int(os.getenv("EXTRACT_CHUNK_CONCURRENCY", "4"))
+
+# skip LLM extraction when every line parses cleanly with the heuristic extractor
+HEURISTIC_FASTPATH_ENABLED = os.getenv("HEURISTIC_FASTPATH_ENABLED", "true").lower() == "true"
+HEURISTIC_CONFIDENCE_THRESHOLD = float(os.getenv("HEURISTIC_CONFIDENCE_THRESHOLD", "0.85"))
+
+# one LLM round trip for OCR input: extract meds + build schedule together
+USE_LLM_FUSED = os.getenv("USE_LLM_FUSED", "false").lower() == "true"
+
+# remembered response_format downgrades (json_schema -> json_object), re-probed periodically
+LLM_CAPABILITY_REPROBE_S = int(os.getenv("LLM_CAPABILITY_REPROBE_S", "3600"))
+
+# provider routing: extra fallback/hedge targets as JSON, e.g.
+# [{"provider": "together"}, {"base_url": "http://127.0.0.1:8080", "model": "qwen2.5"}]
+LLM_ROUTE_TARGETS = os.getenv("LLM_ROUTE_TARGETS", "")
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY_S = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_S", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+LLM_ROUTER_MAX_WORKERS = int(os.getenv("LLM_ROUTER_MAX_WORKERS", "32"))
+
+# per-request time budget (ms) when the client sends no X-Request-Deadline-Ms header; 0 = unbounded
+REQUEST_BUDGET_MS = int(os.getenv("REQUEST_BUDGET_MS", "60000"))
+# below this much remaining budget, nodes skip the LLM and use the heuristics directly
+LLM_MIN_BUDGET_S = float(os.getenv("LLM_MIN_BUDGET_S", "2"))
+
+# size max_tokens to the expected answer (med/dose count) instead of a fixed HF_MAX_TOKENS
+LLM_ADAPTIVE_MAX_TOKENS = os.getenv("LLM_ADAPTIVE_MAX_TOKENS", "true").lower() == "true"
+LLM_MAX_TOKENS_FLOOR = int(os.getenv("LLM_MAX_TOKENS_FLOOR", "192"))
+LLM_MAX_TOKENS_CAP = int(os.getenv("LLM_MAX_TOKENS_CAP", "4096"))
+
+# LLM backend per task: "hf" (HF Inference Providers) or "ollama" (local/on-prem server)
+LLM_BACKEND_EXTRACT = os.getenv("LLM_BACKEND_EXTRACT", "hf").strip().lower()
+LLM_BACKEND_PLAN = os.getenv("LLM_BACKEND_PLAN", "hf").strip().lower()
+
+# local model server (Ollama native /api/chat, or any OpenAI-compatible /v1/chat/completions)
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+OLLAMA_API_STYLE = os.getenv("OLLAMA_API_STYLE", "ollama").strip().lower()  # ollama | openai
+OLLAMA_MODEL_EXTRACT = os.getenv("OLLAMA_MODEL_EXTRACT", "llama3.2")
+OLLAMA_MODEL_PLAN = os.getenv("OLLAMA_MODEL_PLAN", "llama3.2")
+OLLAMA_TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", "0.2"))
+OLLAMA_TIMEOUT_S = int(os.getenv("OLLAMA_TIMEOUT_S", "90"))
+OLLAMA_POOL_MAXSIZE = int(os.getenv("OLLAMA_POOL_MAXSIZE", "16"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # keep the model loaded between calls
+OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY", "")  # OpenAI-compatible servers that want a bearer token
+
+# record/replay raw LLM answers for offline benchmarks: off | record | replay | auto
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").strip().lower()
+LLM_CASSETTE_DIR = os.getenv(
+    "LLM_CASSETTE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "cassettes"),
+)
+
+# local formulary (one drug name per line, or .csv with a FORMULARY_CSV_COLUMN header /
+# the name first) for name lookup and OCR-typo correction; unset = names are kept exactly as extracted
+FORMULARY_PATH = os.getenv("FORMULARY_PATH", "")
+FORMULARY_CSV_COLUMN = os.getenv("FORMULARY_CSV_COLUMN", "name")
+FORMULARY_MAX_EDIT_DISTANCE = int(os.getenv("FORMULARY_MAX_EDIT_DISTANCE", "2"))
+FORMULARY_PREFIX_LEN = int(os.getenv("FORMULARY_PREFIX_LEN", "7"))
+
+# facility medication rounds (/ai/facility/rounds)
+FACILITY_ROUNDS_MAX_PLANS = int(os.getenv("FACILITY_ROUNDS_MAX_PLANS", "5000"))
+
+# in-process reminder scheduler (app.services.reminder_scheduler), rebuilt from checkpoints at startup
+REMINDER_SCHEDULER_ENABLED = os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() == "true"
+REMINDER_TICK_S = float(os.getenv("REMINDER_TICK_S", "15"))
+REMINDER_TICK_BATCH = int(os.getenv("REMINDER_TICK_BATCH", "2000"))  # due doses popped per lock hold
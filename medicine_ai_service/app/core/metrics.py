@@ -0,0 +1,204 @@
+# app/core/metrics.py
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# seconds; covers cache hits (ms) up to full HF timeouts
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0, 120.0)
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(v)}" for k, v in items
+        ]
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram: observe() is a bisect + two adds under a lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [counts per bucket (+Inf last)], sum, count
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def time(self, **labels: Any) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        lines = super().render()
+        for key, (counts, total, n) in items:
+            cum = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                le = 'le="' + _fmt_num(bound) + '"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_num(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return lines
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: Dict[str, Any]):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.hist.observe(time.perf_counter() - self.t0, **self.labels)
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.setdefault(metric.name, metric)
+            return self._metrics[metric.name]
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ---------------------------
+# LLM calls
+# ---------------------------
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "llm_call_seconds", "Wall time of hf_chat_json / ollama_chat_json calls (incl. coalescing; HF also routing, hedging)", ("model", "outcome"),
+)
+LLM_QUEUE_SECONDS = REGISTRY.histogram(
+    "llm_queue_seconds", "Time from entering the upstream call path to the request being sent", ("model",),
+)
+LLM_UPSTREAM_SECONDS = REGISTRY.histogram(
+    "llm_upstream_seconds", "Time of one upstream chat completion attempt", ("target", "outcome"),
+)
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Provider-reported tokens", ("model", "kind"))
+LLM_FORMAT_DOWNGRADES = REGISTRY.counter(
+    "llm_response_format_downgrades_total", "json_schema -> json_object fallbacks", ("model",),
+)
+LLM_JSON_REPAIRS = REGISTRY.counter(
+    "llm_json_repairs_total", "Model output that needed repair before parsing", ("result",),
+)
+
+# ---------------------------
+# Agent nodes
+# ---------------------------
+NODE_SECONDS = REGISTRY.histogram("agent_node_seconds", "LangGraph node wall time", ("node", "outcome"))
+HEURISTIC_PATHS = REGISTRY.counter(
+    "agent_heuristic_total", "Node answered with the heuristic instead of the LLM", ("node", "reason"),
+)
+
+# ---------------------------
+# Reminders
+# ---------------------------
+REMINDERS_FIRED = REGISTRY.counter("reminders_fired_total", "Dose reminders popped by the reminder scheduler")
+
+def timed(hist: Histogram, **labels: Any) -> Callable:
+    """Decorator: observe wall time of a sync or async function, labelled outcome=ok|error."""
+    def wrap(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args: Any, **kwargs: Any) -> Any:
+                t0 = time.perf_counter()
+                outcome = "error"
+                try:
+                    out = await fn(*args, **kwargs)
+                    outcome = "ok"
+                    return out
+                finally:
+                    hist.observe(time.perf_counter() - t0, outcome=outcome, **labels)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args: Any, **kwargs: Any) -> Any:
+            t0 = time.perf_counter()
+            outcome = "error"
+            try:
+                out = fn(*args, **kwargs)
+                outcome = "ok"
+                return out
+            finally:
+                hist.observe(time.perf_counter() - t0, outcome=outcome, **labels)
+        return run
+    return wrap
@@ -14,12 +14,15 @@ DB_DIR.mkdir(parents=True, exist_ok=True)
 # Database file path
 DB_PATH = DB_DIR / "checkpoints.db"
 
+# LLM response cache (extraction/planning), kept apart from checkpoints
+LLM_CACHE_DB_PATH = DB_DIR / "llm_cache.db"
 
-def get_sqlite_connection() -> sqlite3.Connection:
+
+def get_sqlite_connection(path: Path = DB_PATH) -> sqlite3.Connection:
     """
     Create and configure SQLite connection with recommended PRAGMA settings.
     """
-    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
 
     # Performance & concurrency settings
     conn.execute("PRAGMA journal_mode=WAL;")
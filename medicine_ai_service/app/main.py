@@ -1,14 +1,64 @@
+import asyncio
+import contextlib
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from app.agent.graph import async_graph_lifespan, iter_plan_states
 from app.api.routes_ai import router as ai_router
 from app.api.routes_adherence import router as adherence_router
 from app.core.env import load_env
+from app.core.metrics import REGISTRY, REMINDERS_FIRED
+from app.core.llm_config import REMINDER_SCHEDULER_ENABLED, REMINDER_TICK_BATCH, REMINDER_TICK_S
+from app.services.reminder_scheduler import REMINDERS, DueReminder, run_reminder_loop
+from app.services.formulary import aload_formulary
+from app.services.ollama_client import aclose_ollama_session
 load_env()
 
-app = FastAPI(title="Medicine Companion (AI + LangGraph)", version="1.0")
+# app.* loggers (e.g. per-call LLM token usage) at LOG_LEVEL; libraries stay at WARNING
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("app").setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+log = logging.getLogger("app.main")
+
+def _dispatch_reminders(fired: List[DueReminder]) -> None:
+    # delivery is mocked like the other tools; the scheduler only decides what is due
+    REMINDERS_FIRED.inc(len(fired))
+    for r in fired:
+        log.info("reminder due plan_id=%s dose_id=%s time_local=%s", r.plan_id, r.dose_id, r.time_local)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with async_graph_lifespan(), contextlib.AsyncExitStack() as stack:
+        stack.push_async_callback(aclose_ollama_session)
+        # the SymSpell index takes seconds for a large formulary; never build it on a request
+        formulary = await aload_formulary()
+        log.info("formulary loaded: %s", formulary.stats())
+        if not REMINDER_SCHEDULER_ENABLED:
+            yield
+            return
+        n = await asyncio.to_thread(lambda: REMINDERS.rebuild(iter_plan_states()))
+        log.info("reminder scheduler rebuilt: %d doses", n)
+        task = asyncio.create_task(run_reminder_loop(REMINDERS, REMINDER_TICK_S, _dispatch_reminders, REMINDER_TICK_BATCH))
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+app = FastAPI(title="Medicine Companion (AI + LangGraph)", version="1.0", lifespan=lifespan)
 
 app.include_router(ai_router)
 app.include_router(adherence_router)
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 def health():
     return {"ok": True}
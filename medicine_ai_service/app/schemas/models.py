@@ -61,6 +61,11 @@ class PlanTextRequest(BaseModel):
     # optional: if you want to pass start date later
     # start_date: Optional[str] = None
 
+class ExtractBatchRequest(BaseModel):
+    texts: List[str]
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64)
+    item_timeout_s: Optional[float] = Field(default=None, gt=0, le=300)
+
 class PlanResponse(BaseModel):
     plan_id: str
     status: PlanStatus
@@ -77,6 +82,22 @@ class PlanResponse(BaseModel):
 class ApproveEdits(BaseModel):
     dose_time_overrides: Dict[str, str] = Field(default_factory=dict)  # dose_id -> "HH:MM"
 
+class FacilityRoundsRequest(BaseModel):
+    plan_ids: List[str]
+    capacity_per_slot: int = Field(..., ge=1)              # doses the nurses can give per round slot
+    slot_minutes: int = Field(default=15, ge=5, le=120)
+    slot_capacity: Dict[str, int] = Field(default_factory=dict)  # "HH:MM" -> capacity override
+    patient_spacing_minutes: int = Field(default=30, ge=0, le=360)
+
+class FacilityRoundsResponse(BaseModel):
+    edits: Dict[str, ApproveEdits]   # plan_id -> edits to pass to /ai/approve
+    unplaced: List[Dict[str, Any]] = Field(default_factory=list)
+    slot_load: Dict[str, int] = Field(default_factory=dict)
+    missing_plan_ids: List[str] = Field(default_factory=list)
+    doses: int = 0
+    moved: int = 0
+    elapsed_ms: float = 0.0
+
 class ApproveRequest(BaseModel):
     plan_id: str
     actor_role: ActorRole = "PATIENT"
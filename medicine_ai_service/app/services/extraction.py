@@ -1,6 +1,7 @@
 import re
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 from app.schemas.models import Medication
+from app.services.formulary import canonical_med_name
 
 FREQ_MAP = {
     "once daily": "OD", "once": "OD", "od": "OD", "1x": "OD",
@@ -14,6 +15,190 @@ FREQ_MAP = {
 _MED_HINT_RE = re.compile(r"\b(tab|tabs|tablet|cap|caps|capsule|mg|mcg|ml|od|bd|bid|tid|qid|daily|weekly|prn)\b", re.I)
 _STRENGTH_RE = re.compile(r"(\d+\s?(mg|mcg|g|ml))", re.IGNORECASE)
 
+# confidence scoring only: dosage-form words, food phrases
+_FORM_WORD_RE = re.compile(r"\b(tab|tabs|tablet|tablets|cap|caps|capsule|capsules|syrup|inj)\b\.?", re.I)
+_FOOD_RE = re.compile(r"\b(with food|after food|before food|empty stomach)\b", re.I)
+_DURATION_RE = re.compile(r"\b(?:x\s*\d+|for\s+\d+|\d+\s*(?:days?|weeks?|months?|wks?))\b", re.I)
+
+_HINT_WORDS = ("tab", "tabs", "tablet", "cap", "caps", "capsule", "mg", "mcg", "ml", "od", "bd", "bid", "tid", "qid", "daily", "weekly", "prn")
+_FOOD_PHRASES = {"with food": True, "after food": True, "before food": False, "empty stomach": False}
+
+# phrase -> (kind, value, counts as a medicine hint like _MED_HINT_RE)
+_PHRASES: Dict[str, Tuple[str, Any, bool]] = {w: ("hint", None, True) for w in _HINT_WORDS}
+_PHRASES.update({k: ("food", v, False) for k, v in _FOOD_PHRASES.items()})
+_PHRASES.update({k: ("freq", v, bool(set(k.split()) & set(_HINT_WORDS))) for k, v in FREQ_MAP.items()})
+
+def _trie_pattern(words) -> str:
+    """
+    Alternation factored into a prefix trie ("o(?:d|nce(?: daily)?)"): the regex engine
+    walks each line once instead of retrying every phrase at every position, and the
+    greedy optional suffixes make the longest phrase win regardless of dict order.
+    """
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(ch) + emit(sub) for ch, sub in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return emit(trie)
+
+# ✅ one precompiled scanner (run on the lowercased line): a strength like "500mg"/"5 ml"
+# or a whole-word frequency/food/hint phrase, resolved by a dict lookup. The leading
+# lookahead lets the engine skip positions that cannot start any token.
+_FIRST_CHARS = "0-9" + re.escape("".join(sorted({p[0] for p in _PHRASES} - set("0123456789"))))
+_LINE_TOKEN_RE = re.compile(
+    r"(?=[" + _FIRST_CHARS + r"])\b(?:(\d+\s?(?:mg|mcg|g|ml))\b|(" + _trie_pattern(_PHRASES) + r")\b)"
+)
+_NAME_RE = re.compile(r"^([A-Za-z][A-Za-z0-9\- ]+)")
+
+def _scan_line(ln: str) -> Tuple[bool, Optional[Tuple[int, int]], Optional[Tuple[int, int, str]], Optional[bool]]:
+    """
+    Single pass over one line -> (looks_like_med, strength span, (start, end, phrase) of the
+    first frequency phrase, with_food). Longest phrase wins; spans are offsets into ln.
+    """
+    strength = freq = None
+    food_true = food_false = hint = False
+    for m in _LINE_TOKEN_RE.finditer(ln.lower()):
+        if m.lastindex == 1:
+            hint = True
+            if strength is None:
+                strength = m.span()
+            continue
+        phrase = m[2]
+        kind, value, is_hint = _PHRASES[phrase]
+        if is_hint:
+            hint = True
+        if kind == "freq":
+            if freq is None:
+                freq = (m.start(), m.end(), phrase)
+        elif kind == "food":
+            if value:
+                food_true = True
+            else:
+                food_false = True
+
+    with_food = False if food_false else (True if food_true else None)
+    return hint, strength, freq, with_food
+
+def _parse_line(ln: str) -> Tuple[Optional[Medication], Dict[str, Any]]:
+    """Parse one line; returns (med or None, details used for confidence scoring)."""
+    hint, strength_span, freq_span, with_food = _scan_line(ln)
+
+    # ✅ must look like a medicine line (strength/frequency/keywords)
+    if not hint:
+        return None, {"line": ln, "kind": "ignored"}
+
+    name_match = _NAME_RE.match(ln)
+    if not name_match:
+        return None, {"line": ln, "kind": "dropped"}
+    strength = ln[strength_span[0]:strength_span[1]] if strength_span else None
+    token = freq_span[2] if freq_span else None
+
+    # the name pattern also swallows "5mg OD"; cut it at the first strength/frequency token
+    name_end = name_match.end(1)
+    for span in (strength_span, freq_span):
+        if span and span[0] < name_end:
+            name_end = span[0]
+    name = ln[:name_end].strip() or name_match.group(1).strip()
+
+    freq = FREQ_MAP[token] if token else None
+
+    # ✅ if no frequency AND no strength, skip (avoid false positives)
+    if not freq and not strength:
+        return None, {"line": ln, "kind": "dropped"}
+
+    info = {
+        "line": ln,
+        "kind": "med",
+        "name": name,
+        "strength": strength,
+        "frequency": freq,
+        "frequency_token": token,
+    }
+    med = Medication(
+        name=canonical_med_name(name),  # OCR typos -> formulary spelling (no-op without a formulary)
+        strength=strength,
+        frequency=freq or "OD",  # safe default only when it *looks* like a med line
+        with_food=with_food,
+        instructions=ln,
+    )
+    return med, info
+
+def _line_confidence(info: Dict[str, Any]) -> Tuple[float, List[str]]:
+    """
+    0..1 score for one parsed line:
+      name 0.30 + strength 0.25 + explicit frequency 0.30 + nothing left unparsed 0.15.
+    Ignored/dropped lines score 0 (the LLM may still find a medicine there), and so do
+    lines with text the parser would lose: a second strength, a duration, any other residue.
+    """
+    if info["kind"] != "med":
+        return 0.0, [info["kind"]]
+
+    ln = info["line"]
+    reasons: List[str] = []
+    score = 0.0
+
+    name = info["name"]
+    if len(re.sub(r"[^A-Za-z]", "", name)) >= 3 and not _FORM_WORD_RE.search(name):
+        score += 0.30
+    else:
+        reasons.append("weak_name")
+
+    if info["strength"]:
+        score += 0.25
+    else:
+        reasons.append("no_strength")
+
+    token = info["frequency_token"]
+    if token and FREQ_MAP.get(token) == info["frequency"]:
+        score += 0.30
+    else:
+        reasons.append("no_frequency")
+
+    residue = ln
+    for part in (name, info["strength"], token):
+        if part:
+            residue = re.sub(re.escape(part), " ", residue, count=1, flags=re.I)
+    residue = _FOOD_RE.sub(" ", _FORM_WORD_RE.sub(" ", residue))
+    if len(_STRENGTH_RE.findall(ln)) > 1:
+        reasons.append("multiple_strengths")
+    if _DURATION_RE.search(residue):
+        reasons.append("duration")
+    if re.sub(r"[\s\-.,;:()/]", "", residue):
+        reasons.append("residue")
+        return 0.0, reasons
+    score += 0.15
+
+    return round(score, 3), reasons
+
+def simple_extract_meds_scored(text: str) -> Tuple[List[Medication], Dict[str, Any]]:
+    """
+    simple_extract_meds + a per-line confidence report:
+    {"lines": [{"line", "kind", "score", "reasons"}], "min_score", "dropped"}
+    """
+    meds: List[Medication] = []
+    rows: List[Dict[str, Any]] = []
+    for ln in [ln.strip() for ln in (text or "").splitlines() if ln.strip()]:
+        med, info = _parse_line(ln)
+        score, reasons = _line_confidence(info)
+        rows.append({"line": ln, "kind": info["kind"], "score": score, "reasons": reasons})
+        if med:
+            meds.append(med)
+
+    return meds, {
+        "lines": rows,
+        "min_score": min((r["score"] for r in rows), default=0.0),
+        "dropped": sum(1 for r in rows if r["kind"] != "med"),
+    }
+
 def simple_extract_meds(text: str) -> List[Medication]:
     """
     Only extract if the line looks like a medication instruction.
@@ -25,37 +210,18 @@ def simple_extract_meds(text: str) -> List[Medication]:
 
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     for ln in lines:
-        # ✅ must look like a medicine line (strength/frequency/keywords)
-        if not (_MED_HINT_RE.search(ln) or _STRENGTH_RE.search(ln)):
-            continue
-
-        name_match = re.match(r"^([A-Za-z][A-Za-z0-9\- ]+)", ln)
-        if not name_match:
-            continue
-        name = name_match.group(1).strip()
+        med, _ = _parse_line(ln)
+        if med:
+            meds.append(med)
 
-        strength_match = _STRENGTH_RE.search(ln)
-        strength = strength_match.group(1) if strength_match else None
+    return meds
 
-        ln_low = ln.lower()
-        freq = next((v for k, v in FREQ_MAP.items() if k in ln_low), None)
-
-        # ✅ if no frequency AND no strength, skip (avoid false positives)
-        if not freq and not strength:
-            continue
-
-        with_food = None
-        if "with food" in ln_low or "after food" in ln_low:
-            with_food = True
-        if "before food" in ln_low or "empty stomach" in ln_low:
-            with_food = False
-
-        meds.append(Medication(
-            name=name,
-            strength=strength,
-            frequency=freq or "OD",  # safe default only when it *looks* like a med line
-            with_food=with_food,
-            instructions=ln,
-        ))
-
-    return meds
\ No newline at end of file
+def heuristic_fastpath(text: str, threshold: float) -> Tuple[Optional[List[Medication]], Dict[str, Any]]:
+    """
+    Returns (meds, report) when every line clears `threshold`, else (None, report).
+    Used to skip the LLM for already-clean prescriptions.
+    """
+    meds, report = simple_extract_meds_scored(text)
+    if meds and report["min_score"] >= threshold:
+        return meds, report
+    return None, report
@@ -0,0 +1,133 @@
+# app/services/facility_rounds.py
+"""
+Facility medication-round scheduler: spreads many residents' dose times across
+round slots so no slot needs more administrations than the nurses can give.
+
+Each dose moves to the nearest round slot (slot_minutes grid) inside its bucket
+window (_BUCKET_WINDOWS) that
+  - still has capacity (per-slot overrides, else capacity_per_slot), and
+  - keeps patient_spacing_minutes from the same patient's other doses.
+Doses are placed earliest first; slot fullness and per-patient occupancy are
+minute bitmaps (MinuteBitmap), so each placement is a few big-int ops.
+
+Plans marked fixed (already approved) only contribute load and patient occupancy.
+Output is per plan {dose_id: "HH:MM"}, i.e. ApproveEdits.dose_time_overrides,
+holding only the doses whose time changes.
+"""
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from app.utils.time_conflict import (
+    _BUCKET_WINDOWS,
+    _BUCKET_DEFAULTS,
+    MinuteBitmap,
+    _grid_mask,
+    _hhmm_to_minutes,
+    _minutes_to_hhmm,
+)
+
+def _slot_capacities(
+    slot_minutes: int,
+    capacity_per_slot: int,
+    slot_capacity: Optional[Mapping[str, int]],
+) -> Dict[int, int]:
+    caps = {m: capacity_per_slot for m in range(0, 24 * 60, slot_minutes)}
+    for hhmm, cap in (slot_capacity or {}).items():
+        m = _hhmm_to_minutes(hhmm)
+        caps[m - m % slot_minutes] = max(0, int(cap))
+    return caps
+
+def optimize_rounds(
+    plans: Iterable[Mapping[str, Any]],
+    *,
+    capacity_per_slot: int,
+    slot_minutes: int = 15,
+    slot_capacity: Optional[Mapping[str, int]] = None,
+    patient_spacing_minutes: int = 30,
+) -> Dict[str, Any]:
+    """
+    plans: [{"plan_id", "patient_id" (optional, defaults to plan_id), "schedule": [Dose dicts],
+             "fixed": bool (optional; e.g. already approved: counts toward load, never moved)}]
+    slot_capacity: {"HH:MM": doses} overrides for specific slots (e.g. fewer nurses at night).
+
+    Returns {
+      "dose_time_overrides": {plan_id: {dose_id: "HH:MM"}},
+      "unplaced": [{"plan_id", "dose_id", "bucket", "time_local"}],   # no slot in the window fits
+      "slot_load": {"HH:MM": doses}, "doses", "moved", "elapsed_ms",
+    }
+    """
+    t0 = time.perf_counter()
+    slot = max(1, slot_minutes)
+    caps = _slot_capacities(slot, capacity_per_slot, slot_capacity)
+    load: Dict[int, int] = {}
+    full = 0  # bit m set = round slot starting at minute m has no capacity left
+    for m, cap in caps.items():
+        if cap <= 0:
+            full |= 1 << m
+
+    patients: Dict[str, MinuteBitmap] = {}
+
+    def patient_bitmap(patient: str) -> MinuteBitmap:
+        occupancy = patients.get(patient)
+        if occupancy is None:
+            occupancy = patients[patient] = MinuteBitmap(patient_spacing_minutes)
+        return occupancy
+
+    def take(minute: int) -> None:
+        nonlocal full
+        n = load.get(minute, 0) + 1
+        load[minute] = n
+        if n >= caps.get(minute, capacity_per_slot):
+            full |= 1 << minute
+
+    doses = []
+    for p in plans:
+        plan_id = str(p["plan_id"])
+        patient = str(p.get("patient_id") or plan_id)
+        if p.get("fixed"):
+            for d in p.get("schedule") or []:
+                try:
+                    mins = _hhmm_to_minutes(str(d.get("time_local")))
+                except Exception:
+                    continue
+                patient_bitmap(patient).place(mins)
+                take(mins - mins % slot)
+            continue
+        for d in p.get("schedule") or []:
+            bucket = d.get("bucket")
+            if bucket not in _BUCKET_WINDOWS or not d.get("dose_id"):
+                continue
+            try:
+                mins = _hhmm_to_minutes(str(d.get("time_local")))
+            except Exception:
+                mins = _BUCKET_DEFAULTS[bucket]
+            lo, hi = _BUCKET_WINDOWS[bucket]
+            if not lo <= mins <= hi:
+                mins = _BUCKET_DEFAULTS[bucket]
+            doses.append((mins, plan_id, str(d["dose_id"]), patient, bucket, str(d.get("time_local"))))
+    doses.sort()
+
+    overrides: Dict[str, Dict[str, str]] = {}
+    unplaced: List[Dict[str, Any]] = []
+    for mins, plan_id, dose_id, patient, bucket, original in doses:
+        lo, hi = _BUCKET_WINDOWS[bucket]
+        occupancy = patient_bitmap(patient)
+        chosen = occupancy.nearest_free(mins, _grid_mask(lo, hi, slot, 0) & ~full)
+        if chosen is None:
+            unplaced.append({"plan_id": plan_id, "dose_id": dose_id, "bucket": bucket, "time_local": original})
+            continue
+
+        occupancy.place(chosen)
+        take(chosen)
+        hhmm = _minutes_to_hhmm(chosen)
+        if hhmm != original:
+            overrides.setdefault(plan_id, {})[dose_id] = hhmm
+
+    return {
+        "dose_time_overrides": overrides,
+        "unplaced": unplaced,
+        "slot_load": {_minutes_to_hhmm(m): n for m, n in sorted(load.items())},
+        "doses": len(doses),
+        "moved": sum(len(v) for v in overrides.values()),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
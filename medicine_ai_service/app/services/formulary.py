@@ -0,0 +1,293 @@
+# app/services/formulary.py
+"""
+Local formulary index: exact/prefix drug-name lookup and OCR-typo correction.
+
+File format (FORMULARY_PATH): one drug name per line, blank lines and "#"
+comments ignored; for .csv files the name is read from the FORMULARY_CSV_COLUMN
+column when the first row is a header naming it, else from the first column.
+
+Index:
+  - exact:   dict normalized name -> canonical spelling
+  - prefix:  sorted array of normalized names + bisect (a flat, compact stand-in for a trie)
+  - typos:   SymSpell-style deletion indexes over the first and last FORMULARY_PREFIX_LEN
+             chars; candidates must hit both and are verified with a bounded OSA
+             (Damerau) edit distance
+
+Correction is deliberately conservative: the allowed distance grows with word
+length (short names must match exactly) and ties between different drugs are
+never guessed. With no formulary configured every lookup is a no-op.
+
+Building the index for a large formulary takes seconds, so the app builds it at
+startup (aload_formulary in the lifespan) instead of on the first request.
+"""
+import asyncio
+import csv
+import re
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.llm_config import (
+    FORMULARY_CSV_COLUMN,
+    FORMULARY_MAX_EDIT_DISTANCE,
+    FORMULARY_PATH,
+    FORMULARY_PREFIX_LEN,
+)
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z\-]*")
+# dosage-form / release words are never corrected into drug names
+_SKIP_WORDS = {
+    "tab", "tabs", "tablet", "tablets", "cap", "caps", "capsule", "capsules", "syrup", "inj",
+    "sr", "er", "xr", "cr", "mr", "od", "bd", "bid", "tid", "qid", "prn", "daily", "weekly",
+}
+
+def normalize_name(name: str) -> str:
+    return " ".join((name or "").lower().split())
+
+def _max_distance_for(term: str, cap: int) -> int:
+    # 1 typo for 5-8 letters, 2 for longer names; anything shorter must match exactly
+    n = len(term)
+    if n < 5:
+        return 0
+    return min(cap, 1 if n <= 8 else 2)
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal-string-alignment distance, or max_distance + 1 once it is exceeded.
+    Only the diagonal band |i - j| <= max_distance is filled (cells outside it exceed the bound).
+    """
+    la, lb = len(a), len(b)
+    if abs(la - lb) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    big = max_distance + 1
+    prev2: List[int] = []
+    prev = [j if j <= max_distance else big for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        cur = [big] * (lb + 1)
+        if i <= max_distance:
+            cur[0] = i
+        lo = max(1, i - max_distance)
+        hi = min(lb, i + max_distance)
+        row_min = cur[0]
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] if ca == b[j - 1] else prev[j - 1] + 1
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] and prev2[j - 2] + 1 < v:
+                v = prev2[j - 2] + 1
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > max_distance:
+            return big
+        prev2, prev = prev, cur
+    return prev[lb] if prev[lb] <= max_distance else big
+
+def _index_deletes(index: Dict[str, object], window: str, key: str, d: int) -> None:
+    for v in _deletes(window, d):
+        cur = index.get(v)
+        if cur is None:
+            index[v] = key
+        elif isinstance(cur, list):
+            cur.append(key)
+        elif cur != key:
+            index[v] = [cur, key]
+
+def _lookup_deletes(index: Dict[str, object], window: str, d: int) -> Set[str]:
+    found: Set[str] = set()
+    for v in _deletes(window, d):
+        hit = index.get(v)
+        if hit is None:
+            continue
+        if isinstance(hit, list):
+            found.update(hit)
+        else:
+            found.add(hit)
+    return found
+
+class FormularyIndex:
+    def __init__(self, names: Iterable[str] = (), *, max_edit_distance: int = 2, prefix_len: int = 7):
+        self.max_edit_distance = max(0, max_edit_distance)
+        self.prefix_len = max(1, prefix_len)
+        self._canonical: Dict[str, str] = {}
+        self._sorted: List[str] = []
+        # delete-variant of a term's first / last prefix_len chars -> normalized term (str),
+        # or a list when several terms share it
+        self._pre: Dict[str, object] = {}
+        self._suf: Dict[str, object] = {}
+        self._max_len = 0
+        self.add_names(names)
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def add_names(self, names: Iterable[str]) -> None:
+        added = []
+        for raw in names:
+            canonical = " ".join(str(raw or "").split())
+            key = canonical.lower()
+            if not key or key in self._canonical:
+                continue
+            self._canonical[key] = canonical
+            added.append(key)
+        if not added:
+            return
+        self._sorted = sorted(self._canonical)
+        for key in added:
+            self._max_len = max(self._max_len, len(key))
+            d = _max_distance_for(key, self.max_edit_distance)
+            if not d:
+                continue
+            _index_deletes(self._pre, key[: self.prefix_len], key, d)
+            _index_deletes(self._suf, key[-self.prefix_len:], key, d)
+
+    # ---------------------------
+    # lookups
+    # ---------------------------
+    def exact(self, name: str) -> Optional[str]:
+        return self._canonical.get(normalize_name(name))
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        p = normalize_name(prefix)
+        if not p:
+            return []
+        out: List[str] = []
+        i = bisect_left(self._sorted, p)
+        while i < len(self._sorted) and len(out) < limit and self._sorted[i].startswith(p):
+            out.append(self._canonical[self._sorted[i]])
+            i += 1
+        return out
+
+    def _candidates(self, term: str, d: int) -> Set[str]:
+        """
+        Terms whose prefix AND suffix windows share a <=d-deletion variant with the query's.
+        Every term within distance d passes both windows; intersecting them keeps the
+        candidate set small even when thousands of names share a stem ("cef...", "...pril").
+        """
+        pre = _lookup_deletes(self._pre, term[: self.prefix_len], d)
+        if not pre:
+            return pre
+        return pre & _lookup_deletes(self._suf, term[-self.prefix_len:], d)
+
+    def correct(self, name: str) -> Optional[Tuple[str, int]]:
+        """(canonical name, distance) for an exact or unambiguous near match, else None."""
+        term = normalize_name(name)
+        hit = self._canonical.get(term)
+        if hit is not None:
+            return hit, 0
+        d = _max_distance_for(term, self.max_edit_distance)
+        if not d or len(term) > self._max_len + d:
+            return None
+        best: Optional[str] = None
+        best_d = d + 1
+        tied = False
+        for cand in self._candidates(term, d):
+            limit = min(d, _max_distance_for(cand, self.max_edit_distance))
+            dist = edit_distance(term, cand, limit)
+            if dist > limit:
+                continue
+            if dist < best_d:
+                best, best_d, tied = cand, dist, False
+            elif dist == best_d:
+                tied = True
+        if best is None or tied:
+            return None
+        return self._canonical[best], best_d
+
+    def canonicalize(self, name: str) -> str:
+        """
+        Whole name first ("Metfomin" -> "Metformin"); otherwise each word is corrected
+        on its own ("Tab Metfomin SR" -> "Tab Metformin SR"). Unknown words are kept as-is.
+        """
+        if not self._canonical or not name:
+            return name
+        hit = self.correct(name)
+        if hit is not None:
+            return hit[0]
+
+        def fix(m: "re.Match[str]") -> str:
+            word = m.group(0)
+            if word.lower() in _SKIP_WORDS:
+                return word
+            w = self.correct(word)
+            return w[0] if w is not None else word
+
+        return _WORD_RE.sub(fix, name)
+
+    def stats(self) -> Dict[str, int]:
+        return {"names": len(self._canonical), "delete_keys": len(self._pre) + len(self._suf)}
+
+def _csv_names(rows: Iterable[List[str]], column: str) -> Iterable[str]:
+    col = 0
+    first = True
+    for row in rows:
+        if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+            continue
+        if first:
+            first = False
+            header = [c.strip().lower() for c in row]
+            if column.lower() in header:
+                col = header.index(column.lower())
+                continue
+        if col < len(row) and row[col].strip():
+            yield row[col].strip()
+
+def load_names(path: Path, column: str = FORMULARY_CSV_COLUMN) -> List[str]:
+    with path.open(encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            return list(_csv_names(csv.reader(f), column))
+        names: List[str] = []
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                names.append(line)
+    return names
+
+_INDEX: Optional[FormularyIndex] = None
+_LOCK = threading.Lock()
+
+def get_formulary() -> FormularyIndex:
+    """Process-wide index, built on first use from FORMULARY_PATH (empty when unset/missing)."""
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                path = Path(FORMULARY_PATH) if FORMULARY_PATH else None
+                names = load_names(path) if path and path.is_file() else []
+                _INDEX = FormularyIndex(
+                    names, max_edit_distance=FORMULARY_MAX_EDIT_DISTANCE, prefix_len=FORMULARY_PREFIX_LEN
+                )
+    return _INDEX
+
+async def aload_formulary() -> FormularyIndex:
+    """get_formulary off the event loop; concurrent callers share one build via _LOCK."""
+    if _INDEX is not None:
+        return _INDEX
+    return await asyncio.to_thread(get_formulary)
+
+def set_formulary(index: FormularyIndex) -> None:
+    """Swap in a prebuilt index (tests, benchmarks, hot reload)."""
+    global _INDEX
+    with _LOCK:
+        _INDEX = index
+
+def canonical_med_name(name: str) -> str:
+    return get_formulary().canonicalize(name)
@@ -103,17 +103,32 @@
 
 #     return _safe_json_parse(generated_text)
 
+import asyncio
 import json
+import logging
 import os
-from typing import Any, Dict, Optional
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 
 from app.core.llm_config import (
     HF_TEMPERATURE,
     HF_MAX_TOKENS,
     HF_TIMEOUT_S,
+    HF_CLIENT_POOL_MAX,
 )
+from app.services.llm.cache import content_hash
+from app.services.llm.singleflight import HF_FLIGHT
+from app.services.llm.capabilities import CAPABILITIES, JSON_OBJECT
+from app.services.llm.routing import ROUTER, RoutingError, Target
+from app.services.llm.cassette import CASSETTES
+from app.core.metrics import LLM_CALL_SECONDS, LLM_QUEUE_SECONDS, LLM_TOKENS, LLM_JSON_REPAIRS
+
+logger = logging.getLogger(__name__)
 
 class HFLLMError(RuntimeError):
     pass
@@ -128,21 +143,32 @@ def _safe_json_parse(text: str) -> Dict[str, Any]:
     end = text.rfind("}")
     if start != -1 and end != -1 and end > start:
         try:
-            return json.loads(text[start : end + 1])
+            out = json.loads(text[start : end + 1])
+            LLM_JSON_REPAIRS.inc(result="extracted")
+            return out
         except Exception:
             pass
+    LLM_JSON_REPAIRS.inc(result="failed")
     raise HFLLMError(f"Model did not return valid JSON. Got: {text[:200]}...")
 
-def hf_chat_json(
-    *,
-    model: str,
-    system: str,
-    user: str,
-    schema: Optional[Dict[str, Any]] = None,
-    temperature: Optional[float] = None,
-    max_tokens: Optional[int] = None,
-    timeout_s: Optional[int] = None,
-) -> Dict[str, Any]:
+# ---------------------------
+# Client pool
+# ---------------------------
+# (provider, token, timeout, base_url) -> InferenceClient
+ClientKey = Tuple[str, str, float, str]
+
+_clients: "OrderedDict[ClientKey, InferenceClient]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+def _close_client(client: Any) -> None:
+    close = getattr(client, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+def _runtime_settings() -> Tuple[str, str, str]:
     # ✅ read token at runtime (prevents stale cached value)
     token = os.getenv("HF_TOKEN", "").strip()
     if not token:
@@ -151,21 +177,127 @@ def hf_chat_json(
     # ✅ READ PROVIDER AT RUNTIME (prevents stale cached value)
     provider = os.getenv("HF_PROVIDER", "auto").strip() or "auto"
 
-    client = InferenceClient(
-        provider=provider,
-        api_key=token,
-        timeout=float(timeout_s or HF_TIMEOUT_S),
-    )
+    # optional OpenAI-compatible endpoint (local/fake servers, dedicated endpoints)
+    base_url = os.getenv("HF_BASE_URL", "").strip()
+    return provider, token, base_url
+
+def get_hf_client(provider: str, token: str, timeout_s: float, base_url: str = "") -> InferenceClient:
+    """
+    Return a process-wide InferenceClient for (provider, token, timeout, base_url).
+    Clients are reused so their HTTP sessions keep connections alive between calls.
+    When the token changes, clients built with the old token are dropped.
+    """
+    key: ClientKey = (provider, token, float(timeout_s), base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+
+        for stale in [k for k in _clients if k[1] != token]:
+            _close_client(_clients.pop(stale))
+
+        if base_url:
+            client = InferenceClient(base_url=base_url, api_key=token, timeout=float(timeout_s))
+        else:
+            client = InferenceClient(provider=provider, api_key=token, timeout=float(timeout_s))
+        _clients[key] = client
+
+        while len(_clients) > max(1, HF_CLIENT_POOL_MAX):
+            _, old = _clients.popitem(last=False)
+            _close_client(old)
+        return client
+
+# AsyncInferenceClient sessions are bound to the event loop that created them,
+# so the async pool is additionally keyed by the running loop. The loop is held by
+# weakref: an id() can be reused by a new loop once the old one is collected, while
+# a dead ref never equals a live one.
+LoopRef = "weakref.ReferenceType[asyncio.AbstractEventLoop]"
+_async_clients: "OrderedDict[Tuple[LoopRef, ClientKey], AsyncInferenceClient]" = OrderedDict()
+_closing: "set[Any]" = set()  # pending close() futures, referenced until they finish
+
+def _loop_gone(ref: LoopRef) -> bool:
+    loop = ref()
+    return loop is None or loop.is_closed()
+
+def _close_async_client(ref: LoopRef, client: AsyncInferenceClient) -> None:
+    """Schedules client.close() on the loop that owns its session (no-op if that loop is gone or closed)."""
+    if _loop_gone(ref):
+        return
+    loop = ref()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    try:
+        if loop is running:
+            fut = loop.create_task(client.close())
+        else:
+            fut = asyncio.run_coroutine_threadsafe(client.close(), loop)
+    except RuntimeError:  # loop shut down in between
+        return
+    _closing.add(fut)
+    fut.add_done_callback(_closing.discard)
+
+def get_hf_async_client(provider: str, token: str, timeout_s: float, base_url: str = "") -> AsyncInferenceClient:
+    ref = weakref.ref(asyncio.get_running_loop())
+    key = (ref, (provider, token, float(timeout_s), base_url))
+    evicted: List[Tuple[LoopRef, AsyncInferenceClient]] = []
+    with _clients_lock:
+        client = _async_clients.get(key)
+        if client is not None:
+            _async_clients.move_to_end(key)
+            return client
+
+        # clients built with an old token are closed on their own loop; a closed or
+        # collected loop's clients cannot be used (or closed) any more and are dropped
+        for stale in [k for k in _async_clients if k[1][1] != token or _loop_gone(k[0])]:
+            evicted.append((stale[0], _async_clients.pop(stale)))
+
+        if base_url:
+            client = AsyncInferenceClient(base_url=base_url, api_key=token, timeout=float(timeout_s))
+        else:
+            client = AsyncInferenceClient(provider=provider, api_key=token, timeout=float(timeout_s))
+        _async_clients[key] = client
+
+        while len(_async_clients) > max(1, HF_CLIENT_POOL_MAX):
+            (old_ref, _), old = _async_clients.popitem(last=False)
+            evicted.append((old_ref, old))
+
+    for old_ref, old in evicted:
+        _close_async_client(old_ref, old)
+    return client
+
+def reset_hf_clients() -> None:
+    """Drop all pooled clients (tests, credential rotation)."""
+    with _clients_lock:
+        while _clients:
+            _, client = _clients.popitem()
+            _close_client(client)
+        evicted = [(k[0], c) for k, c in _async_clients.items()]
+        _async_clients.clear()
+    for ref, client in evicted:
+        _close_async_client(ref, client)
+
+def hf_client_pool_stats() -> Dict[str, Any]:
+    with _clients_lock:
+        return {
+            "size": len(_clients),
+            "async_size": len(_async_clients),
+            "max": HF_CLIENT_POOL_MAX,
+            "keys": [{"provider": k[0], "timeout_s": k[2], "base_url": k[3]} for k in _clients],
+        }
 
-    messages = [
+def _messages(system: str, user: str) -> List[Dict[str, str]]:
+    return [
         {"role": "system", "content": system},
         {"role": "user", "content": user},
     ]
 
+def _response_format(schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     # ✅ correct response_format for HF Inference Providers / Together
-    response_format = None
     if schema:
-        response_format = {
+        return {
             "type": "json_schema",
             "json_schema": {
                 "name": "MedPlan",     # any string
@@ -173,31 +305,335 @@ def hf_chat_json(
                 "strict": True,
             },
         }
-    else:
-        # optional: force valid JSON object when you don't have a schema
-        response_format = {"type": "json_object"}
+    # optional: force valid JSON object when you don't have a schema
+    return {"type": "json_object"}
+
+def _is_grammar_error(e: Exception) -> bool:
+    msg = str(e)
+    return "failed to compile grammar" in msg or "grammar is not valid" in msg or "422" in msg
+
+# per-model token usage as reported by the provider (prompt/completion), since start
+_usage: Dict[str, Dict[str, int]] = {}
+_usage_lock = threading.Lock()
+
+def _record_usage(target: Target, out: Any, max_tokens: int, elapsed_s: float) -> None:
+    usage = getattr(out, "usage", None)
+    prompt = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion = int(getattr(usage, "completion_tokens", 0) or 0)
+    with _usage_lock:
+        row = _usage.setdefault(target.model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "max_tokens": 0})
+        row["calls"] += 1
+        row["prompt_tokens"] += prompt
+        row["completion_tokens"] += completion
+        row["max_tokens"] += max_tokens
+    LLM_TOKENS.inc(prompt, model=target.model, kind="prompt")
+    LLM_TOKENS.inc(completion, model=target.model, kind="completion")
+    logger.info(
+        "llm usage target=%s prompt_tokens=%d completion_tokens=%d max_tokens=%d elapsed_ms=%.0f",
+        target.label, prompt, completion, max_tokens, elapsed_s * 1000.0,
+    )
+
+def hf_usage_stats() -> Dict[str, Any]:
+    with _usage_lock:
+        return {
+            model: {
+                **row,
+                "avg_prompt_tokens": round(row["prompt_tokens"] / row["calls"], 1),
+                "avg_completion_tokens": round(row["completion_tokens"] / row["calls"], 1),
+                "avg_max_tokens": round(row["max_tokens"] / row["calls"], 1),
+            }
+            for model, row in _usage.items()
+            if row["calls"]
+        }
+
+def _fingerprint(model, system, user, schema, temperature, max_tokens) -> str:
+    return content_hash(model, system, user, schema, temperature, max_tokens)
+
+def hf_chat_json(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Identical concurrent calls share one upstream request (see HF_FLIGHT)."""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        out = HF_FLIGHT.do(
+            _fingerprint(model, system, user, schema, temperature, max_tokens),
+            lambda: _hf_chat_json_once(
+                model=model, system=system, user=user, schema=schema,
+                temperature=temperature, max_tokens=max_tokens, timeout_s=timeout_s,
+            ),
+            timeout_s,
+        )
+        outcome = "ok"
+        return out
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - t0, model=model, outcome=outcome)
 
+async def hf_chat_json_async(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Async twin of hf_chat_json (does not hold a worker thread while waiting)."""
+    t0 = time.perf_counter()
+    outcome = "error"
     try:
-        out = client.chat_completion(
-            model=model,
-            messages=messages,
-            temperature=temperature if temperature is not None else HF_TEMPERATURE,
-            max_tokens=max_tokens if max_tokens is not None else HF_MAX_TOKENS,
-            response_format=response_format,
+        out = await HF_FLIGHT.ado(
+            _fingerprint(model, system, user, schema, temperature, max_tokens),
+            lambda: _hf_chat_json_once_async(
+                model=model, system=system, user=user, schema=schema,
+                temperature=temperature, max_tokens=max_tokens, timeout_s=timeout_s,
+            ),
+            timeout_s,
         )
-    except Exception as e:
-        msg = str(e)
-        # ✅ fallback: schema -> json_object if provider can't compile grammar
-        if schema and ("failed to compile grammar" in msg or "grammar is not valid" in msg or "422" in msg):
-            out = client.chat_completion(
-                model=model,
-                messages=messages,
-                temperature=temperature if temperature is not None else HF_TEMPERATURE,
-                max_tokens=max_tokens if max_tokens is not None else HF_MAX_TOKENS,
-                response_format={"type": "json_object"},
-            )
+        outcome = "ok"
+        return out
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - t0, model=model, outcome=outcome)
+
+def _chat_on_target(
+    target: Target,
+    token: str,
+    *,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    timeout_s: Optional[int],
+    enqueued_at: float,
+) -> str:
+    """One chat completion against one routed target; returns the raw content."""
+    client = get_hf_client(target.provider, token, float(timeout_s or HF_TIMEOUT_S), target.base_url)
+    t0 = time.monotonic()
+    LLM_QUEUE_SECONDS.observe(t0 - enqueued_at, model=target.model)
+
+    kwargs = dict(
+        model=target.model,
+        messages=_messages(system, user),
+        temperature=temperature if temperature is not None else HF_TEMPERATURE,
+        max_tokens=max_tokens if max_tokens is not None else HF_MAX_TOKENS,
+    )
+    cap_key = CAPABILITIES.key(target.base_url or target.provider, target.model, schema)
+    if schema and CAPABILITIES.preferred_format(cap_key) == JSON_OBJECT:
+        # known: this provider/model can't compile the grammar -> skip the doomed attempt
+        out = client.chat_completion(**kwargs, response_format={"type": "json_object"})
+    else:
+        try:
+            out = client.chat_completion(**kwargs, response_format=_response_format(schema))
+        except Exception as e:
+            # ✅ fallback: schema -> json_object if provider can't compile grammar
+            if schema and _is_grammar_error(e):
+                CAPABILITIES.record_downgrade(cap_key, str(e))
+                out = client.chat_completion(**kwargs, response_format={"type": "json_object"})
+            else:
+                raise
         else:
-            raise
+            if schema:
+                CAPABILITIES.record_schema_ok(cap_key)
+
+    _record_usage(target, out, kwargs["max_tokens"], time.monotonic() - t0)
+    return out.choices[0].message.content or ""
 
-    content = out.choices[0].message.content or ""
-    return _safe_json_parse(content)
\ No newline at end of file
+async def _chat_on_target_async(
+    target: Target,
+    token: str,
+    *,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    timeout_s: Optional[int],
+    enqueued_at: float,
+) -> str:
+    client = get_hf_async_client(target.provider, token, float(timeout_s or HF_TIMEOUT_S), target.base_url)
+    t0 = time.monotonic()
+    LLM_QUEUE_SECONDS.observe(t0 - enqueued_at, model=target.model)
+
+    kwargs = dict(
+        model=target.model,
+        messages=_messages(system, user),
+        temperature=temperature if temperature is not None else HF_TEMPERATURE,
+        max_tokens=max_tokens if max_tokens is not None else HF_MAX_TOKENS,
+    )
+    cap_key = CAPABILITIES.key(target.base_url or target.provider, target.model, schema)
+    if schema and CAPABILITIES.preferred_format(cap_key) == JSON_OBJECT:
+        out = await client.chat_completion(**kwargs, response_format={"type": "json_object"})
+    else:
+        try:
+            out = await client.chat_completion(**kwargs, response_format=_response_format(schema))
+        except Exception as e:
+            if schema and _is_grammar_error(e):
+                CAPABILITIES.record_downgrade(cap_key, str(e))
+                out = await client.chat_completion(**kwargs, response_format={"type": "json_object"})
+            else:
+                raise
+        else:
+            if schema:
+                CAPABILITIES.record_schema_ok(cap_key)
+
+    _record_usage(target, out, kwargs["max_tokens"], time.monotonic() - t0)
+    return out.choices[0].message.content or ""
+
+# ---------------------------
+# Cassettes (record/replay at the raw-content level)
+# ---------------------------
+def _cassette_key(model, system, user, schema, temperature, max_tokens) -> str:
+    if not CASSETTES.enabled:
+        return ""
+    return CASSETTES.key(model, system, user, schema, temperature, max_tokens)
+
+def _cassette_request(model, system, user, schema, temperature, max_tokens) -> Dict[str, Any]:
+    return {
+        "model": model, "system": system, "user": user, "schema": schema,
+        "temperature": temperature, "max_tokens": max_tokens,
+    }
+
+def _record_cassette(key, model, system, user, schema, temperature, max_tokens, content: str) -> None:
+    if key and CASSETTES.recording:
+        CASSETTES.save(key, _cassette_request(model, system, user, schema, temperature, max_tokens), content)
+
+async def _arecord_cassette(key, model, system, user, schema, temperature, max_tokens, content: str) -> None:
+    if key and CASSETTES.recording:
+        await CASSETTES.asave(key, _cassette_request(model, system, user, schema, temperature, max_tokens), content)
+
+def _hf_chat_json_once(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[int] = None,
+) -> Dict[str, Any]:
+    cassette_key = _cassette_key(model, system, user, schema, temperature, max_tokens)
+    if cassette_key and CASSETTES.replaying:
+        content = CASSETTES.load(cassette_key)
+        if content is not None:
+            return _safe_json_parse(content)
+
+    provider, token, base_url = _runtime_settings()
+    targets = ROUTER.targets_for(provider, model, base_url)
+    enqueued_at = time.monotonic()
+    try:
+        content = ROUTER.call(targets, lambda t: _chat_on_target(
+            t, token, system=system, user=user, schema=schema,
+            temperature=temperature, max_tokens=max_tokens, timeout_s=timeout_s, enqueued_at=enqueued_at,
+        ))
+    except RoutingError as e:
+        raise HFLLMError(str(e)) from e
+    _record_cassette(cassette_key, model, system, user, schema, temperature, max_tokens, content)
+    return _safe_json_parse(content)
+
+async def _hf_chat_json_once_async(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[int] = None,
+) -> Dict[str, Any]:
+    cassette_key = _cassette_key(model, system, user, schema, temperature, max_tokens)
+    if cassette_key and CASSETTES.replaying:
+        content = await CASSETTES.aload(cassette_key)
+        if content is not None:
+            return _safe_json_parse(content)
+
+    provider, token, base_url = _runtime_settings()
+    targets = ROUTER.targets_for(provider, model, base_url)
+    enqueued_at = time.monotonic()
+    try:
+        content = await ROUTER.acall(targets, lambda t: _chat_on_target_async(
+            t, token, system=system, user=user, schema=schema,
+            temperature=temperature, max_tokens=max_tokens, timeout_s=timeout_s, enqueued_at=enqueued_at,
+        ))
+    except RoutingError as e:
+        raise HFLLMError(str(e)) from e
+    await _arecord_cassette(cassette_key, model, system, user, schema, temperature, max_tokens, content)
+    return _safe_json_parse(content)
+
+async def hf_chat_json_stream(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream the raw JSON text as the provider generates it (content deltas).
+    Not coalesced or cached: callers parse incrementally and _safe_json_parse the total.
+    Cassette replay re-chunks the recorded content; recording stores the joined deltas.
+    """
+    cassette_key = _cassette_key(model, system, user, schema, temperature, max_tokens)
+    if cassette_key and CASSETTES.replaying:
+        content = await CASSETTES.aload(cassette_key)
+        if content is not None:
+            for i in range(0, len(content), 16):
+                yield content[i : i + 16]
+            return
+
+    provider, token, base_url = _runtime_settings()
+    try:
+        # streams can't be hedged: take the first target whose circuit is closed
+        target = ROUTER.pick(ROUTER.targets_for(provider, model, base_url))
+    except RoutingError as e:
+        raise HFLLMError(str(e)) from e
+    client = get_hf_async_client(target.provider, token, float(timeout_s or HF_TIMEOUT_S), target.base_url)
+
+    kwargs = dict(
+        model=target.model,
+        messages=_messages(system, user),
+        temperature=temperature if temperature is not None else HF_TEMPERATURE,
+        max_tokens=max_tokens if max_tokens is not None else HF_MAX_TOKENS,
+        stream=True,
+    )
+    cap_key = CAPABILITIES.key(target.base_url or target.provider, target.model, schema)
+    t0 = time.monotonic()
+    try:
+        if schema and CAPABILITIES.preferred_format(cap_key) == JSON_OBJECT:
+            stream = await client.chat_completion(**kwargs, response_format={"type": "json_object"})
+        else:
+            try:
+                stream = await client.chat_completion(**kwargs, response_format=_response_format(schema))
+            except Exception as e:
+                if schema and _is_grammar_error(e):
+                    CAPABILITIES.record_downgrade(cap_key, str(e))
+                    stream = await client.chat_completion(**kwargs, response_format={"type": "json_object"})
+                else:
+                    raise
+            else:
+                if schema:
+                    CAPABILITIES.record_schema_ok(cap_key)
+
+        parts: List[str] = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception:
+        ROUTER.record(target, False, time.monotonic() - t0)
+        raise
+    ROUTER.record(target, True, time.monotonic() - t0)
+    await _arecord_cassette(cassette_key, model, system, user, schema, temperature, max_tokens, "".join(parts))
@@ -0,0 +1,120 @@
+# app/services/llm/backends.py
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.llm_config import (
+    HF_MODEL_EXTRACT,
+    HF_MODEL_PLAN,
+    OLLAMA_MODEL_EXTRACT,
+    OLLAMA_MODEL_PLAN,
+    LLM_BACKEND_EXTRACT,
+    LLM_BACKEND_PLAN,
+)
+from app.services.hf_client import (
+    hf_chat_json,
+    hf_chat_json_async,
+    hf_chat_json_stream,
+    hf_client_pool_stats,
+)
+from app.services.ollama_client import (
+    ollama_chat_json,
+    ollama_chat_json_async,
+    ollama_chat_json_stream_async,
+    ollama_pool_stats,
+)
+
+EXTRACT = "extract"
+PLAN = "plan"
+
+class LLMBackendError(RuntimeError):
+    pass
+
+class LLMBackend(ABC):
+    """
+    One chat-JSON interface for every model server.
+    All calls take keyword args: model, system, user, schema, temperature, max_tokens, timeout_s.
+    A subclass missing any of the chat methods cannot be instantiated.
+    """
+
+    name = "base"
+    models: Dict[str, str] = {}
+
+    def model_for(self, task: str) -> str:
+        return self.models[task]
+
+    @abstractmethod
+    def chat_json(self, **kwargs: Any) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def chat_json_async(self, **kwargs: Any) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def chat_json_stream(self, **kwargs: Any) -> AsyncIterator[str]:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class HFBackend(LLMBackend):
+    """HF Inference Providers (routing, hedging, capability cache live in hf_client)."""
+
+    name = "hf"
+    models = {EXTRACT: HF_MODEL_EXTRACT, PLAN: HF_MODEL_PLAN}
+
+    def chat_json(self, **kwargs: Any) -> Dict[str, Any]:
+        return hf_chat_json(**kwargs)
+
+    async def chat_json_async(self, **kwargs: Any) -> Dict[str, Any]:
+        return await hf_chat_json_async(**kwargs)
+
+    def chat_json_stream(self, **kwargs: Any) -> AsyncIterator[str]:
+        return hf_chat_json_stream(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return hf_client_pool_stats()
+
+class OllamaBackend(LLMBackend):
+    """Local/on-prem server over a pooled keep-alive session (Ollama or OpenAI-compatible API)."""
+
+    name = "ollama"
+    models = {EXTRACT: OLLAMA_MODEL_EXTRACT, PLAN: OLLAMA_MODEL_PLAN}
+
+    def chat_json(self, **kwargs: Any) -> Dict[str, Any]:
+        return ollama_chat_json(**kwargs)
+
+    async def chat_json_async(self, **kwargs: Any) -> Dict[str, Any]:
+        return await ollama_chat_json_async(**kwargs)
+
+    def chat_json_stream(self, **kwargs: Any) -> AsyncIterator[str]:
+        return ollama_chat_json_stream_async(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return ollama_pool_stats()
+
+BACKENDS: Dict[str, LLMBackend] = {
+    HFBackend.name: HFBackend(),
+    OllamaBackend.name: OllamaBackend(),
+}
+
+_TASK_BACKENDS = {EXTRACT: LLM_BACKEND_EXTRACT, PLAN: LLM_BACKEND_PLAN}
+
+def register_backend(backend: LLMBackend, name: Optional[str] = None) -> None:
+    if not isinstance(backend, LLMBackend):
+        raise LLMBackendError(f"{type(backend).__name__} is not an LLMBackend")
+    BACKENDS[name or backend.name] = backend
+
+def backend_for(task: str) -> LLMBackend:
+    """Backend configured for a task (LLM_BACKEND_EXTRACT / LLM_BACKEND_PLAN)."""
+    name = _TASK_BACKENDS.get(task, "hf")
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise LLMBackendError(f"Unknown LLM backend {name!r} for {task}; known: {sorted(BACKENDS)}")
+    return backend
+
+def backends_stats() -> Dict[str, Any]:
+    return {
+        "tasks": dict(_TASK_BACKENDS),
+        "backends": {name: b.stats() for name, b in BACKENDS.items() if name in _TASK_BACKENDS.values()},
+    }
@@ -0,0 +1,68 @@
+# app/services/llm/bulk_normalize.py
+"""
+Column-at-a-time normalize_frequency / normalize_duration_days for tabular imports
+(pharmacy CSV/Parquet exports with millions of rows).
+
+Free-text columns have tiny cardinality compared with the row count: each column is
+factorized in C, only the distinct values go through the scalar normalizers (memoized
+across calls on their stripped/lowercased form), and the codes are broadcast back with
+one NumPy take. Numeric duration columns are range-checked with array ops instead.
+
+Results are identical to the scalar functions row by row. Missing cells behave like
+None (frequency "UNKNOWN", duration <NA>); non-string frequency cells are str()-ed.
+"""
+from functools import lru_cache
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.llm.extraction_sanitize import normalize_duration_days, normalize_frequency
+
+# normalize_frequency only looks at raw.strip().lower(), so that is the memo key
+_frequency_code = lru_cache(maxsize=65536)(normalize_frequency)
+
+def _as_series(values: Any) -> pd.Series:
+    return values if isinstance(values, pd.Series) else pd.Series(values)
+
+def normalize_frequency_column(values: Any) -> pd.Series:
+    """normalize_frequency over a whole column -> object Series of codes (same index as a Series input)."""
+    s = _as_series(values)
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    mapped = [_frequency_code(str(u).strip().lower()) for u in uniques]
+    mapped.append(normalize_frequency(None))  # code -1 (missing) indexes the last slot
+    return pd.Series(np.array(mapped, dtype=object)[codes], index=s.index, dtype=object)
+
+def _duration_days_array(s: pd.Series) -> np.ndarray:
+    """Days per row, 0 where normalize_duration_days returns None."""
+    if pd.api.types.is_bool_dtype(s.dtype):
+        # int(True) == 1 is in range, int(False) == 0 is not
+        return s.to_numpy(dtype=bool, na_value=False).astype(np.int64)
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        arr = s.to_numpy(dtype=np.float64, na_value=np.nan)
+        # int() truncates toward zero and raises on NaN/inf; clip first so the cast can't overflow
+        days = np.trunc(np.clip(np.nan_to_num(arr, nan=0.0, posinf=0.0, neginf=0.0), -1, 366)).astype(np.int64)
+        return np.where((days >= 1) & (days <= 365), days, 0)
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    mapped = [normalize_duration_days(u) or 0 for u in uniques]
+    mapped.append(0)
+    return np.array(mapped, dtype=np.int64)[codes]
+
+def normalize_duration_column(values: Any) -> pd.Series:
+    """normalize_duration_days over a whole column -> nullable Int64 Series (<NA> where the scalar returns None)."""
+    s = _as_series(values)
+    days = _duration_days_array(s)
+    return pd.Series(days, index=s.index, dtype="Int64").mask(days == 0)
+
+def normalize_med_columns(
+    df: pd.DataFrame,
+    frequency_col: Optional[str] = "frequency",
+    duration_col: Optional[str] = "duration_days",
+) -> pd.DataFrame:
+    """Copy of df with its frequency/duration columns normalized (absent columns are skipped)."""
+    out = df.copy()
+    if frequency_col and frequency_col in out.columns:
+        out[frequency_col] = normalize_frequency_column(out[frequency_col])
+    if duration_col and duration_col in out.columns:
+        out[duration_col] = normalize_duration_column(out[duration_col])
+    return out
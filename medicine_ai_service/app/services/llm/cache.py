@@ -0,0 +1,251 @@
+# app/services/llm/cache.py
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.llm_config import (
+    EXTRACT_CACHE_TTL_S,
+    EXTRACT_CACHE_MEMORY_MAX,
+    EXTRACT_CACHE_DISK_MAX,
+    PLAN_CACHE_TTL_S,
+    PLAN_CACHE_MEMORY_MAX,
+    PLAN_CACHE_DISK_MAX,
+)
+from app.db.db_config import LLM_CACHE_DB_PATH, get_sqlite_connection
+
+def content_hash(*parts: Any) -> str:
+    """Stable sha256 over JSON-serialisable parts (dicts are key-sorted)."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class TwoTierCache:
+    """
+    Raw LLM outputs keyed by content hash.
+    Tier 1: in-process LRU (OrderedDict). Tier 2: SQLite table shared by all namespaces.
+    Both tiers honour ttl_s; each tier is bounded and evicts least-recently-used rows.
+    Values are kept serialised so callers (e.g. sanitizers) can't mutate cached entries.
+
+    The memory tier and SQLite tier have separate locks. Async callers use aget/aset,
+    which answer memory hits inline and run the SQLite tier in a worker thread, so
+    disk reads, writes and commits never block the event loop.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        ttl_s: int,
+        memory_max: int,
+        disk_max: int,
+        db_path: Path = LLM_CACHE_DB_PATH,
+    ):
+        self.namespace = namespace
+        self.ttl_s = ttl_s
+        self.memory_max = memory_max
+        self.disk_max = disk_max
+        self.db_path = db_path
+
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()       # memory tier + stats
+        self._disk_lock = threading.Lock()  # SQLite connection
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {
+            "hits_memory": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "sets": 0,
+            "expired": 0,
+            "evictions_memory": 0,
+            "evictions_disk": 0,
+            "disk_errors": 0,
+        }
+
+    # ---------------------------
+    # SQLite tier
+    # ---------------------------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = get_sqlite_connection(self.db_path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_lru ON llm_cache (namespace, last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key: str, now: float) -> Tuple[Optional[Tuple[float, str]], bool]:
+        """((created_at, value) or None, expired)"""
+        db = self._db()
+        row = db.execute(
+            "SELECT value, created_at FROM llm_cache WHERE namespace=? AND key=?",
+            (self.namespace, key),
+        ).fetchone()
+        if not row:
+            return None, False
+        value, created_at = row
+        if now - created_at > self.ttl_s:
+            db.execute("DELETE FROM llm_cache WHERE namespace=? AND key=?", (self.namespace, key))
+            db.commit()
+            return None, True
+        db.execute(
+            "UPDATE llm_cache SET last_access=? WHERE namespace=? AND key=?",
+            (now, self.namespace, key),
+        )
+        db.commit()
+        return (created_at, value), False
+
+    def _disk_set(self, key: str, value: str, now: float) -> int:
+        """Writes one row and trims the namespace; returns the number of rows evicted."""
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO llm_cache (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, value, now, now),
+        )
+        cur = db.execute(
+            "DELETE FROM llm_cache WHERE namespace=? AND (created_at < ? OR key IN ("
+            " SELECT key FROM llm_cache WHERE namespace=? ORDER BY last_access DESC LIMIT -1 OFFSET ?))",
+            (self.namespace, now - self.ttl_s, self.namespace, self.disk_max),
+        )
+        db.commit()
+        return max(0, cur.rowcount or 0)
+
+    # ---------------------------
+    # memory tier
+    # ---------------------------
+    def _mem_put(self, key: str, created_at: float, value: str) -> None:
+        self._mem[key] = (created_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > max(0, self.memory_max):
+            self._mem.popitem(last=False)
+            self._stats["evictions_memory"] += 1
+
+    # ---------------------------
+    # public API
+    # ---------------------------
+    def _mem_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is None:
+                return None
+            created_at, value = hit
+            if now - created_at <= self.ttl_s:
+                self._mem.move_to_end(key)
+                self._stats["hits_memory"] += 1
+                return value
+            del self._mem[key]
+            self._stats["expired"] += 1
+            return None
+
+    def _tier2_get(self, key: str, now: float) -> Optional[str]:
+        """SQLite lookup (blocking); a hit is promoted into memory."""
+        try:
+            with self._disk_lock:
+                disk, expired = self._disk_get(key, now)
+        except sqlite3.Error:
+            disk, expired = None, False
+            with self._lock:
+                self._stats["disk_errors"] += 1
+        with self._lock:
+            if expired:
+                self._stats["expired"] += 1
+            if disk is None:
+                self._stats["misses"] += 1
+                return None
+            created_at, value = disk
+            self._mem_put(key, created_at, value)
+            self._stats["hits_disk"] += 1
+            return value
+
+    def _tier2_set(self, key: str, blob: str, now: float) -> None:
+        """SQLite write + trim (blocking)."""
+        try:
+            with self._disk_lock:
+                evicted = self._disk_set(key, blob, now)
+        except sqlite3.Error:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+            return
+        if evicted:
+            with self._lock:
+                self._stats["evictions_disk"] += evicted
+
+    def _mem_set(self, key: str, value: Dict[str, Any], now: float) -> str:
+        blob = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._mem_put(key, now, blob)
+            self._stats["sets"] += 1
+        return blob
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        value = self._mem_get(key, now)
+        if value is None:
+            value = self._tier2_get(key, now)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        self._tier2_set(key, self._mem_set(key, value, now), now)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() for the event loop: memory hits inline, the SQLite tier in a worker thread."""
+        now = time.time()
+        value = self._mem_get(key, now)
+        if value is None:
+            value = await asyncio.to_thread(self._tier2_get, key, now)
+        return None if value is None else json.loads(value)
+
+    async def aset(self, key: str, value: Dict[str, Any]) -> None:
+        """set() for the event loop: memory tier inline, the SQLite write in a worker thread."""
+        now = time.time()
+        blob = self._mem_set(key, value, now)
+        await asyncio.to_thread(self._tier2_set, key, blob, now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        try:
+            with self._disk_lock:
+                self._db().execute("DELETE FROM llm_cache WHERE namespace=?", (self.namespace,))
+                self._db().commit()
+        except sqlite3.Error:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats["hits_memory"] + self._stats["hits_disk"]
+            lookups = hits + self._stats["misses"]
+            return {
+                "namespace": self.namespace,
+                **self._stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_size": len(self._mem),
+                "memory_max": self.memory_max,
+                "disk_max": self.disk_max,
+                "ttl_s": self.ttl_s,
+            }
+
+EXTRACT_CACHE = TwoTierCache(
+    "extract",
+    ttl_s=EXTRACT_CACHE_TTL_S,
+    memory_max=EXTRACT_CACHE_MEMORY_MAX,
+    disk_max=EXTRACT_CACHE_DISK_MAX,
+)
+
+PLAN_CACHE = TwoTierCache(
+    "plan",
+    ttl_s=PLAN_CACHE_TTL_S,
+    memory_max=PLAN_CACHE_MEMORY_MAX,
+    disk_max=PLAN_CACHE_DISK_MAX,
+)
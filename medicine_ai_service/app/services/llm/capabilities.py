@@ -0,0 +1,82 @@
+# app/services/llm/capabilities.py
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.llm_config import LLM_CAPABILITY_REPROBE_S
+from app.services.llm.cache import content_hash
+from app.core.metrics import LLM_FORMAT_DOWNGRADES
+
+CapabilityKey = Tuple[str, str, str]  # (provider or base_url, model, schema hash)
+
+JSON_SCHEMA = "json_schema"
+JSON_OBJECT = "json_object"
+
+class CapabilityCache:
+    """
+    Remembers which (provider, model, schema) can't compile a json_schema grammar,
+    so later calls go straight to json_object instead of failing first.
+    Entries expire after reprobe_s, and the next call probes json_schema again.
+    """
+
+    def __init__(self, reprobe_s: int):
+        self.reprobe_s = reprobe_s
+        self._lock = threading.Lock()
+        self._downgrades: Dict[CapabilityKey, Dict[str, Any]] = {}
+        self._stats = {"downgrades": 0, "avoided_retries": 0, "probes": 0, "recovered": 0}
+
+    @staticmethod
+    def key(provider: str, model: str, schema: Optional[Dict[str, Any]]) -> CapabilityKey:
+        return (provider, model, content_hash(schema)[:16])
+
+    def preferred_format(self, key: CapabilityKey) -> str:
+        now = time.time()
+        with self._lock:
+            entry = self._downgrades.get(key)
+            if entry is None:
+                return JSON_SCHEMA
+            if now - entry["since"] < self.reprobe_s:
+                self._stats["avoided_retries"] += 1
+                entry["hits"] += 1
+                return JSON_OBJECT
+            # stale: try json_schema again (kept until the probe succeeds or fails)
+            self._stats["probes"] += 1
+            entry["since"] = now
+            return JSON_SCHEMA
+
+    def record_downgrade(self, key: CapabilityKey, reason: str) -> None:
+        LLM_FORMAT_DOWNGRADES.inc(model=key[1])
+        with self._lock:
+            self._stats["downgrades"] += 1
+            entry = self._downgrades.get(key)
+            if entry is None:
+                self._downgrades[key] = {"since": time.time(), "reason": reason[:200], "hits": 0}
+            else:
+                entry.update(since=time.time(), reason=reason[:200])
+
+    def record_schema_ok(self, key: CapabilityKey) -> None:
+        with self._lock:
+            if self._downgrades.pop(key, None) is not None:
+                self._stats["recovered"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                **self._stats,
+                "reprobe_s": self.reprobe_s,
+                "downgraded": [
+                    {
+                        "provider": k[0],
+                        "model": k[1],
+                        "schema": k[2],
+                        "format": JSON_OBJECT,
+                        "age_s": int(now - v["since"]),
+                        "hits": v["hits"],
+                        "reason": v["reason"],
+                    }
+                    for k, v in self._downgrades.items()
+                ],
+            }
+
+CAPABILITIES = CapabilityCache(LLM_CAPABILITY_REPROBE_S)
@@ -0,0 +1,89 @@
+# app/services/llm/cassette.py
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.llm_config import LLM_CASSETTE_MODE, LLM_CASSETTE_DIR
+from app.services.llm.cache import content_hash
+
+OFF, RECORD, REPLAY, AUTO = "off", "record", "replay", "auto"
+
+class CassetteMissError(RuntimeError):
+    pass
+
+class CassetteStore:
+    """
+    Record/replay of raw LLM answers, one JSON file per request fingerprint:
+      record -> every live answer is written to <dir>/<key>.json
+      replay -> answers come only from cassettes; a miss raises CassetteMissError
+      auto   -> replay when a cassette exists, otherwise call live and record
+    The stored "content" is the provider's message text exactly as received, and the
+    stored request holds the full prompts (patient text): keep the directory out of git.
+    """
+
+    def __init__(self, mode: str, directory: Path):
+        self.mode = mode if mode in (OFF, RECORD, REPLAY, AUTO) else OFF
+        self.dir = directory
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "recorded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode in (REPLAY, AUTO)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode in (RECORD, AUTO)
+
+    def key(self, model, system, user, schema, temperature, max_tokens) -> str:
+        # provider/base_url deliberately excluded: a recording replays against any target
+        return content_hash(model, system, user, schema, temperature, max_tokens)
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.json"
+
+    def load(self, key: str) -> Optional[str]:
+        """Recorded content for key, None on miss (raises on miss in strict replay mode)."""
+        try:
+            with self._path(key).open(encoding="utf-8") as f:
+                content = json.load(f)["content"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._stats["misses"] += 1
+            if self.mode == REPLAY:
+                raise CassetteMissError(f"No cassette for request {key} in {self.dir} (LLM_CASSETTE_MODE=replay)")
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return content
+
+    def save(self, key: str, request: Dict[str, Any], content: str) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        row = {"key": key, "recorded_at": time.time(), "request": request, "content": content}
+        tmp = self._path(key).with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(row, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self._path(key))  # atomic: concurrent readers never see half a file
+        with self._lock:
+            self._stats["recorded"] += 1
+
+    async def aload(self, key: str) -> Optional[str]:
+        """load() for async callers: the file read runs on a worker thread."""
+        return await asyncio.to_thread(self.load, key)
+
+    async def asave(self, key: str, request: Dict[str, Any], content: str) -> None:
+        await asyncio.to_thread(self.save, key, request, content)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "dir": str(self.dir), **self._stats}
+
+CASSETTES = CassetteStore(LLM_CASSETTE_MODE, Path(LLM_CASSETTE_DIR))
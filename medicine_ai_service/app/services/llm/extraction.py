@@ -1,21 +1,294 @@
 # app/services/llm/extraction.py
-from typing import Any, Dict, List
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
 
 # from app.core.llm_config import OLLAMA_MODEL_EXTRACT
-from app.core.llm_config import HF_MODEL_EXTRACT
-from app.services.hf_client import hf_chat_json
+from app.core.llm_config import (
+    HF_TIMEOUT_S,
+    LLM_CACHE_ENABLED,
+    LLM_MIN_BUDGET_S,
+    USE_LLM_EXTRACTION,
+    EXTRACT_BATCH_CONCURRENCY,
+    EXTRACT_BATCH_ITEM_TIMEOUT_S,
+    EXTRACT_CHUNK_ENABLED,
+    EXTRACT_CHUNK_MIN_LINES,
+    EXTRACT_CHUNK_MAX_LINES,
+    EXTRACT_CHUNK_CONCURRENCY,
+)
+from app.services.extraction import simple_extract_meds, _MED_HINT_RE, _STRENGTH_RE
+from app.services.formulary import get_formulary
+from app.services.llm.backends import EXTRACT, backend_for
 # from app.services.ollama_client import ollama_chat_json
 # from app.services.hf_client import hf_chat_json
+from app.services.llm.cache import EXTRACT_CACHE, content_hash
+from app.services.llm.singleflight import EXTRACT_FLIGHT
 from app.services.llm.extraction_schema import MEDS_SCHEMA
 from app.services.llm.extraction_prompt import EXTRACT_SYSTEM_PROMPT
 from app.services.llm.extraction_sanitize import sanitize_extracted_meds
+from app.services.llm.prompt_builder import extract_max_tokens
+from app.core.metrics import HEURISTIC_PATHS
+from app.core.deadline import snap_timeout_s
 
-def llm_extract_meds(text: str) -> List[Dict[str, Any]]:
-    user = f"TEXT:\n{text}\n\nExtract meds from the text."
-    raw = hf_chat_json(
-        model=HF_MODEL_EXTRACT,
-        system=EXTRACT_SYSTEM_PROMPT,
-        user=user,
-        schema=MEDS_SCHEMA,
+def _normalize_text(text: str) -> str:
+    # whitespace-only differences (OCR spacing, blank lines) should hit the same entry
+    lines = (" ".join(ln.split()) for ln in (text or "").splitlines())
+    return "\n".join(ln for ln in lines if ln)
+
+def extract_cache_key(text: str) -> str:
+    backend = backend_for(EXTRACT)
+    return content_hash(
+        _normalize_text(text), backend.name, backend.model_for(EXTRACT), EXTRACT_SYSTEM_PROMPT, MEDS_SCHEMA
     )
+
+def _extract_user_message(text: str) -> str:
+    return f"TEXT:\n{text}\n\nExtract meds from the text."
+
+def _extract_raw(text: str, key: str, timeout_s: Optional[float] = None) -> Dict[str, Any]:
+    raw = EXTRACT_CACHE.get(key) if LLM_CACHE_ENABLED else None
+    if raw is None:
+        backend = backend_for(EXTRACT)
+        raw = backend.chat_json(
+            model=backend.model_for(EXTRACT),
+            system=EXTRACT_SYSTEM_PROMPT,
+            user=_extract_user_message(text),
+            schema=MEDS_SCHEMA,
+            max_tokens=extract_max_tokens(text),
+            timeout_s=timeout_s,
+        )
+        if LLM_CACHE_ENABLED:
+            EXTRACT_CACHE.set(key, raw)
+    return raw
+
+async def _extract_raw_async(text: str, key: str, timeout_s: Optional[float] = None) -> Dict[str, Any]:
+    raw = await EXTRACT_CACHE.aget(key) if LLM_CACHE_ENABLED else None
+    if raw is None:
+        backend = backend_for(EXTRACT)
+        raw = await backend.chat_json_async(
+            model=backend.model_for(EXTRACT),
+            system=EXTRACT_SYSTEM_PROMPT,
+            user=_extract_user_message(text),
+            schema=MEDS_SCHEMA,
+            max_tokens=extract_max_tokens(text),
+            timeout_s=timeout_s,
+        )
+        if LLM_CACHE_ENABLED:
+            await EXTRACT_CACHE.aset(key, raw)
+    return raw
+
+def llm_extract_meds(text: str, timeout_s: Optional[float] = None) -> List[Dict[str, Any]]:
+    key = extract_cache_key(text)
+    # concurrent identical texts share one cache lookup + LLM call
+    raw = EXTRACT_FLIGHT.do(key, lambda: _extract_raw(text, key, timeout_s), timeout_s)
+    # cache stores the raw LLM output; sanitize on every call
+    return sanitize_extracted_meds(raw)
+
+async def llm_extract_meds_async(text: str, timeout_s: Optional[float] = None) -> List[Dict[str, Any]]:
+    key = extract_cache_key(text)
+    raw = await EXTRACT_FLIGHT.ado(key, lambda: _extract_raw_async(text, key, timeout_s), timeout_s)
     return sanitize_extracted_meds(raw)
+
+# ---------------------------
+# Batch extraction (bulk imports)
+# ---------------------------
+def _heuristic_item(index: int, text: str, t0: float, error: str | None) -> Dict[str, Any]:
+    if error is not None:
+        HEURISTIC_PATHS.inc(node="extract_batch", reason="timeout" if error.startswith("timeout") else "error")
+    return {
+        "index": index,
+        "source": "heuristic",
+        "meds": [m.model_dump() for m in simple_extract_meds(text)],
+        "error": error,
+        "elapsed_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+def _llm_item(index: int, meds: List[Dict[str, Any]], t0: float) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "source": "llm",
+        "meds": meds,
+        "error": None,
+        "elapsed_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+def _item_timeout(item_timeout_s: float, deadline: Optional[float]) -> Optional[int]:
+    """Snapped timeout for an item starting now; None once the batch deadline leaves too little for a call."""
+    if deadline is not None:
+        left = deadline - time.monotonic()
+        if left < LLM_MIN_BUDGET_S:
+            return None
+        item_timeout_s = min(item_timeout_s, left)
+    return snap_timeout_s(item_timeout_s)
+
+async def llm_extract_meds_batch(
+    texts: Sequence[str],
+    *,
+    concurrency: Optional[int] = None,
+    item_timeout_s: Optional[float] = None,
+    total_timeout_s: Optional[float] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Extract meds for many texts with at most `concurrency` LLM calls in flight.
+    Yields one result per text in completion order ({"index", "source", "meds", "error", "elapsed_ms"}).
+    Items that fail or exceed item_timeout_s (snapped to a deadline step) fall back to simple_extract_meds.
+    total_timeout_s bounds the whole batch: an item that starts late only gets what is left of it.
+    """
+    limit = max(1, concurrency or EXTRACT_BATCH_CONCURRENCY)
+    item_timeout = item_timeout_s or EXTRACT_BATCH_ITEM_TIMEOUT_S
+    deadline = time.monotonic() + total_timeout_s if total_timeout_s else None
+    sem = asyncio.Semaphore(limit)
+
+    async def one(index: int, text: str) -> Dict[str, Any]:
+        async with sem:
+            t0 = time.perf_counter()
+            if not USE_LLM_EXTRACTION or not (text or "").strip():
+                return _heuristic_item(index, text, t0, None)
+            timeout = _item_timeout(item_timeout, deadline)
+            if timeout is None:
+                return _heuristic_item(index, text, t0, "timeout: batch deadline reached")
+            try:
+                meds = await asyncio.wait_for(llm_extract_meds_async(text, timeout_s=timeout), timeout)
+                return _llm_item(index, meds, t0)
+            except asyncio.TimeoutError:
+                return _heuristic_item(index, text, t0, f"timeout after {timeout}s")
+            except Exception as e:
+                return _heuristic_item(index, text, t0, str(e))
+
+    tasks = [asyncio.ensure_future(one(i, t)) for i, t in enumerate(texts)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+def iter_llm_extract_meds_batch(
+    texts: Sequence[str],
+    *,
+    concurrency: Optional[int] = None,
+    item_timeout_s: Optional[float] = None,
+    total_timeout_s: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Thread-pool twin of llm_extract_meds_batch for sync callers (scripts, CLIs)."""
+    limit = max(1, concurrency or EXTRACT_BATCH_CONCURRENCY)
+    item_timeout = item_timeout_s or EXTRACT_BATCH_ITEM_TIMEOUT_S
+    deadline = time.monotonic() + total_timeout_s if total_timeout_s else None
+
+    def one(index: int, text: str) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        if not USE_LLM_EXTRACTION or not (text or "").strip():
+            return _heuristic_item(index, text, t0, None)
+        timeout = _item_timeout(item_timeout, deadline)
+        if timeout is None:
+            return _heuristic_item(index, text, t0, "timeout: batch deadline reached")
+        try:
+            return _llm_item(index, llm_extract_meds(text, timeout_s=timeout), t0)
+        except Exception as e:
+            return _heuristic_item(index, text, t0, str(e))
+
+    with ThreadPoolExecutor(max_workers=limit) as pool:
+        futures = [pool.submit(one, i, t) for i, t in enumerate(texts)]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+# ---------------------------
+# Chunked extraction (long multi-page OCR)
+# ---------------------------
+# 1-0-1 style dose patterns carry no hint word or strength
+_DOSE_PATTERN_RE = re.compile(r"\b[01]\s*-\s*[01]\s*-\s*[01]\b")
+# a line right after a med line that only continues its instructions
+_CONTINUATION_RE = re.compile(r"\b(food|meals?|stomach|days?|weeks?|months?|morning|night|bedtime)\b", re.I)
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z\-]{3,}")
+
+def _is_med_line(ln: str) -> bool:
+    if _MED_HINT_RE.search(ln) or _STRENGTH_RE.search(ln) or _DOSE_PATTERN_RE.search(ln):
+        return True
+    formulary = get_formulary()
+    return bool(len(formulary)) and any(formulary.exact(w) for w in _WORD_RE.findall(ln))
+
+def split_med_chunks(text: str, max_lines: Optional[int] = None) -> List[str]:
+    """
+    Med-bearing segments of a long document, at most max_lines lines each.
+    Boilerplate (headers, history, signatures) is dropped; a continuation line
+    ("after food for 5 days") stays with the med line above it.
+    Texts with no med-bearing line come back whole, so the LLM still sees them.
+    """
+    limit = max(1, max_lines or EXTRACT_CHUNK_MAX_LINES)
+    lines = [" ".join(ln.split()) for ln in (text or "").splitlines()]
+    lines = [ln for ln in lines if ln]
+
+    kept: List[str] = []
+    prev_med = False
+    for ln in lines:
+        if _is_med_line(ln):
+            kept.append(ln)
+            prev_med = True
+        elif prev_med and _CONTINUATION_RE.search(ln):
+            kept.append(ln)
+            prev_med = False
+        else:
+            prev_med = False
+
+    if not kept:
+        return ["\n".join(lines)] if lines else []
+
+    chunks: List[str] = []
+    cur: List[str] = []
+    for ln in kept:
+        # don't split a continuation line from its med line
+        if len(cur) >= limit and _is_med_line(ln):
+            chunks.append("\n".join(cur))
+            cur = []
+        cur.append(ln)
+    if cur:
+        chunks.append("\n".join(cur))
+    return chunks
+
+def should_chunk(text: str) -> bool:
+    return EXTRACT_CHUNK_ENABLED and sum(1 for ln in (text or "").splitlines() if ln.strip()) > EXTRACT_CHUNK_MIN_LINES
+
+def iter_llm_extract_meds_chunked(
+    text: str,
+    timeout_s: Optional[float] = None,
+    *,
+    concurrency: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Extract a long document chunk by chunk, yielding each chunk's result as soon as it completes
+    ({"index" (chunk), "source", "meds", "error", "elapsed_ms"}, same shape as the batch API).
+    A failed or timed-out chunk falls back to simple_extract_meds on that chunk only.
+    timeout_s (default HF_TIMEOUT_S) is the budget for the whole document, not per chunk:
+    chunks queued behind the concurrency limit get whatever is left when they start.
+    """
+    budget = timeout_s or HF_TIMEOUT_S
+    chunks = split_med_chunks(text)
+    yield from iter_llm_extract_meds_batch(
+        chunks, concurrency=concurrency or EXTRACT_CHUNK_CONCURRENCY, item_timeout_s=budget, total_timeout_s=budget
+    )
+
+async def llm_extract_meds_chunked_stream(
+    text: str,
+    timeout_s: Optional[float] = None,
+    *,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async twin of iter_llm_extract_meds_chunked."""
+    budget = timeout_s or HF_TIMEOUT_S
+    chunks = split_med_chunks(text)
+    async for item in llm_extract_meds_batch(
+        chunks, concurrency=concurrency or EXTRACT_CHUNK_CONCURRENCY, item_timeout_s=budget, total_timeout_s=budget
+    ):
+        yield item
+
+def merge_chunk_meds(items: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chunk results in document order, de-duplicated by sanitize_extracted_meds' (name, strength, frequency) key."""
+    ordered = sorted(items, key=lambda it: it["index"])
+    return sanitize_extracted_meds({"meds": [m for it in ordered for m in it["meds"]]})
+
+def llm_extract_meds_chunked(text: str, timeout_s: Optional[float] = None) -> List[Dict[str, Any]]:
+    return merge_chunk_meds(list(iter_llm_extract_meds_chunked(text, timeout_s)))
+
+async def llm_extract_meds_chunked_async(text: str, timeout_s: Optional[float] = None) -> List[Dict[str, Any]]:
+    return merge_chunk_meds([it async for it in llm_extract_meds_chunked_stream(text, timeout_s)])
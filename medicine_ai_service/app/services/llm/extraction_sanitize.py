@@ -2,6 +2,8 @@
 from typing import Any, Dict, List
 import re
 
+from app.services.formulary import canonical_med_name
+
 _ALLOWED_FREQ = {"OD", "BID", "TID", "QID", "WEEKLY", "PRN", "UNKNOWN"}
 
 def normalize_frequency(freq_raw: str) -> str:
@@ -59,7 +61,7 @@ def sanitize_extracted_meds(raw: Dict[str, Any]) -> List[Dict[str, Any]]:
     cleaned: List[Dict[str, Any]] = []
 
     for m in meds:
-        name = (m.get("name") or "").strip()
+        name = canonical_med_name((m.get("name") or "").strip())
         if not name:
             continue
 
@@ -0,0 +1,44 @@
+# app/services/llm/fused.py
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.llm.backends import PLAN, backend_for
+from app.services.llm.schemas import FUSED_SCHEMA
+from app.services.llm.prompts import FUSED_SYSTEM_PROMPT
+from app.services.llm.extraction_sanitize import sanitize_extracted_meds
+from app.services.llm.sanitize import sanitize_plan_output
+from app.services.llm.prompt_builder import fused_user_message, fused_max_tokens
+
+def split_fused_output(raw: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Run the fused answer through the same sanitizers as the two-call path."""
+    meds = sanitize_extracted_meds(raw)
+    plan = sanitize_plan_output(raw, meds)
+    return meds, plan
+
+def llm_extract_and_plan(
+    text: str, input_text: str, timezone: str, timeout_s: Optional[float] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    # fused output is a plan: served by the planning backend
+    backend = backend_for(PLAN)
+    raw = backend.chat_json(
+        model=backend.model_for(PLAN),
+        system=FUSED_SYSTEM_PROMPT,
+        user=fused_user_message(text, input_text, timezone),
+        schema=FUSED_SCHEMA,
+        max_tokens=fused_max_tokens(text),
+        timeout_s=timeout_s,
+    )
+    return split_fused_output(raw)
+
+async def llm_extract_and_plan_async(
+    text: str, input_text: str, timezone: str, timeout_s: Optional[float] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    backend = backend_for(PLAN)
+    raw = await backend.chat_json_async(
+        model=backend.model_for(PLAN),
+        system=FUSED_SYSTEM_PROMPT,
+        user=fused_user_message(text, input_text, timezone),
+        schema=FUSED_SCHEMA,
+        max_tokens=fused_max_tokens(text),
+        timeout_s=timeout_s,
+    )
+    return split_fused_output(raw)
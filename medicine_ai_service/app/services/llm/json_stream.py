@@ -0,0 +1,96 @@
+# app/services/llm/json_stream.py
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+class JSONArrayItemStream:
+    """
+    Incremental scanner for a streamed JSON object such as
+        {"meds": [{...}, {...}], "schedule": [{...}], ...}
+    feed() text chunks as they arrive; it returns (array_key, item) for every object
+    inside a watched top-level array as soon as that object's closing brace arrives.
+    Text before the first "{" (markdown fences etc.) is ignored.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(keys)
+        self._text = ""
+        self._pos = 0
+        # stack of (container, key): container is "{" or "["; key is the array's key at top level
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._item_start = -1
+        self._item_key: Optional[str] = None
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        if not chunk or self.done:
+            return []
+        self._text += chunk
+        out: List[Tuple[str, Dict[str, Any]]] = []
+        text = self._text
+        i = self._pos
+
+        while i < len(text):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._string_start >= 0:
+                        try:
+                            self._last_key = json.loads(text[self._string_start : i + 1])
+                        except ValueError:
+                            self._last_key = None
+                i += 1
+                continue
+
+            if not self._stack:
+                if ch == "{":
+                    self._stack.append(("{", None))
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == "{":
+                top, key = self._stack[-1]
+                if len(self._stack) == 2 and top == "[" and key in self.keys:
+                    self._item_start = i
+                    self._item_key = key
+                self._stack.append(("{", None))
+            elif ch == "[":
+                key = self._last_key if len(self._stack) == 1 else None
+                self._stack.append(("[", key))
+            elif ch in "}]":
+                self._stack.pop()
+                if ch == "}" and len(self._stack) == 2 and self._item_start >= 0:
+                    try:
+                        item = json.loads(text[self._item_start : i + 1])
+                        if isinstance(item, dict):
+                            out.append((self._item_key or "", item))
+                    except ValueError:
+                        pass
+                    self._item_start = -1
+                    self._item_key = None
+                if not self._stack:
+                    self.done = True
+                    i += 1
+                    break
+            elif ch == "," and len(self._stack) == 1:
+                self._last_key = None
+            i += 1
+
+        self._pos = i
+        return out
@@ -1,26 +1,76 @@
 # app/services/llm/planner.py
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 # from app.core.llm_config import OLLAMA_MODEL_PLAN
-from app.core.llm_config import HF_MODEL_PLAN
-from app.services.hf_client import hf_chat_json
+from app.core.llm_config import LLM_CACHE_ENABLED
+from app.services.llm.backends import PLAN, backend_for
 # from app.services.ollama_client import ollama_chat_json
 # from app.services.hf_client import hf_chat_json
+from app.services.llm.cache import PLAN_CACHE, content_hash
+from app.services.llm.singleflight import PLAN_FLIGHT
 from app.services.llm.schemas import PLAN_SCHEMA
 from app.services.llm.prompts import PLAN_SYSTEM_PROMPT
 from app.services.llm.sanitize import sanitize_plan_output
+from app.services.llm.prompt_builder import plan_user_message, plan_max_tokens
 
-def llm_build_plan(meds, input_text, timezone):
-    user_payload = {
-        "timezone": timezone,
-        "user_goal": input_text,
-        "meds": meds,
-        "rules": "Return schedule entries only for medicines in input meds list."
-    }
-    raw = hf_chat_json(
-        model=HF_MODEL_PLAN,
-        system=PLAN_SYSTEM_PROMPT,
-        user=f"PLAN_INPUT:\n{user_payload}",
-        schema=PLAN_SCHEMA,
+# bump the suffix whenever the PLAN_INPUT message format changes
+PLAN_PROMPT_VERSION = content_hash(PLAN_SYSTEM_PROMPT, PLAN_SCHEMA, "plan_input.v3")
+
+def plan_cache_key(meds: List[Dict[str, Any]], input_text: str, timezone: str) -> str:
+    """
+    Keyed on the exact user message sent to the model, which already normalizes the
+    med set (order/spacing/case), so two inputs share a plan only if the model sees the same prompt.
+    """
+    return content_hash(
+        plan_user_message(meds, input_text, timezone),
+        backend_for(PLAN).name,
+        backend_for(PLAN).model_for(PLAN),
+        PLAN_PROMPT_VERSION,
     )
+
+def _plan_raw(meds, input_text, timezone, key: str, timeout_s: Optional[float] = None) -> Dict[str, Any]:
+    raw = PLAN_CACHE.get(key) if LLM_CACHE_ENABLED else None
+    if raw is None:
+        backend = backend_for(PLAN)
+        raw = backend.chat_json(
+            model=backend.model_for(PLAN),
+            system=PLAN_SYSTEM_PROMPT,
+            user=plan_user_message(meds, input_text, timezone),
+            schema=PLAN_SCHEMA,
+            max_tokens=plan_max_tokens(meds),
+            timeout_s=timeout_s,
+        )
+        if LLM_CACHE_ENABLED:
+            PLAN_CACHE.set(key, raw)
+    return raw
+
+async def _plan_raw_async(meds, input_text, timezone, key: str, timeout_s: Optional[float] = None) -> Dict[str, Any]:
+    raw = await PLAN_CACHE.aget(key) if LLM_CACHE_ENABLED else None
+    if raw is None:
+        backend = backend_for(PLAN)
+        raw = await backend.chat_json_async(
+            model=backend.model_for(PLAN),
+            system=PLAN_SYSTEM_PROMPT,
+            user=plan_user_message(meds, input_text, timezone),
+            schema=PLAN_SCHEMA,
+            max_tokens=plan_max_tokens(meds),
+            timeout_s=timeout_s,
+        )
+        if LLM_CACHE_ENABLED:
+            await PLAN_CACHE.aset(key, raw)
+    return raw
+
+def llm_build_plan(meds, input_text, timezone, timeout_s: Optional[float] = None):
+    key = plan_cache_key(meds, input_text, timezone)
+    raw = PLAN_FLIGHT.do(key, lambda: _plan_raw(meds, input_text, timezone, key, timeout_s), timeout_s)
+    # raw output is cached: sanitize mints fresh dose_ids + resolves conflicts per plan
+    return sanitize_plan_output(raw, meds)
+
+async def llm_plan_raw_async(meds, input_text, timezone, timeout_s: Optional[float] = None) -> Dict[str, Any]:
+    """Cached/coalesced raw LLM plan, unsanitized (bulk runs sanitize in worker processes)."""
+    key = plan_cache_key(meds, input_text, timezone)
+    return await PLAN_FLIGHT.ado(key, lambda: _plan_raw_async(meds, input_text, timezone, key, timeout_s), timeout_s)
+
+async def llm_build_plan_async(meds, input_text, timezone, timeout_s: Optional[float] = None):
+    raw = await llm_plan_raw_async(meds, input_text, timezone, timeout_s)
     return sanitize_plan_output(raw, meds)
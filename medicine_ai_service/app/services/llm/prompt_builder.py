@@ -0,0 +1,106 @@
+# app/services/llm/prompt_builder.py
+import json
+from typing import Any, Dict, List
+
+from app.core.llm_config import (
+    HF_MAX_TOKENS,
+    LLM_ADAPTIVE_MAX_TOKENS,
+    LLM_MAX_TOKENS_FLOOR,
+    LLM_MAX_TOKENS_CAP,
+)
+from app.services.llm.sanitize import _expected_count, med_name_key
+
+# rough output sizes in tokens (~4 chars of JSON per token), measured on typical answers
+_PLAN_BASE_TOKENS = 120        # needs_info/questions/precautions/why/actions scaffolding
+_PLAN_PER_MED_TOKENS = 45      # precaution/why lines that mention the med
+_PLAN_PER_DOSE_TOKENS = 30     # {"med_name","time_local","bucket","notes"}
+_PLAN_PER_QUESTION_TOKENS = 30  # PRN/UNKNOWN meds turn into a question
+_EXTRACT_BASE_TOKENS = 20
+_EXTRACT_PER_MED_TOKENS = 40   # {"name","strength","frequency","with_food","duration_days"}
+_FUSED_DOSES_PER_MED = 2       # frequency unknown before extraction: assume BID
+_SAFETY = 1.3
+
+def _drop_empty(obj: Any) -> Any:
+    """Recursively drop None / "" / [] / {} values (False and 0 are kept)."""
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            v = _drop_empty(v)
+            if v is None or v == "" or v == [] or v == {}:
+                continue
+            out[k] = v
+        return out
+    if isinstance(obj, list):
+        return [_drop_empty(v) for v in obj if v is not None]
+    return obj
+
+def compact_json(obj: Any) -> str:
+    """Canonical, minimal JSON for prompts: sorted keys, no whitespace, empty fields dropped."""
+    return json.dumps(_drop_empty(obj), separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+def _clamp(tokens: float) -> int:
+    if not LLM_ADAPTIVE_MAX_TOKENS:
+        return HF_MAX_TOKENS
+    return int(min(LLM_MAX_TOKENS_CAP, max(LLM_MAX_TOKENS_FLOOR, tokens * _SAFETY)))
+
+def _med_lines(text: str) -> int:
+    return max(1, sum(1 for ln in (text or "").splitlines() if ln.strip()))
+
+# ---------------------------
+# user messages
+# ---------------------------
+def _plan_input_med(m: Dict[str, Any]) -> Dict[str, Any]:
+    with_food = m.get("with_food")
+    dur = m.get("duration_days")
+    return {
+        "name": med_name_key(m.get("name")),
+        "strength": "".join(str(m.get("strength") or "").split()).lower(),
+        "frequency": str(m.get("frequency") or "").strip().upper(),
+        "with_food": with_food if isinstance(with_food, bool) else None,
+        "duration_days": dur if isinstance(dur, int) and dur > 0 else None,
+        "instructions": " ".join(str(m.get("instructions") or "").split()).lower(),
+    }
+
+def plan_input_meds(meds: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The med fields the planner sees, normalized (case/spacing) and in a fixed order, so the
+    plan cache key can be the message itself: same message <=> same cached plan.
+    """
+    return sorted((_plan_input_med(m) for m in meds or []), key=compact_json)
+
+def plan_user_message(meds: List[Dict[str, Any]], input_text: str, timezone: str) -> str:
+    return "PLAN_INPUT:\n" + compact_json({
+        "timezone": (timezone or "").strip(),
+        "user_goal": (input_text or "").strip(),
+        "meds": plan_input_meds(meds),
+        "rules": "Return schedule entries only for medicines in input meds list.",
+    })
+
+def fused_user_message(text: str, input_text: str, timezone: str) -> str:
+    return f"TEXT:\n{text}\n\nPLAN_INPUT:\n" + compact_json({
+        "timezone": timezone,
+        "user_goal": (input_text or "").strip(),
+        "rules": "Return schedule entries only for medicines in your meds list.",
+    })
+
+# ---------------------------
+# output budgets
+# ---------------------------
+def plan_max_tokens(meds: List[Dict[str, Any]]) -> int:
+    tokens = _PLAN_BASE_TOKENS
+    for m in meds or []:
+        doses = _expected_count(str(m.get("frequency") or ""))
+        tokens += _PLAN_PER_MED_TOKENS
+        tokens += doses * _PLAN_PER_DOSE_TOKENS if doses else _PLAN_PER_QUESTION_TOKENS
+    return _clamp(tokens)
+
+def extract_max_tokens(text: str) -> int:
+    # at most one med per non-empty line
+    return _clamp(_EXTRACT_BASE_TOKENS + _med_lines(text) * _EXTRACT_PER_MED_TOKENS)
+
+def fused_max_tokens(text: str) -> int:
+    n = _med_lines(text)
+    return _clamp(
+        _EXTRACT_BASE_TOKENS + _PLAN_BASE_TOKENS
+        + n * (_EXTRACT_PER_MED_TOKENS + _PLAN_PER_MED_TOKENS + _FUSED_DOSES_PER_MED * _PLAN_PER_DOSE_TOKENS)
+    )
@@ -9,4 +9,20 @@ PLAN_SYSTEM_PROMPT = (
     "- If any med has UNKNOWN or PRN frequency, set needs_info=true and ask short questions.\n"
     "- Keep it simple: MORNING/AFTERNOON/NIGHT.\n"
     "- Output ONLY valid JSON matching the schema.\n"
+)
+
+FUSED_SYSTEM_PROMPT = (
+    "You read prescription text and produce a medication reminder plan in ONE answer.\n"
+    "Step 1 - meds (extraction rules):\n"
+    "- Use ONLY what is explicitly present. Do NOT invent medicine names or frequency.\n"
+    "- Convert frequency to one of: OD, BID, TID, QID, WEEKLY, PRN, UNKNOWN, EVERY_N_DAYS.\n"
+    "- If frequency is missing, set frequency='UNKNOWN'.\n"
+    "- duration_days: 'for 5 days' -> 5, 'x 7 days' -> 7, 'for 2 weeks' -> 14; omit if not stated.\n"
+    "Step 2 - schedule (planning rules):\n"
+    "- Do NOT diagnose, prescribe, or claim interactions.\n"
+    "- Schedule ONLY the meds from step 1, matching their frequency.\n"
+    "- If any med has UNKNOWN or PRN frequency, set needs_info=true and ask short questions.\n"
+    "- Keep it simple: MORNING/AFTERNOON/NIGHT.\n"
+    "Write the meds array first, then the schedule.\n"
+    "- Output ONLY valid JSON matching the schema.\n"
 )
\ No newline at end of file
@@ -0,0 +1,363 @@
+# app/services/llm/routing.py
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.core.llm_config import (
+    LLM_ROUTE_TARGETS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_DEFAULT_DELAY_S,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_COOLDOWN_S,
+    LLM_ROUTER_MAX_WORKERS,
+)
+from app.core.metrics import LLM_UPSTREAM_SECONDS
+
+T = TypeVar("T")
+
+class RoutingError(RuntimeError):
+    pass
+
+class Target:
+    """One upstream: HF provider (or OpenAI-compatible base_url) + model."""
+
+    __slots__ = ("provider", "model", "base_url")
+
+    def __init__(self, provider: str, model: str, base_url: str = ""):
+        self.provider = provider
+        self.model = model
+        self.base_url = base_url
+
+    @property
+    def label(self) -> str:
+        return f"{self.base_url or self.provider}|{self.model}"
+
+    def __repr__(self) -> str:
+        return f"Target({self.label})"
+
+CLOSED, OPEN, HALF_OPEN = "CLOSED", "OPEN", "HALF_OPEN"
+
+class CircuitBreaker:
+    """
+    CLOSED -> OPEN after `failures` consecutive errors.
+    OPEN -> HALF_OPEN after cooldown_s: exactly one probe request is let through;
+    success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failures: int, cooldown_s: float):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self.state = CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.trips = 0
+
+    def allow(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown_s:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record(self, ok: bool, now: float) -> None:
+        if ok:
+            self.state = CLOSED
+            self.consecutive = 0
+            self.probe_in_flight = False
+            return
+        self.consecutive += 1
+        if self.state == HALF_OPEN or self.consecutive >= self.failures:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = now
+            self.probe_in_flight = False
+
+class _TargetStats:
+    def __init__(self) -> None:
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_S)
+        self.latencies: "deque[float]" = deque(maxlen=256)
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+        self.cancelled = 0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+class ProviderRouter:
+    """
+    Ordered list of targets with per-target circuit breakers.
+    call()/acall() send to the first healthy target; if it hasn't answered within
+    its observed p95 latency, a hedged request goes to the next healthy target.
+    The first success wins and the losers are cancelled (async) or ignored (threads).
+    Errors fail over to the next target immediately.
+    """
+
+    def __init__(self, extra_targets: List[Dict[str, str]], *, hedge_enabled: bool = LLM_HEDGE_ENABLED):
+        self.extra_targets = extra_targets
+        self.hedge_enabled = hedge_enabled
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _TargetStats] = {}
+        self._pool = ThreadPoolExecutor(max_workers=LLM_ROUTER_MAX_WORKERS, thread_name_prefix="llm-route")
+        self.calls = 0
+        self.hedged_calls = 0
+
+    def targets_for(self, provider: str, model: str, base_url: str = "") -> List[Target]:
+        targets = [Target(provider, model, base_url)]
+        for spec in self.extra_targets:
+            t = Target(
+                spec.get("provider") or provider,
+                spec.get("model") or model,
+                spec.get("base_url") or "",
+            )
+            if all(t.label != x.label for x in targets):
+                targets.append(t)
+        return targets
+
+    # ---------------------------
+    # bookkeeping
+    # ---------------------------
+    def _s(self, target: Target) -> _TargetStats:
+        st = self._stats.get(target.label)
+        if st is None:
+            st = self._stats[target.label] = _TargetStats()
+        return st
+
+    def _next_allowed(self, targets: List[Target], start: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            for i in range(start, len(targets)):
+                if self._s(targets[i]).breaker.allow(now):
+                    return i
+        return -1
+
+    def _hedge_delay(self, target: Target) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        with self._lock:
+            p95 = self._s(target).p95()
+        return p95 if p95 is not None else LLM_HEDGE_DEFAULT_DELAY_S
+
+    def _record(self, target: Target, ok: bool, elapsed: float) -> None:
+        LLM_UPSTREAM_SECONDS.observe(elapsed, target=target.label, outcome="ok" if ok else "error")
+        with self._lock:
+            st = self._s(target)
+            st.requests += 1
+            if ok:
+                st.latencies.append(elapsed)
+            else:
+                st.errors += 1
+            st.breaker.record(ok, time.monotonic())
+
+    def _run(self, target: Target, fn: Callable[[Target], T]) -> T:
+        t0 = time.monotonic()
+        try:
+            out = fn(target)
+        except Exception:
+            self._record(target, False, time.monotonic() - t0)
+            raise
+        self._record(target, True, time.monotonic() - t0)
+        return out
+
+    async def _arun(self, target: Target, fn: Callable[[Target], Awaitable[T]]) -> T:
+        t0 = time.monotonic()
+        try:
+            out = await fn(target)
+        except asyncio.CancelledError:
+            with self._lock:
+                self._s(target).cancelled += 1
+                self._s(target).breaker.probe_in_flight = False
+            raise
+        except Exception:
+            self._record(target, False, time.monotonic() - t0)
+            raise
+        self._record(target, True, time.monotonic() - t0)
+        return out
+
+    def _won(self, target: Target, hedged: bool) -> None:
+        with self._lock:
+            self._s(target).wins += 1
+            self.calls += 1
+            if hedged:
+                self.hedged_calls += 1
+
+    def _hedge_sent(self, target: Target) -> None:
+        with self._lock:
+            self._s(target).hedges += 1
+
+    # ---------------------------
+    # sync
+    # ---------------------------
+    def call(self, targets: List[Target], fn: Callable[[Target], T]) -> T:
+        nxt = self._next_allowed(targets, 0)
+        if nxt < 0:
+            raise RoutingError(f"All LLM targets unavailable (circuits open): {[t.label for t in targets]}")
+
+        pending: Dict[Future, Target] = {}
+        errors: List[str] = []
+        hedged = False       # a second request was actually launched
+        hedge_tried = False  # the hedge delay expired once (with or without a target to hedge to)
+
+        def launch(i: int) -> None:
+            pending[self._pool.submit(self._run, targets[i], fn)] = targets[i]
+
+        launch(nxt)
+        while pending:
+            lead = next(iter(pending.values()))
+            can_hedge = not hedge_tried and len(pending) == 1
+            timeout = self._hedge_delay(lead) if can_hedge else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # slow lead: hedge to the next healthy target
+                hedge_tried = True
+                i = self._next_allowed(targets, nxt + 1)
+                if i >= 0:
+                    nxt = i
+                    self._hedge_sent(targets[i])
+                    launch(i)
+                    hedged = True
+                continue
+
+            for fut in done:
+                target = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    errors.append(f"{target.label}: {e}")
+                    continue
+                for loser in pending:
+                    loser.cancel()  # no-op if already running; its result is ignored
+                with self._lock:
+                    for loser_target in pending.values():
+                        self._s(loser_target).cancelled += 1
+                self._won(target, hedged)
+                return result
+
+            if not pending:
+                i = self._next_allowed(targets, nxt + 1)
+                if i >= 0:
+                    nxt = i
+                    launch(i)
+
+        raise RoutingError("All LLM targets failed: " + " | ".join(errors))
+
+    # ---------------------------
+    # async
+    # ---------------------------
+    async def acall(self, targets: List[Target], fn: Callable[[Target], Awaitable[T]]) -> T:
+        nxt = self._next_allowed(targets, 0)
+        if nxt < 0:
+            raise RoutingError(f"All LLM targets unavailable (circuits open): {[t.label for t in targets]}")
+
+        pending: Dict["asyncio.Task[T]", Target] = {}
+        errors: List[str] = []
+        hedged = False       # a second request was actually launched
+        hedge_tried = False  # the hedge delay expired once (with or without a target to hedge to)
+
+        def launch(i: int) -> None:
+            pending[asyncio.ensure_future(self._arun(targets[i], fn))] = targets[i]
+
+        launch(nxt)
+        try:
+            while pending:
+                lead = next(iter(pending.values()))
+                can_hedge = not hedge_tried and len(pending) == 1
+                timeout = self._hedge_delay(lead) if can_hedge else None
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedge_tried = True
+                    i = self._next_allowed(targets, nxt + 1)
+                    if i >= 0:
+                        nxt = i
+                        self._hedge_sent(targets[i])
+                        launch(i)
+                        hedged = True
+                    continue
+
+                for task in done:
+                    target = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(f"{target.label}: {task.exception()}")
+                        continue
+                    self._won(target, hedged)
+                    return task.result()
+
+                if not pending:
+                    i = self._next_allowed(targets, nxt + 1)
+                    if i >= 0:
+                        nxt = i
+                        launch(i)
+        finally:
+            for task in pending:
+                task.cancel()  # losers (or everything, if our caller was cancelled)
+
+        raise RoutingError("All LLM targets failed: " + " | ".join(errors))
+
+    def pick(self, targets: List[Target]) -> Target:
+        """First healthy target, for calls that can't be hedged (streaming)."""
+        i = self._next_allowed(targets, 0)
+        if i < 0:
+            raise RoutingError(f"All LLM targets unavailable (circuits open): {[t.label for t in targets]}")
+        return targets[i]
+
+    def record(self, target: Target, ok: bool, elapsed: float) -> None:
+        self._record(target, ok, elapsed)
+
+    def reset(self) -> None:
+        """Forget breakers/latency history (tests, benchmarks)."""
+        with self._lock:
+            self._stats.clear()
+            self.calls = 0
+            self.hedged_calls = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hedge_enabled": self.hedge_enabled,
+                "calls": self.calls,
+                "hedged_calls": self.hedged_calls,
+                "hedge_rate": round(self.hedged_calls / self.calls, 3) if self.calls else 0.0,
+                "targets": {
+                    label: {
+                        "state": st.breaker.state,
+                        "trips": st.breaker.trips,
+                        "consecutive_failures": st.breaker.consecutive,
+                        "requests": st.requests,
+                        "errors": st.errors,
+                        "wins": st.wins,
+                        "hedges_sent": st.hedges,
+                        "cancelled": st.cancelled,
+                        "p95_ms": round(st.p95() * 1000, 1) if st.p95() is not None else None,
+                        "samples": len(st.latencies),
+                    }
+                    for label, st in self._stats.items()
+                },
+            }
+
+def _parse_targets(raw: str) -> List[Dict[str, str]]:
+    if not raw.strip():
+        return []
+    try:
+        specs = json.loads(raw)
+    except ValueError:
+        return []
+    return [s for s in specs if isinstance(s, dict)] if isinstance(specs, list) else []
+
+ROUTER = ProviderRouter(_parse_targets(LLM_ROUTE_TARGETS))
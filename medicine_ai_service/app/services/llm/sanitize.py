@@ -3,6 +3,7 @@ import re
 import uuid
 from typing import Any, Dict, List, Tuple
 from app.utils.time_conflict import resolve_time_conflicts
+from app.services.formulary import canonical_med_name
 
 _TIME_RE = re.compile(r"^\d{2}:\d{2}$")
 
@@ -18,6 +19,16 @@ def _every_n_days(freq: str) -> int | None:
     m = _EVERY_N_RE.match(f)
     return int(m.group(1)) if m else None
 
+def _repeat_days(freq: str) -> int | None:
+    """repeat_every_days stored on the dose (WEEKLY is every 7 days)."""
+    if (freq or "").upper().strip() == "WEEKLY":
+        return 7
+    return _every_n_days(freq)
+
+def med_name_key(name: Any) -> str:
+    """Case/spacing-insensitive med name, as matched between the plan input and the LLM's schedule."""
+    return " ".join(str(name or "").split()).lower()
+
 def _dose_id() -> str:
     return "dose_" + uuid.uuid4().hex[:10]
 
@@ -101,14 +112,19 @@ def sanitize_plan_output(raw: Dict[str, Any], meds: List[Dict[str, Any]]) -> Dic
     - precautions/actions always present (if schedule exists)
     - 'why' is deterministic (no medical hallucinations)
     """
-    med_map = {m["name"].strip().lower(): m for m in meds if m.get("name")}
+    med_map = {med_name_key(m["name"]): m for m in meds if m.get("name")}
+    for m in list(med_map.values()):
+        med_map.setdefault(med_name_key(canonical_med_name(m["name"].strip())), m)
     cleaned_sched: List[Dict[str, Any]] = []
 
     for s in (raw.get("schedule") or []):
         mn = str(s.get("med_name", "")).strip()
-        key = mn.lower()
+        key = med_name_key(mn)
         if key not in med_map:
-            continue
+            # LLM echoed an OCR spelling ("Metfomin") of a med we already canonicalized
+            key = med_name_key(canonical_med_name(mn))
+            if key not in med_map:
+                continue
 
         t = str(s.get("time_local", "")).strip()
         b = str(s.get("bucket", "")).strip()
@@ -131,7 +147,7 @@ def sanitize_plan_output(raw: Dict[str, Any], meds: List[Dict[str, Any]]) -> Dic
             "bucket": b,
             "notes": " • ".join(notes),
         }
-        n = _every_n_days((m.get("frequency") or ""))
+        n = _repeat_days((m.get("frequency") or ""))
         if n:
             dose["repeat_every_days"] = n
         dur = m.get("duration_days")
@@ -149,7 +165,7 @@ def sanitize_plan_output(raw: Dict[str, Any], meds: List[Dict[str, Any]]) -> Dic
         if exp == 0:
             continue  # PRN/UNKNOWN => no auto reminders
 
-        existing = [d for d in cleaned_sched if d["med_name"].lower() == name.lower()]
+        existing = [d for d in cleaned_sched if med_name_key(d["med_name"]) == med_name_key(name)]
         if len(existing) == exp:
             final_sched.extend(existing)
             continue
@@ -163,7 +179,7 @@ def sanitize_plan_output(raw: Dict[str, Any], meds: List[Dict[str, Any]]) -> Dic
             notes.append(str(m["strength"]).strip())
         note_str = " • ".join(notes)
 
-        n = _every_n_days(freq)
+        n = _repeat_days(freq)
 
         for bucket, hhmm in slots:
             dose = {
@@ -1,4 +1,5 @@
 # app/services/llm/schemas.py
+from app.services.llm.extraction_schema import MEDS_SCHEMA
 
 PLAN_SCHEMA = {
     "type": "object",
@@ -37,4 +38,14 @@ PLAN_SCHEMA = {
         },
     },
     "required": ["needs_info", "questions", "schedule", "precautions", "why", "actions"],
+}
+
+# extract + plan in one response; "meds" comes first so it can be streamed before the schedule
+FUSED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "meds": MEDS_SCHEMA["properties"]["meds"],
+        **PLAN_SCHEMA["properties"],
+    },
+    "required": ["meds", *PLAN_SCHEMA["required"]],
 }
\ No newline at end of file
@@ -0,0 +1,133 @@
+# app/services/llm/singleflight.py
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.llm_config import LLM_SINGLEFLIGHT_ENABLED
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls: the first caller for a key runs the work,
+    concurrent callers with the same key wait and share its result (or exception).
+    do() is for threads, ado() for asyncio; followers get a deep copy of the result.
+
+    timeout_s is the caller's budget for the work: only callers with the same budget
+    share a call (so a leader's timeout is never handed to a caller that had more time),
+    and nobody waits on someone else's call longer than its own budget (TimeoutError).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Any], "asyncio.Task[Any]"] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0, "shared_errors": 0, "wait_timeouts": 0}
+
+    def _wait_timeout(self, timeout_s: Optional[float]) -> TimeoutError:
+        with self._lock:
+            self._stats["wait_timeouts"] += 1
+        return TimeoutError(f"{self.name}: in-flight call gave no result within {timeout_s}s")
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout_s: Optional[float] = None) -> Any:
+        if not LLM_SINGLEFLIGHT_ENABLED:
+            return fn()
+
+        key = (key, timeout_s)
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                    if call.error is not None and call.waiters:
+                        self._stats["shared_errors"] += call.waiters
+                call.done.set()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        if not call.done.wait(timeout_s):
+            raise self._wait_timeout(timeout_s)
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    async def ado(self, key: Hashable, coro_fn: Callable[[], Awaitable[Any]], timeout_s: Optional[float] = None) -> Any:
+        if not LLM_SINGLEFLIGHT_ENABLED:
+            return await coro_fn()
+
+        loop = asyncio.get_running_loop()
+        k = (id(loop), (key, timeout_s))
+        with self._lock:
+            self._stats["calls"] += 1
+            task = self._tasks.get(k)
+            leader = task is None
+            if leader:
+                # run the work as its own task so one caller's cancellation doesn't cancel the rest
+                task = loop.create_task(coro_fn())
+                self._tasks[k] = task
+                self._stats["executed"] += 1
+                task.add_done_callback(lambda t, k=k: self._forget(k, t))
+            else:
+                self._stats["coalesced"] += 1
+
+        try:
+            # followers give up after their own budget; shield keeps the call running for the rest
+            result = await asyncio.wait_for(asyncio.shield(task), None if leader else timeout_s)
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            if not task.done():  # our wait ran out; the call itself goes on
+                raise self._wait_timeout(timeout_s) from None
+            if not leader:
+                with self._lock:
+                    self._stats["shared_errors"] += 1
+            raise
+        return result if leader else copy.deepcopy(result)
+
+    def _forget(self, k: Tuple[int, Any], task: "asyncio.Task[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(k) is task:
+                del self._tasks[k]
+        if not task.cancelled():
+            task.exception()  # mark retrieved (avoid "exception was never retrieved" noise)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "enabled": LLM_SINGLEFLIGHT_ENABLED,
+                **self._stats,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+# raw chat calls (model, system, user, schema, ...)
+HF_FLIGHT = SingleFlight("hf_chat_json")
+OLLAMA_FLIGHT = SingleFlight("ollama_chat_json")
+# wrapper-level (cache lookup + LLM call) for extraction/planning
+EXTRACT_FLIGHT = SingleFlight("llm_extract_meds")
+PLAN_FLIGHT = SingleFlight("llm_build_plan")
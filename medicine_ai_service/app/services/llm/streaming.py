@@ -0,0 +1,55 @@
+# app/services/llm/streaming.py
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.hf_client import _safe_json_parse
+from app.services.llm.backends import PLAN, backend_for
+from app.services.llm.json_stream import JSONArrayItemStream
+from app.services.llm.schemas import PLAN_SCHEMA, FUSED_SCHEMA
+from app.services.llm.prompts import PLAN_SYSTEM_PROMPT, FUSED_SYSTEM_PROMPT
+from app.services.llm.prompt_builder import (
+    plan_user_message, plan_max_tokens, fused_user_message, fused_max_tokens,
+)
+from app.services.llm.extraction_sanitize import sanitize_extracted_meds
+from app.services.llm.sanitize import sanitize_plan_output
+
+StreamEvent = Tuple[str, Dict[str, Any]]
+
+async def stream_plan_events(
+    *,
+    meds: Optional[List[Dict[str, Any]]],
+    text: str,
+    input_text: str,
+    timezone: str,
+    timeout_s: Optional[float] = None,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Stream a plan from the LLM.
+      meds given  -> planner prompt; emits ("schedule_item", ...) as entries parse
+      meds absent -> fused prompt on `text`; emits ("med", ...) then ("schedule_item", ...)
+    The last event is ("llm_done", {"meds": sanitized meds, "plan": sanitized plan}).
+    Partial events are previews; only llm_done is sanitized as a whole.
+    """
+    if meds:
+        system, user, schema = PLAN_SYSTEM_PROMPT, plan_user_message(meds, input_text, timezone), PLAN_SCHEMA
+        max_tokens = plan_max_tokens(meds)
+    else:
+        system, user, schema = FUSED_SYSTEM_PROMPT, fused_user_message(text, input_text, timezone), FUSED_SCHEMA
+        max_tokens = fused_max_tokens(text)
+
+    parser = JSONArrayItemStream(["meds", "schedule"])
+    backend = backend_for(PLAN)
+    async for delta in backend.chat_json_stream(
+        model=backend.model_for(PLAN), system=system, user=user, schema=schema,
+        max_tokens=max_tokens, timeout_s=timeout_s,
+    ):
+        for key, item in parser.feed(delta):
+            if key == "meds":
+                cleaned = sanitize_extracted_meds({"meds": [item]})
+                if cleaned:
+                    yield "med", cleaned[0]
+            else:
+                yield "schedule_item", item
+
+    raw = _safe_json_parse(parser.text)
+    final_meds = meds if meds else sanitize_extracted_meds(raw)
+    yield "llm_done", {"meds": final_meds, "plan": sanitize_plan_output(raw, final_meds)}
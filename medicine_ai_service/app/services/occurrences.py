@@ -0,0 +1,226 @@
+# app/services/occurrences.py
+"""
+Expands a plan's schedule into concrete dose occurrences.
+
+A dose fires at time_local on day 0 (the plan's start date), then every
+repeat_every_days days (default 1) while the day offset is < duration_days
+(None = ongoing). Occurrences are timezone-aware datetimes in the plan's
+timezone (AgentState["timezone"]); wall times that fall in a DST gap are
+pushed forward by the gap, ambiguous ones use the first (fold=0) instant.
+
+Everything is lazy: generators yield one occurrence at a time, and range
+queries jump straight to the first day >= t0 with integer arithmetic, so
+"occurrences between t0 and t1" costs O(k) in the k results, not O(days since start).
+count_occurrences_batch answers "how many in [t0, t1)" for many doses at once with NumPy.
+"""
+import heapq
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+_ONGOING = np.iinfo(np.int64).max // 4  # "no duration" in the batch arrays
+
+DateLike = Union[date, str]
+
+@lru_cache(maxsize=256)
+def zone(tz: Optional[str]) -> ZoneInfo:
+    """ZoneInfo for tz; unknown or empty names fall back to DEFAULT_TIMEZONE like the rest of the app."""
+    try:
+        return ZoneInfo(tz or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+def _as_date(d: DateLike) -> date:
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    return date.fromisoformat(str(d)[:10])
+
+def _time_of(dose: Mapping[str, Any]) -> time:
+    h, m = map(int, str(dose.get("time_local") or "09:00").split(":"))
+    return time(h, m)
+
+def _every(dose: Mapping[str, Any]) -> int:
+    n = dose.get("repeat_every_days")
+    return int(n) if n and int(n) > 0 else 1
+
+def _count_limit(dose: Mapping[str, Any]) -> Optional[int]:
+    """Number of occurrences in total, None if ongoing."""
+    dur = dose.get("duration_days")
+    if not dur or int(dur) <= 0:
+        return None
+    return -(-int(dur) // _every(dose))
+
+def _localize(day: date, at: time, tz: ZoneInfo) -> datetime:
+    naive = datetime.combine(day, at)
+    # round trip through UTC normalizes nonexistent (DST gap) wall times
+    return naive.replace(tzinfo=tz).astimezone(timezone.utc).astimezone(tz)
+
+def _as_aware(t: datetime, tz: ZoneInfo) -> datetime:
+    return t if t.tzinfo is not None else t.replace(tzinfo=tz)
+
+def start_date_for(state: Mapping[str, Any]) -> date:
+    """The plan's start date (plan["start_date"]), else today in the plan's timezone."""
+    plan = state.get("plan") or {}
+    if plan.get("start_date"):
+        return _as_date(plan["start_date"])
+    return datetime.now(zone(state.get("timezone"))).date()
+
+# ---------------------------
+# One dose
+# ---------------------------
+
+def dose_occurrences(
+    dose: Mapping[str, Any],
+    start_date: DateLike,
+    tz: Optional[str] = None,
+    t0: Optional[datetime] = None,
+) -> Iterator[datetime]:
+    """Occurrences of one dose in order, starting at the first one >= t0 (naive t0 = plan-local time)."""
+    zi = zone(tz)
+    start = _as_date(start_date)
+    at = _time_of(dose)
+    every = _every(dose)
+    limit = _count_limit(dose)
+
+    i = 0
+    if t0 is not None:
+        t0 = _as_aware(t0, zi)
+        offset = (t0.astimezone(zi).date() - start).days
+        # one step early so the DST-normalized instant of that day is compared, not guessed
+        i = max(0, offset // every - 1)
+
+    while limit is None or i < limit:
+        dt = _localize(start + timedelta(days=i * every), at, zi)
+        i += 1
+        if t0 is not None and dt < t0:
+            continue
+        yield dt
+
+def occurrences_between(
+    dose: Mapping[str, Any],
+    start_date: DateLike,
+    tz: Optional[str],
+    t0: datetime,
+    t1: datetime,
+) -> Iterator[datetime]:
+    """Occurrences of one dose with t0 <= dt < t1."""
+    t1 = _as_aware(t1, zone(tz))
+    for dt in dose_occurrences(dose, start_date, tz, t0=t0):
+        if dt >= t1:
+            return
+        yield dt
+
+def next_occurrence(
+    dose: Mapping[str, Any],
+    start_date: DateLike,
+    tz: Optional[str],
+    after: datetime,
+) -> Optional[datetime]:
+    """First occurrence strictly after `after`, None once the course is over."""
+    for dt in dose_occurrences(dose, start_date, tz, t0=after):
+        if dt > _as_aware(after, zone(tz)):
+            return dt
+    return None
+
+# ---------------------------
+# Whole plans
+# ---------------------------
+
+def plan_occurrences(
+    schedule: Sequence[Mapping[str, Any]],
+    start_date: DateLike,
+    tz: Optional[str] = None,
+    t0: Optional[datetime] = None,
+    t1: Optional[datetime] = None,
+) -> Iterator[Tuple[datetime, Mapping[str, Any]]]:
+    """
+    (datetime, dose) for every dose of a schedule in time order, merged lazily
+    (heap of one pending occurrence per dose). Unbounded unless every dose has a duration or t1 is set.
+    """
+    def tagged(i: int, d: Mapping[str, Any]) -> Iterator[Tuple[datetime, int, Mapping[str, Any]]]:
+        for dt in dose_occurrences(d, start_date, tz, t0=t0):
+            yield dt, i, d
+
+    streams = [tagged(i, d) for i, d in enumerate(schedule)]
+    end = _as_aware(t1, zone(tz)) if t1 is not None else None
+    for dt, _, d in heapq.merge(*streams):
+        if end is not None and dt >= end:
+            return
+        yield dt, d
+
+def state_occurrences(
+    state: Mapping[str, Any],
+    t0: Optional[datetime] = None,
+    t1: Optional[datetime] = None,
+) -> Iterator[Tuple[datetime, Mapping[str, Any]]]:
+    """plan_occurrences for an AgentState (plan schedule, plan start date, state timezone)."""
+    schedule = (state.get("plan") or {}).get("schedule") or []
+    return plan_occurrences(schedule, start_date_for(state), state.get("timezone"), t0=t0, t1=t1)
+
+# ---------------------------
+# Batched counts
+# ---------------------------
+
+def _local_day_minute(t: datetime, tz: str) -> Tuple[int, int]:
+    lt = _as_aware(t, zone(tz)).astimezone(zone(tz))
+    return lt.toordinal(), lt.hour * 60 + lt.minute
+
+def count_occurrences_batch(
+    plans: Iterable[Mapping[str, Any]],
+    t0: datetime,
+    t1: datetime,
+) -> Dict[str, np.ndarray]:
+    """
+    Occurrences in [t0, t1) for every dose of many plans at once.
+
+    plans: [{"plan_id", "schedule", "start_date", "timezone"}]
+    Returns {plan_id: int64 array of counts aligned with that plan's schedule}.
+
+    The range ends are converted to each plan's local wall clock once per timezone
+    and compared on (day, minute), so an occurrence sitting inside the hour of a DST
+    change can be counted on the other side of t0/t1; use the generators when that matters.
+    """
+    ids: List[str] = []
+    sizes: List[int] = []
+    start, minute, every, limit, lo_day, lo_min, hi_day, hi_min = ([] for _ in range(8))
+    bounds: Dict[str, Tuple[int, int, int, int]] = {}
+
+    for p in plans:
+        tz = p.get("timezone") or DEFAULT_TIMEZONE
+        if tz not in bounds:
+            bounds[tz] = (*_local_day_minute(t0, tz), *_local_day_minute(t1, tz))
+        b = bounds[tz]
+        s = _as_date(p["start_date"]).toordinal()
+        schedule = p.get("schedule") or []
+        ids.append(str(p["plan_id"]))
+        sizes.append(len(schedule))
+        for d in schedule:
+            at = _time_of(d)
+            start.append(s)
+            minute.append(at.hour * 60 + at.minute)
+            every.append(_every(d))
+            n = _count_limit(d)
+            limit.append(_ONGOING if n is None else n)
+            lo_day.append(b[0])
+            lo_min.append(b[1])
+            hi_day.append(b[2])
+            hi_min.append(b[3])
+
+    start_a, minute_a, every_a, limit_a = (np.asarray(x, dtype=np.int64) for x in (start, minute, every, limit))
+    lo_day_a, lo_min_a, hi_day_a, hi_min_a = (np.asarray(x, dtype=np.int64) for x in (lo_day, lo_min, hi_day, hi_min))
+
+    # first day on/after t0 at the dose's minute, last day before t1 at the dose's minute
+    first_day = lo_day_a + (minute_a < lo_min_a)
+    last_day = hi_day_a - (minute_a >= hi_min_a)
+    # occurrence k falls on start + k*every, 0 <= k < limit
+    k_lo = np.maximum(0, -(-(first_day - start_a) // every_a))
+    k_hi = np.minimum(limit_a - 1, np.floor_divide(last_day - start_a, every_a))
+    counts = np.maximum(0, k_hi - k_lo + 1)
+
+    return dict(zip(ids, np.split(counts, np.cumsum(sizes)[:-1]) if ids else []))
@@ -1,13 +1,26 @@
+import asyncio
 import json
-from typing import Any, Dict, Optional
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 
 from app.core.llm_config import (
     OLLAMA_BASE_URL,
+    OLLAMA_API_STYLE,
     OLLAMA_TEMPERATURE,
     OLLAMA_TIMEOUT_S,
+    OLLAMA_POOL_MAXSIZE,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_API_KEY,
 )
+from app.core.metrics import LLM_CALL_SECONDS, LLM_JSON_REPAIRS, LLM_TOKENS
+from app.services.llm.cache import content_hash
+from app.services.llm.singleflight import OLLAMA_FLIGHT
 
 class OllamaError(RuntimeError):
     pass
@@ -24,42 +37,364 @@ def _safe_json_parse(text: str) -> Dict[str, Any]:
     end = text.rfind("}")
     if start != -1 and end != -1 and end > start:
         try:
-            return json.loads(text[start : end + 1])
+            out = json.loads(text[start : end + 1])
+            LLM_JSON_REPAIRS.inc(result="extracted")
+            return out
         except Exception:
             pass
 
+    LLM_JSON_REPAIRS.inc(result="failed")
     raise OllamaError(f"Invalid JSON from LLM: {text[:200]}...")
 
+# ---------------------------
+# Pooled keep-alive session
+# ---------------------------
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_ollama_session() -> requests.Session:
+    """
+    One process-wide Session: TCP connections to the model server are kept alive
+    and reused, up to OLLAMA_POOL_MAXSIZE concurrent connections (callers beyond
+    that wait for a free connection instead of opening more).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, OLLAMA_POOL_MAXSIZE), pool_block=True)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            if OLLAMA_API_KEY:
+                s.headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
+            _session = s
+        return _session
+
+# aiohttp sessions are bound to the loop that created them: one per running loop
+LoopRef = "weakref.ReferenceType[asyncio.AbstractEventLoop]"
+_async_sessions: "Dict[LoopRef, aiohttp.ClientSession]" = {}
+
+def _loop_gone(ref: LoopRef) -> bool:
+    loop = ref()
+    return loop is None or loop.is_closed()
+
+def get_ollama_async_session() -> aiohttp.ClientSession:
+    """
+    Async twin of get_ollama_session for the running loop: keep-alive connections,
+    at most OLLAMA_POOL_MAXSIZE at once (callers beyond that wait for a free one),
+    and no worker thread held while a call or stream is in flight.
+    """
+    ref = weakref.ref(asyncio.get_running_loop())
+    with _session_lock:
+        # a closed or collected loop's session can no longer be used (or closed)
+        for stale in [k for k in _async_sessions if _loop_gone(k)]:
+            _async_sessions.pop(stale)
+        session = _async_sessions.get(ref)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max(1, OLLAMA_POOL_MAXSIZE)),
+                headers={"Authorization": f"Bearer {OLLAMA_API_KEY}"} if OLLAMA_API_KEY else None,
+            )
+            _async_sessions[ref] = session
+        return session
+
+def _close_async_session(ref: LoopRef, session: aiohttp.ClientSession) -> None:
+    """Schedules session.close() on the loop that owns it (no-op if that loop is gone or closed)."""
+    if _loop_gone(ref):
+        return
+    loop = ref()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    try:
+        if loop is running:
+            loop.create_task(session.close())
+        else:
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+    except RuntimeError:  # loop shut down in between
+        pass
+
+async def aclose_ollama_session() -> None:
+    """Closes the running loop's aiohttp session (app shutdown)."""
+    ref = weakref.ref(asyncio.get_running_loop())
+    with _session_lock:
+        session = _async_sessions.pop(ref, None)
+    if session is not None:
+        await session.close()
+
+def reset_ollama_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        sessions = list(_async_sessions.items())
+        _async_sessions.clear()
+    for ref, session in sessions:
+        _close_async_session(ref, session)
+
+def _messages(system: str, user: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+def _request(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    stream: bool,
+):
+    """(url, payload) for the configured API style."""
+    temp = temperature if temperature is not None else OLLAMA_TEMPERATURE
+    if OLLAMA_API_STYLE == "openai":
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": _messages(system, user),
+            "temperature": temp,
+            "stream": stream,
+            "response_format": (
+                {"type": "json_schema", "json_schema": {"name": "MedPlan", "schema": schema, "strict": True}}
+                if schema else {"type": "json_object"}
+            ),
+        }
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        return f"{OLLAMA_BASE_URL}/v1/chat/completions", payload
+
+    options: Dict[str, Any] = {"temperature": temp}
+    if max_tokens:
+        options["num_predict"] = max_tokens
+    payload = {
+        "model": model,
+        "messages": _messages(system, user),
+        "stream": stream,
+        # structured output: JSON schema if given, else plain JSON mode
+        "format": schema if schema is not None else "json",
+        "options": options,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    return f"{OLLAMA_BASE_URL}/api/chat", payload
+
+def _post(url: str, payload: Dict[str, Any], timeout_s: Optional[float], stream: bool) -> requests.Response:
+    try:
+        r = get_ollama_session().post(url, json=payload, timeout=timeout_s or OLLAMA_TIMEOUT_S, stream=stream)
+    except requests.RequestException as e:
+        raise OllamaError(f"Ollama request failed: {e}") from e
+    if r.status_code >= 400:
+        text = r.text
+        r.close()
+        raise OllamaError(f"Ollama {r.status_code}: {text[:300]}")
+    return r
+
+def _content(data: Dict[str, Any]) -> str:
+    if OLLAMA_API_STYLE == "openai":
+        return ((data.get("choices") or [{}])[0].get("message") or {}).get("content", "")
+    return (data.get("message") or {}).get("content", "")
+
+def _record_usage(model: str, data: Dict[str, Any]) -> None:
+    if OLLAMA_API_STYLE == "openai":
+        usage = data.get("usage") or {}
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    else:
+        prompt, completion = data.get("prompt_eval_count"), data.get("eval_count")
+    LLM_TOKENS.inc(int(prompt or 0), model=model, kind="prompt")
+    LLM_TOKENS.inc(int(completion or 0), model=model, kind="completion")
+
+def _stream_delta(line: str) -> Tuple[Optional[str], bool]:
+    """(content delta, stream finished) for one streamed line (SSE for openai style, NDJSON for ollama)."""
+    if not line:
+        return None, False
+    if OLLAMA_API_STYLE == "openai":
+        if not line.startswith("data:"):
+            return None, False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None, True
+        choices = json.loads(data).get("choices") or []
+        return ((choices[0].get("delta") or {}).get("content")) if choices else None, False
+    chunk = json.loads(line)
+    if chunk.get("error"):
+        raise OllamaError(f"Ollama stream error: {chunk['error']}")
+    return (chunk.get("message") or {}).get("content"), bool(chunk.get("done"))
+
+def _fingerprint(model, system, user, schema, temperature, max_tokens) -> str:
+    return content_hash(model, system, user, schema, temperature, max_tokens)
+
+def _ollama_chat_json_once(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    timeout_s: Optional[float],
+) -> Dict[str, Any]:
+    url, payload = _request(
+        model=model, system=system, user=user, schema=schema,
+        temperature=temperature, max_tokens=max_tokens, stream=False,
+    )
+    r = _post(url, payload, timeout_s, stream=False)
+    data = r.json()
+    _record_usage(model, data)
+    return _safe_json_parse(_content(data))
+
 def ollama_chat_json(
+    *,
     model: str,
     system: str,
     user: str,
     schema: Optional[Dict[str, Any]] = None,
     temperature: Optional[float] = None,
-    timeout_s: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[float] = None,
 ) -> Dict[str, Any]:
+    """Chat completion against the local model server; returns the parsed JSON answer (coalesced, see OLLAMA_FLIGHT)."""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        out = OLLAMA_FLIGHT.do(
+            _fingerprint(model, system, user, schema, temperature, max_tokens),
+            lambda: _ollama_chat_json_once(
+                model=model, system=system, user=user, schema=schema,
+                temperature=temperature, max_tokens=max_tokens, timeout_s=timeout_s,
+            ),
+            timeout_s,
+        )
+        outcome = "ok"
+        return out
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - t0, model=model, outcome=outcome)
+
+def ollama_chat_json_stream(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+) -> Iterator[str]:
     """
-    Calls Ollama /api/chat and returns JSON from assistant message content.
-    We enforce JSON output with `format` when possible.
+    Yield content deltas as the model generates them.
+    Ollama streams NDJSON ({"message": {"content"}, "done"}); OpenAI-style servers stream SSE.
     """
-    url = f"{OLLAMA_BASE_URL}/chat"
-    payload: Dict[str, Any] = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        "stream": False,
-        "options": {"temperature": temperature if temperature is not None else OLLAMA_TEMPERATURE},
-    }
-    # If schema is provided, ask Ollama for structured JSON output
-    if schema is not None:
-        payload["format"] = schema  # many models support JSON schema here
+    url, payload = _request(
+        model=model, system=system, user=user, schema=schema,
+        temperature=temperature, max_tokens=max_tokens, stream=True,
+    )
+    r = _post(url, payload, timeout_s, stream=True)
+    with r:
+        for line in r.iter_lines(decode_unicode=True):
+            delta, finished = _stream_delta(line)
+            if delta:
+                yield delta
+            if finished:
+                break
 
-    r = requests.post(url, json=payload, timeout=timeout_s or OLLAMA_TIMEOUT_S)
-    if r.status_code >= 400:
-        raise OllamaError(f"Ollama {r.status_code}: {r.text}")
+# ---------------------------
+# Async (aiohttp)
+# ---------------------------
+async def _ollama_chat_json_once_async(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]],
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    timeout_s: Optional[float],
+) -> Dict[str, Any]:
+    url, payload = _request(
+        model=model, system=system, user=user, schema=schema,
+        temperature=temperature, max_tokens=max_tokens, stream=False,
+    )
+    timeout = aiohttp.ClientTimeout(total=timeout_s or OLLAMA_TIMEOUT_S)
+    try:
+        async with get_ollama_async_session().post(url, json=payload, timeout=timeout) as r:
+            if r.status >= 400:
+                raise OllamaError(f"Ollama {r.status}: {(await r.text())[:300]}")
+            data = await r.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise OllamaError(f"Ollama request failed: {e!r}") from e
+    _record_usage(model, data)
+    return _safe_json_parse(_content(data))
 
-    data = r.json()
-    content = (data.get("message") or {}).get("content", "")
-    return _safe_json_parse(content)
\ No newline at end of file
+async def ollama_chat_json_async(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Async twin of ollama_chat_json on the loop's aiohttp session (no worker thread)."""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        out = await OLLAMA_FLIGHT.ado(
+            _fingerprint(model, system, user, schema, temperature, max_tokens),
+            lambda: _ollama_chat_json_once_async(
+                model=model, system=system, user=user, schema=schema,
+                temperature=temperature, max_tokens=max_tokens, timeout_s=timeout_s,
+            ),
+            timeout_s,
+        )
+        outcome = "ok"
+        return out
+    finally:
+        LLM_CALL_SECONDS.observe(time.perf_counter() - t0, model=model, outcome=outcome)
+
+async def ollama_chat_json_stream_async(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Optional[Dict[str, Any]] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    timeout_s: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Async twin of ollama_chat_json_stream. Not coalesced (like hf_chat_json_stream);
+    timeout_s bounds connecting and each read, not the whole generation.
+    """
+    url, payload = _request(
+        model=model, system=system, user=user, schema=schema,
+        temperature=temperature, max_tokens=max_tokens, stream=True,
+    )
+    t = timeout_s or OLLAMA_TIMEOUT_S
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=t, sock_read=t)
+    try:
+        async with get_ollama_async_session().post(url, json=payload, timeout=timeout) as r:
+            if r.status >= 400:
+                raise OllamaError(f"Ollama {r.status}: {(await r.text())[:300]}")
+            async for raw in r.content:
+                delta, finished = _stream_delta(raw.decode("utf-8").strip())
+                if delta:
+                    yield delta
+                if finished:
+                    break
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise OllamaError(f"Ollama request failed: {e!r}") from e
+
+def ollama_pool_stats() -> Dict[str, Any]:
+    with _session_lock:
+        active = _session is not None
+        async_sessions = len(_async_sessions)
+    return {
+        "base_url": OLLAMA_BASE_URL,
+        "api_style": OLLAMA_API_STYLE,
+        "session_active": active,
+        "async_sessions": async_sessions,
+        "pool_maxsize": OLLAMA_POOL_MAXSIZE,
+    }
@@ -40,6 +40,7 @@ def build_plan(meds: List[Medication], input_text: str):
                 time_local=hhmm,
                 bucket=bucket,
                 notes=" • ".join(notes),
+                repeat_every_days=7 if m.frequency.upper().strip() == "WEEKLY" else None,
             ))
 
     if schedule:
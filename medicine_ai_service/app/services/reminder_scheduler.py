@@ -0,0 +1,315 @@
+# app/services/reminder_scheduler.py
+"""
+In-process index of the next due occurrence of every reminded dose, across all
+approved plans, so "what is due in the next minute" never touches checkpoints.
+
+One entry per (plan_id, dose_id) holds the dose's recurrence in compact form
+(start day, wall time, every N days, occurrence limit, zone) plus the index of
+its pending occurrence; a min-heap orders entries by that occurrence's epoch time.
+
+  - insert: O(log n) (re-inserting a key replaces it)
+  - cancel: O(1); the heap slot is dropped lazily when it reaches the top, and the
+    heap is compacted once dead slots outnumber live ones, so memory stays O(live doses)
+  - advance(now): pops everything due, fires it once (a dose that fell behind, e.g.
+    while the process was down, is not replayed occurrence by occurrence) and
+    re-inserts its next occurrence after now; an idle tick is one heap peek.
+
+Fed by execute_node (CREATE_REMINDERS) and rebuilt from persisted plans at startup.
+"""
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as time_of_day
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from app.services.occurrences import _as_date, _count_limit, _every, _time_of, start_date_for, zone
+
+@lru_cache(maxsize=2048)
+def _wall_time(hhmm: str) -> Tuple[str, time_of_day]:
+    """One shared ("HH:MM", time) pair per distinct time_local across all entries."""
+    at = _time_of({"time_local": hhmm})
+    return at.strftime("%H:%M"), at
+
+log = logging.getLogger(__name__)
+
+class DueReminder(NamedTuple):
+    plan_id: str
+    dose_id: str
+    due_ts: float      # epoch seconds of the occurrence
+    time_local: str    # "HH:MM" in the plan's timezone
+
+class _Entry:
+    __slots__ = ("plan_id", "dose_id", "start", "hhmm", "at", "every", "limit", "tz", "index", "alive")
+
+    def __init__(self, plan_id: str, dose_id: str, start: date, hhmm: str, every: int, limit: Optional[int], tz: ZoneInfo):
+        self.plan_id = plan_id
+        self.dose_id = dose_id
+        self.start = start
+        self.hhmm, self.at = _wall_time(hhmm)
+        self.every = every
+        self.limit = limit
+        self.tz = tz
+        self.index = 0
+        self.alive = True
+
+    def due_at(self, index: int) -> float:
+        # same instant as occurrences._localize: a fold=0 wall time in a DST gap maps past the gap
+        return datetime.combine(self.start + timedelta(days=index * self.every), self.at, self.tz).timestamp()
+
+    def seek_after(self, ts: float) -> Optional[float]:
+        """Moves index to the first occurrence strictly after ts; returns its epoch time or None (course over)."""
+        local_day = datetime.fromtimestamp(ts, self.tz).date()
+        i = max(self.index, (local_day - self.start).days // self.every - 1)
+        while self.limit is None or i < self.limit:
+            due = self.due_at(i)
+            if due > ts:
+                self.index = i
+                return due
+            i += 1
+        return None
+
+    def step_after(self, ts: float) -> Optional[float]:
+        """seek_after for the common case of an entry that was just due: try the next index first."""
+        i = self.index + 1
+        if self.limit is not None and i >= self.limit:
+            return None
+        due = self.due_at(i)
+        if due > ts:
+            self.index = i
+            return due
+        return self.seek_after(ts)
+
+class ReminderScheduler:
+    def __init__(self, compact_min_dead: int = 1024):
+        self._heap: List[Tuple[float, int, _Entry]] = []
+        self._live: Dict[Tuple[str, str], _Entry] = {}
+        self._by_plan: Dict[str, Set[str]] = {}
+        self._dead = 0
+        self._seq = 0
+        self._compact_min_dead = compact_min_dead
+        self._lock = threading.Lock()
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    # ---------------------------
+    # Insert / cancel
+    # ---------------------------
+
+    def _push(self, due: float, entry: _Entry) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, entry))
+
+    def _cancel_locked(self, key: Tuple[str, str]) -> bool:
+        entry = self._live.pop(key, None)
+        if entry is None:
+            return False
+        entry.alive = False
+        self._dead += 1
+        return True
+
+    def _forget_locked(self, plan_id: str, dose_id: str) -> None:
+        ids = self._by_plan.get(plan_id)
+        if ids is not None:
+            ids.discard(dose_id)
+            if not ids:
+                del self._by_plan[plan_id]
+
+    def _maybe_compact_locked(self) -> None:
+        if self._dead > self._compact_min_dead and self._dead > len(self._live):
+            self._heap = [item for item in self._heap if item[2].alive]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def insert(
+        self,
+        plan_id: str,
+        dose: Mapping[str, Any],
+        start_date: Any,
+        tz: Optional[str],
+        now: Optional[float] = None,
+    ) -> Optional[float]:
+        """Indexes one dose's next occurrence after now; returns its epoch time (None = nothing left to remind)."""
+        now = time.time() if now is None else now
+        entry = _Entry(
+            str(plan_id), str(dose["dose_id"]), _as_date(start_date), str(dose.get("time_local") or "09:00"),
+            _every(dose), _count_limit(dose), zone(tz),
+        )
+        due = entry.seek_after(now)
+        with self._lock:
+            self._cancel_locked((entry.plan_id, entry.dose_id))
+            if due is None:
+                return None
+            self._live[(entry.plan_id, entry.dose_id)] = entry
+            self._push(due, entry)
+            self._maybe_compact_locked()
+        return due
+
+    def cancel(self, plan_id: str, dose_id: str) -> bool:
+        with self._lock:
+            ok = self._cancel_locked((str(plan_id), str(dose_id)))
+            self._forget_locked(str(plan_id), str(dose_id))
+            self._maybe_compact_locked()
+            return ok
+
+    def cancel_plan(self, plan_id: str) -> int:
+        with self._lock:
+            n = sum(self._cancel_locked((plan_id, did)) for did in self._by_plan.pop(plan_id, []))
+            self._maybe_compact_locked()
+            return n
+
+    def schedule_plan(
+        self,
+        plan_id: str,
+        schedule: Sequence[Mapping[str, Any]],
+        start_date: Any,
+        tz: Optional[str],
+        now: Optional[float] = None,
+    ) -> int:
+        """Replaces a plan's reminders with its current schedule; returns how many doses are indexed."""
+        self.cancel_plan(plan_id)
+        start = _as_date(start_date)
+        ids: Set[str] = set()
+        for d in schedule:
+            if d.get("dose_id") and d.get("time_local") and self.insert(plan_id, d, start, tz, now=now) is not None:
+                ids.add(str(d["dose_id"]))
+        if ids:
+            with self._lock:
+                self._by_plan[plan_id] = ids
+        return len(ids)
+
+    def schedule_state(self, state: Mapping[str, Any], now: Optional[float] = None) -> int:
+        """schedule_plan for an AgentState (approved plan, its start date and the state timezone)."""
+        plan = state.get("plan") or {}
+        return self.schedule_plan(
+            str(plan.get("plan_id") or state.get("plan_id")),
+            plan.get("schedule") or [],
+            start_date_for(state),
+            state.get("timezone"),
+            now=now,
+        )
+
+    # ---------------------------
+    # Ticks
+    # ---------------------------
+
+    def advance(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[DueReminder]:
+        """
+        Pops doses due at or before now (at most limit of them) and re-indexes each at its
+        next occurrence. Fewer than limit returned = nothing else is due at now.
+        """
+        now = time.time() if now is None else now
+        out: List[DueReminder] = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now and (limit is None or len(out) < limit):
+                due, _, entry = heapq.heappop(heap)
+                if not entry.alive:
+                    self._dead -= 1
+                    continue
+                out.append(DueReminder(entry.plan_id, entry.dose_id, due, entry.hhmm))
+                nxt = entry.step_after(now)
+                if nxt is None:  # course finished
+                    entry.alive = False
+                    del self._live[(entry.plan_id, entry.dose_id)]
+                    self._forget_locked(entry.plan_id, entry.dose_id)
+                else:
+                    self._push(nxt, entry)
+        self.fired += len(out)
+        return out
+
+    def next_due_ts(self) -> Optional[float]:
+        with self._lock:
+            while self._heap and not self._heap[0][2].alive:
+                heapq.heappop(self._heap)
+                self._dead -= 1
+            return self._heap[0][0] if self._heap else None
+
+    def upcoming(self, within_s: float, now: Optional[float] = None, limit: int = 1000) -> List[DueReminder]:
+        """Next occurrences due by now + within_s (one per dose), earliest first, without popping (walks the heap top-down)."""
+        until = (time.time() if now is None else now) + within_s
+        out: List[DueReminder] = []
+        with self._lock:
+            heap = self._heap
+            frontier = [(heap[0][0], heap[0][1], 0)] if heap else []
+            while frontier and len(out) < limit:
+                due, _, i = heapq.heappop(frontier)
+                if due > until:
+                    break
+                entry = heap[i][2]
+                if entry.alive:
+                    out.append(DueReminder(entry.plan_id, entry.dose_id, due, entry.hhmm))
+                for c in (2 * i + 1, 2 * i + 2):
+                    if c < len(heap):
+                        heapq.heappush(frontier, (heap[c][0], heap[c][1], c))
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "doses": len(self._live),
+                "plans": len(self._by_plan),
+                "heap_size": len(self._heap),
+                "dead": self._dead,
+                "fired": self.fired,
+                "next_due_ts": self._heap[0][0] if self._heap else None,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._live.clear()
+            self._by_plan.clear()
+            self._dead = 0
+
+    # ---------------------------
+    # Startup
+    # ---------------------------
+
+    def rebuild(self, states: Iterable[Mapping[str, Any]], now: Optional[float] = None) -> int:
+        """Re-indexes every approved plan whose CREATE_REMINDERS action was executed."""
+        self.clear()
+        n = 0
+        for state in states:
+            plan = state.get("plan") or {}
+            executed = state.get("executed") or {}
+            # same condition execute_node schedules on
+            if plan.get("status") != "APPROVED" or not (executed.get("CREATE_REMINDERS") or {}).get("ok"):
+                continue
+            n += self.schedule_state(state, now=now)
+        return n
+
+async def run_reminder_loop(
+    scheduler: "ReminderScheduler",
+    tick_s: float,
+    dispatch: Callable[[List[DueReminder]], None],
+    batch: int = 2000,
+) -> None:
+    """
+    Calls advance every tick_s seconds (sooner when the next dose is closer) until cancelled.
+    A busy minute is drained in batches on a worker thread, so neither the event loop nor
+    the scheduler lock is held for the whole burst.
+    """
+    batch = max(1, batch)
+    while True:
+        now = time.time()
+        while True:
+            fired = await asyncio.to_thread(scheduler.advance, now, batch)
+            if fired:
+                try:
+                    dispatch(fired)
+                except Exception:
+                    log.exception("reminder dispatch failed (%d reminders)", len(fired))
+            if len(fired) < batch:
+                break
+        nxt = scheduler.next_due_ts()
+        wait = tick_s if nxt is None else min(tick_s, max(0.0, nxt - time.time()))
+        await asyncio.sleep(wait)
+
+REMINDERS = ReminderScheduler()
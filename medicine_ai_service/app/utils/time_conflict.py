@@ -1,7 +1,8 @@
 # app/utils/time_conflict.py
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 _BUCKET_WINDOWS = {
     # minutes from midnight (inclusive)
@@ -9,6 +10,8 @@ _BUCKET_WINDOWS = {
     "AFTERNOON": (12 * 60, 17 * 60 + 59),
     "NIGHT": (18 * 60, 23 * 60 + 59),
 }
+_BUCKET_DEFAULTS = {"MORNING": 9 * 60, "AFTERNOON": 14 * 60, "NIGHT": 20 * 60}
+_DAY_MAX = 23 * 60 + 59
 
 def _hhmm_to_minutes(hhmm: str) -> int:
     h, m = map(int, hhmm.split(":"))
@@ -24,75 +27,120 @@ def _in_bucket_window(bucket: str, minutes: int) -> bool:
     lo, hi = _BUCKET_WINDOWS.get(bucket, (0, 23 * 60 + 59))
     return lo <= minutes <= hi
 
-def resolve_time_conflicts(
+@lru_cache(maxsize=4096)
+def _grid_mask(lo: int, hi: int, step: int, residue: int) -> int:
+    """Bits for minutes lo..hi that are congruent to residue (mod step)."""
+    mask = 0
+    for m in range(lo + (residue - lo) % step, hi + 1, step):
+        mask |= 1 << m
+    return mask
+
+class MinuteBitmap:
+    """
+    One day's dose occupancy at minute resolution, as a 1440-bit int (bit m set = minute m taken).
+    Placing a dose blocks every minute closer than min_spacing to it, so the nearest free
+    candidate is found with a couple of big-int ops instead of probing slot by slot.
+    """
+
+    def __init__(self, min_spacing: int = 1):
+        self.min_spacing = max(1, min_spacing)
+        self.blocked = 0
+
+    def place(self, minute: int) -> None:
+        lo = max(0, minute - self.min_spacing + 1)
+        hi = min(_DAY_MAX, minute + self.min_spacing - 1)
+        self.blocked |= ((1 << (hi - lo + 1)) - 1) << lo
+
+    def next_free(self, base: int, candidates: int) -> Optional[int]:
+        up = (candidates & ~self.blocked) >> base
+        return base + (up & -up).bit_length() - 1 if up else None
+
+    def prev_free(self, base: int, candidates: int) -> Optional[int]:
+        down = candidates & ~self.blocked & ((1 << (base + 1)) - 1)
+        return down.bit_length() - 1 if down else None
+
+    def nearest_free(self, base: int, candidates: int) -> Optional[int]:
+        fwd = self.next_free(base, candidates)
+        back = self.prev_free(base, candidates)
+        if fwd is None or back is None:
+            return fwd if back is None else back
+        return fwd if fwd - base <= base - back else back  # ties go forward
+
+def allocate_dose_times(
     schedule: List[Dict[str, Any]],
     step_minutes: int = 10,
-) -> List[Dict[str, Any]]:
+    min_spacing_minutes: int = 1,
+    strategy: str = "nearest",
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
-    Ensures no two doses share the same time_local within the same bucket.
-    Strategy:
-      - keep earliest dose at original time
-      - if conflict: shift forward by +step_minutes within bucket window
-      - else shift backward within bucket window
-      - if still can't: leave as-is (rare)
+    Re-times doses so no two are closer than min_spacing_minutes (across buckets too).
+    Candidates are the bucket-window minutes on the step_minutes grid through the
+    dose's own time; doses are placed in time order per bucket.
+
+    strategy: "nearest" = closest free candidate (ties go later);
+              "forward" = first free candidate at/after the time, else the last one before it.
+
+    Returns (schedule, unplaced). Unplaced doses keep their (window-snapped) time and are
+    reported as {"dose_id", "med_name", "bucket", "time_local"}.
     """
     sched = list(schedule)
+    step = max(1, step_minutes)
+    occupancy = MinuteBitmap(min_spacing_minutes)
+    unplaced: List[Dict[str, Any]] = []
 
     for bucket in ("MORNING", "AFTERNOON", "NIGHT"):
-        idxs = [i for i, d in enumerate(sched) if d.get("bucket") == bucket and d.get("time_local")]
-        if not idxs:
-            continue
-
-        def key_fn(i: int):
-            d = sched[i]
-            t = str(d.get("time_local", "00:00"))
+        lo, hi = _BUCKET_WINDOWS[bucket]
+        items = []
+        for i, d in enumerate(sched):
+            if d.get("bucket") != bucket or not d.get("time_local"):
+                continue
             try:
-                mins = _hhmm_to_minutes(t)
+                mins: Optional[int] = _hhmm_to_minutes(str(d.get("time_local", "00:00")))
             except Exception:
-                mins = 0
-            return (mins, str(d.get("med_name", "")), str(d.get("dose_id", "")))
-
-        idxs.sort(key=key_fn)
-        used = set()
+                mins = None
+            items.append((0 if mins is None else mins, str(d.get("med_name", "")), str(d.get("dose_id", "")), i, mins))
+        items.sort()
+
+        for _, _, _, i, mins in items:
+            # unparseable -> 09:00, then snap into bucket if needed
+            base = 9 * 60 if mins is None else mins
+            if not lo <= base <= hi:
+                base = _BUCKET_DEFAULTS[bucket]
+
+            candidates = _grid_mask(lo, hi, step, base % step)
+            if strategy == "forward":
+                chosen = occupancy.next_free(base, candidates)
+                if chosen is None:
+                    chosen = occupancy.prev_free(base, candidates)
+            else:
+                chosen = occupancy.nearest_free(base, candidates)
 
-        for i in idxs:
             d = sched[i]
-            t = str(d.get("time_local", "00:00"))
-
-            try:
-                base = _hhmm_to_minutes(t)
-            except Exception:
-                base = _hhmm_to_minutes("09:00")
-
-            # snap into bucket if needed
-            if not _in_bucket_window(bucket, base):
-                base = _hhmm_to_minutes("09:00" if bucket == "MORNING" else "14:00" if bucket == "AFTERNOON" else "20:00")
-
-            chosen = base
-            ok = False
-
-            # forward search
-            for k in range(0, 13):  # up to 2 hours
-                cand = base + k * step_minutes
-                if not _in_bucket_window(bucket, cand):
-                    break
-                if cand not in used:
-                    chosen = cand
-                    ok = True
-                    break
-
-            # backward search
-            if not ok:
-                for k in range(1, 13):
-                    cand = base - k * step_minutes
-                    if not _in_bucket_window(bucket, cand):
-                        break
-                    if cand not in used:
-                        chosen = cand
-                        ok = True
-                        break
-
-            used.add(chosen)
+            if chosen is None:
+                d["time_local"] = _minutes_to_hhmm(base)
+                unplaced.append({
+                    "dose_id": d.get("dose_id"),
+                    "med_name": d.get("med_name"),
+                    "bucket": bucket,
+                    "time_local": d["time_local"],
+                })
+                continue
+            occupancy.place(chosen)
             d["time_local"] = _minutes_to_hhmm(chosen)
 
-    return sched
\ No newline at end of file
+    return sched, unplaced
+
+def resolve_time_conflicts(
+    schedule: List[Dict[str, Any]],
+    step_minutes: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    Ensures no two doses share the same time_local within the same bucket.
+    Strategy:
+      - keep earliest dose at original time
+      - if conflict: shift forward by +step_minutes within bucket window
+      - else shift backward within bucket window
+      - if still can't (bucket full): leave as-is
+    """
+    sched, _ = allocate_dose_times(schedule, step_minutes=step_minutes, min_spacing_minutes=1, strategy="forward")
+    return sched
@@ -0,0 +1,164 @@
+# benchmarks/bench_agent.py
+"""
+Repeatable, offline latency benchmark for the agent: extract_node / plan_node
+directly, then every /ai route in-process (httpx ASGITransport).
+
+LLM answers come either from the fake server (default) or from cassettes:
+
+    cd medicine_ai_service
+    # fake server with a lognormal latency distribution
+    python -m benchmarks.bench_agent --iterations 30 --latency-ms 300 --latency-dist lognormal --jitter-ms 120
+    # capture real answers once (needs HF_TOKEN + network), then replay anywhere
+    python -m benchmarks.bench_agent --record cassettes/ --live
+    python -m benchmarks.bench_agent --replay cassettes/
+
+LLM/plan caches and the heuristic fast path are disabled so every iteration
+takes the LLM path.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List
+
+OCR_TEXT = "Tab Metformin 500mg BID after food\nTab Atorvastatin 10mg OD at night"
+FREE_TEXT = "Metformin 500 mg twice daily, atorvastatin 10 mg once at night"
+MEDS = [
+    {"name": "Metformin", "strength": "500mg", "frequency": "BID", "with_food": True},
+    {"name": "Atorvastatin", "strength": "10mg", "frequency": "OD"},
+]
+INTERNAL_KEY = "bench-internal-key"
+
+def _report(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<22} n={len(samples):>4} mean={statistics.mean(samples):8.1f}ms p50={statistics.median(samples):8.1f}ms p95={p95:8.1f}ms")
+
+def _time_sync(n: int, fn: Callable[[], Any]) -> List[float]:
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+async def _time_async(n: int, fn: Callable[[], Awaitable[Any]]) -> List[float]:
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+def _bench_nodes(n: int) -> None:
+    from app.agent.nodes import extract_node, plan_node
+
+    def extract() -> None:
+        out = extract_node({"plan_id": "p_" + uuid.uuid4().hex, "extracted_text": OCR_TEXT, "audit": []})
+        assert out.get("meds"), out
+
+    def plan() -> None:
+        out = plan_node({"plan_id": "p_" + uuid.uuid4().hex, "meds": MEDS, "timezone": "Asia/Kolkata", "audit": []})
+        assert out.get("plan"), out
+
+    _report("node extract", _time_sync(n, extract))
+    _report("node plan", _time_sync(n, plan))
+
+async def _bench_routes(n: int) -> None:
+    import httpx
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            async def post(path: str, body: Dict[str, Any], **kw: Any) -> httpx.Response:
+                r = await client.post(path, json=body, **kw)
+                r.raise_for_status()
+                return r
+
+            async def plan_ocr():
+                return await post("/ai/plan", {"patient_id": "p1", "extracted_text": OCR_TEXT})
+
+            async def plan_text():
+                return await post("/ai/plan_text", {"patient_id": "p1", "free_text": FREE_TEXT})
+
+            async def plan_stream():
+                async with client.stream("POST", "/ai/plan_stream", json={"patient_id": "p1", "extracted_text": OCR_TEXT}) as r:
+                    async for _ in r.aiter_bytes():
+                        pass
+
+            async def extract_batch():
+                return await post("/ai/extract_batch", {"texts": [OCR_TEXT, FREE_TEXT] * 5})
+
+            async def plan_and_approve():
+                plan = (await post("/ai/plan", {"patient_id": "p1", "meds": MEDS})).json()
+                if plan.get("next_step") == "NEED_APPROVAL":
+                    await post(
+                        "/ai/approve",
+                        {"plan_id": plan["plan_id"], "approved_action_types": ["CREATE_REMINDERS"]},
+                        headers={"x-internal-key": INTERNAL_KEY},
+                    )
+
+            for label, fn in (
+                ("POST /ai/plan (ocr)", plan_ocr),
+                ("POST /ai/plan_text", plan_text),
+                ("POST /ai/plan_stream", plan_stream),
+                ("POST /ai/extract_batch", extract_batch),
+                ("plan + /ai/approve", plan_and_approve),
+            ):
+                _report(label, await _time_async(n, fn))
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--latency-dist", default="fixed")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--token-delay-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--record", metavar="DIR", help="write cassettes for every LLM answer")
+    ap.add_argument("--replay", metavar="DIR", help="serve LLM answers only from cassettes (no server, no network)")
+    ap.add_argument("--live", action="store_true", help="with --record: call the real provider instead of the fake server")
+    args = ap.parse_args()
+
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["HEURISTIC_FASTPATH_ENABLED"] = "false"
+    os.environ["INTERNAL_SERVICE_SECRET"] = INTERNAL_KEY
+
+    srv = None
+    if args.replay:
+        os.environ["LLM_CASSETTE_MODE"] = "replay"
+        os.environ["LLM_CASSETTE_DIR"] = args.replay
+        os.environ.setdefault("HF_TOKEN", "hf_fake")
+    else:
+        if args.record:
+            os.environ["LLM_CASSETTE_MODE"] = "record"
+            os.environ["LLM_CASSETTE_DIR"] = args.record
+        if not args.live:
+            from benchmarks.fake_llm_server import start_fake_server
+
+            srv = start_fake_server(
+                latency_ms=args.latency_ms, token_delay_ms=args.token_delay_ms, error_rate=args.error_rate,
+                seed=args.seed, latency_dist=args.latency_dist, latency_jitter_ms=args.jitter_ms,
+            )
+            os.environ["HF_TOKEN"] = "hf_fake"
+            os.environ["HF_BASE_URL"] = srv.base_url
+
+    try:
+        _bench_nodes(args.iterations)
+        asyncio.run(_bench_routes(args.iterations))
+    finally:
+        if srv is not None:
+            print(f"upstream requests: {srv.requests_seen}")
+            srv.shutdown()
+
+    from app.services.llm.cassette import CASSETTES
+    if CASSETTES.enabled:
+        print("cassettes:", CASSETTES.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_bulk_normalize.py
+"""
+Row-by-row normalize_frequency / normalize_duration_days vs the column API in
+app.services.llm.bulk_normalize on a synthetic pharmacy export.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_bulk_normalize --rows 1000000
+
+The frequency column mixes codes, words, 1-0-1 patterns and case/spacing
+variants (a few hundred distinct strings); durations mix ints, floats,
+numeric strings, junk and blanks. Both paths must agree on every row.
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from app.services.llm.bulk_normalize import normalize_duration_column, normalize_frequency_column
+from app.services.llm.extraction_sanitize import normalize_duration_days, normalize_frequency
+
+_FREQS = [
+    "OD", "BD", "BID", "TID", "QID", "once daily", "twice a day", "thrice daily", "four times a day",
+    "1-0-1", "1-1-1", "0-0-1", "1-1-1-1", "weekly", "once a week", "PRN", "as needed", "2x", "3x",
+    "sos", "at bedtime", "every morning", "", "1 tab bd after food", "take od",
+]
+
+def _variant(rng: random.Random, f: str) -> str:
+    f = rng.choice([f, f.upper(), f.lower(), f.title()])
+    return rng.choice(["", " ", "  "]) + f + rng.choice(["", " ", "."])
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    freq_pool = [_variant(rng, rng.choice(_FREQS)) for _ in range(400)]
+    dur_pool = [5, 7, 10, 14, 30, 90, 0, 400, "7", "30", " 14 ", "7 days", "", None, 7.5, -3]
+    return pd.DataFrame({
+        "frequency": [rng.choice(freq_pool) for _ in range(rows)],
+        "duration_days": pd.Series([rng.choice(dur_pool) for _ in range(rows)], dtype=object),
+    })
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    df = make_frame(args.rows, args.seed)
+    print(f"rows={len(df)} distinct frequency={df['frequency'].nunique()} distinct duration={df['duration_days'].astype(str).nunique()}")
+
+    t0 = time.perf_counter()
+    row_freq = [normalize_frequency(v) for v in df["frequency"]]
+    row_dur = [normalize_duration_days(v) for v in df["duration_days"]]
+    row_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    col_freq = normalize_frequency_column(df["frequency"])
+    col_dur = normalize_duration_column(df["duration_days"])
+    col_s = time.perf_counter() - t0
+
+    numeric = pd.Series([v if isinstance(v, (int, float)) else None for v in df["duration_days"]], dtype="float64")
+    t0 = time.perf_counter()
+    normalize_duration_column(numeric)
+    num_s = time.perf_counter() - t0
+
+    freq_ok = row_freq == col_freq.tolist()
+    dur_ok = row_dur == [None if pd.isna(v) else int(v) for v in col_dur]
+    print(f"row-by-row: {row_s:.2f}s ({len(df) / row_s / 1e6:.2f}M rows/s)")
+    print(f"columnar  : {col_s:.2f}s ({len(df) / col_s / 1e6:.2f}M rows/s)  speedup={row_s / col_s:.1f}x")
+    print(f"numeric duration column: {num_s * 1000:.1f}ms")
+    print(f"identical: frequency={freq_ok} duration={dur_ok}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_bulk_plan.py
+"""
+Throughput (plans/sec) of the offline bulk pipeline at different worker counts.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_bulk_plan --rows 20000 --workers 1,2,4,8
+    python -m benchmarks.bench_bulk_plan --rows 2000 --llm --latency-ms 100 --llm-concurrency 32
+
+Heuristic mode measures the CPU stage alone (extraction, sanitizers, planning,
+conflict resolution). --llm also routes extraction and planning through the
+fake LLM server, so the async pool's share of the wall time shows up in llm_s.
+Nothing is written to disk.
+"""
+import argparse
+import asyncio
+import os
+import random
+from typing import Any, Dict, List
+
+from benchmarks.fake_llm_server import start_fake_server
+
+_NAMES = ["Metformin", "Amlodipine", "Atorvastatin", "Pantoprazole", "Losartan", "Levothyroxine", "Aspirin"]
+_FREQS = ["OD", "BD", "TID", "QID", "once daily", "twice daily", "weekly", "PRN"]
+
+def make_rows(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        lines = [
+            f"Tab {rng.choice(_NAMES)} {rng.choice([5, 10, 250, 500])}mg {rng.choice(_FREQS)} {rng.choice(['', 'after food'])}"
+            for _ in range(rng.randint(2, 10))
+        ]
+        rows.append({
+            "id": f"rx{i}",
+            "patient_id": f"p{i % 500}",
+            "text": "\n".join(lines),
+            "input_text": "",
+            "timezone": "Asia/Kolkata",
+        })
+    return rows
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--batch-size", type=int, default=1024)
+    ap.add_argument("--llm", action="store_true")
+    ap.add_argument("--latency-ms", type=float, default=100.0)
+    ap.add_argument("--llm-concurrency", type=int, default=32)
+    args = ap.parse_args()
+
+    srv = None
+    if args.llm:
+        srv = start_fake_server(latency_ms=args.latency_ms)
+        os.environ["HF_TOKEN"] = "hf_fake"
+        os.environ["HF_BASE_URL"] = srv.base_url
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+
+    from app.cli.bulk_plan import run_pipeline
+
+    mode = "llm" if args.llm else "heuristic"
+    print(f"rows={args.rows} mode={mode} cpus={os.cpu_count()}")
+    print(f"{'workers':>7} {'plans/s':>9} {'elapsed_s':>9} {'cpu_s':>7} {'llm_s':>7}")
+    try:
+        for w in (int(x) for x in args.workers.split(",")):
+            stats = asyncio.run(run_pipeline(
+                iter(make_rows(args.rows)),
+                extract=mode,
+                plan=mode,
+                workers=w,
+                llm_concurrency=args.llm_concurrency,
+                batch_size=args.batch_size,
+            ))
+            print(f"{w:>7} {stats['plans_per_s']:>9.1f} {stats['elapsed_s']:>9.2f} {stats['cpu_s']:>7.2f} {stats['llm_s']:>7.2f}")
+    finally:
+        if srv is not None:
+            srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_chunked_extract.py
+"""
+One llm_extract_meds call on a long discharge summary vs the chunked pipeline
+(med-bearing lines only, chunks extracted concurrently) against the fake LLM server.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_chunked_extract --pages 8 --meds 60 --latency-ms 300 --token-delay-ms 5
+
+Reports prompt size sent upstream, time to the first chunk result (what a
+streaming consumer waits for) and total wall time. The fake server answers
+with a canned med list, so output quality is not measured here.
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.fake_llm_server import start_fake_server
+
+_BOILERPLATE = [
+    "DISCHARGE SUMMARY - City General Hospital",
+    "Patient was admitted with complaints of chest discomfort and breathlessness.",
+    "History of hypertension and type 2 diabetes for the last 10 years.",
+    "ECG showed sinus rhythm. Echo: normal LV function.",
+    "Patient is advised to follow up in the outpatient clinic after two weeks.",
+    "Diet: low salt, diabetic diet. Regular walking advised.",
+    "Signature of consultant / Registration number",
+]
+_NAMES = ["Metformin", "Atorvastatin", "Amlodipine", "Pantoprazole", "Clopidogrel", "Aspirin", "Losartan", "Insulin"]
+
+def make_document(pages: int, meds: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(pages * 40):
+        lines.append(rng.choice(_BOILERPLATE))
+    for i in range(meds):
+        pos = rng.randrange(len(lines))
+        lines.insert(pos, f"Tab {rng.choice(_NAMES)}{i} {rng.choice([5, 10, 500])}mg {rng.choice(['OD', 'BD', 'TID'])}")
+    return "\n".join(lines)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=8)
+    ap.add_argument("--meds", type=int, default=60)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--token-delay-ms", type=float, default=5.0)
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+
+    srv = start_fake_server(latency_ms=args.latency_ms, token_delay_ms=args.token_delay_ms)
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+
+    from app.services.llm.extraction import (
+        iter_llm_extract_meds_chunked,
+        llm_extract_meds,
+        merge_chunk_meds,
+        split_med_chunks,
+    )
+
+    doc = make_document(args.pages, args.meds)
+    chunks = split_med_chunks(doc)
+    try:
+        t0 = time.perf_counter()
+        single = llm_extract_meds(doc)
+        single_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        first_s = None
+        items = []
+        for item in iter_llm_extract_meds_chunked(doc, concurrency=args.concurrency):
+            if first_s is None:
+                first_s = time.perf_counter() - t0
+            items.append(item)
+        chunked_s = time.perf_counter() - t0
+        merged = merge_chunk_meds(items)
+
+        print(f"document: {len(doc.splitlines())} lines, {len(doc)} chars, {args.meds} med lines")
+        print(f"single : prompt={len(doc):>7} chars  total={single_s:.2f}s  meds={len(single)}")
+        print(
+            f"chunked: prompt={sum(len(c) for c in chunks):>7} chars in {len(chunks)} chunks  "
+            f"first={first_s or 0:.2f}s total={chunked_s:.2f}s  meds={len(merged)} "
+            f"(llm chunks={sum(1 for it in items if it['source'] == 'llm')})"
+        )
+    finally:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
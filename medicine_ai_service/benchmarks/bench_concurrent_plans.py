@@ -0,0 +1,49 @@
+# benchmarks/bench_concurrent_plans.py
+"""
+Fire N concurrent /ai/plan requests (OCR text -> LLM extract -> LLM plan) at the app
+in-process, with the LLM served by the fake server at a fixed latency.
+With async routes, wall time should stay close to 2 x latency instead of
+growing with N / threadpool size.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_concurrent_plans --requests 300 --latency-ms 500
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.fake_llm_server import start_fake_server
+
+async def _run(n: int) -> None:
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            body = {"patient_id": "p1", "extracted_text": "Metformin 500mg BID\nAtorvastatin 10mg OD"}
+            t0 = time.perf_counter()
+            res = await asyncio.gather(*[client.post("/ai/plan", json=body) for _ in range(n)])
+            wall = time.perf_counter() - t0
+
+    ok = sum(1 for r in res if r.status_code == 200)
+    print(f"requests={n} ok={ok} wall={wall:.2f}s throughput={n / wall:.1f} req/s")
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--latency-ms", type=float, default=500.0)
+    args = ap.parse_args()
+
+    srv = start_fake_server(latency_ms=args.latency_ms)
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+    try:
+        asyncio.run(_run(args.requests))
+    finally:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_extract_batch.py
+"""
+Serial llm_extract_meds vs llm_extract_meds_batch against the fake LLM server.
+Expected: batch wall time ~ latency x N / concurrency instead of latency x N.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_extract_batch --items 64 --latency-ms 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_llm_server import start_fake_server
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=64)
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args()
+
+    srv = start_fake_server(latency_ms=args.latency_ms)
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+    os.environ["LLM_CACHE_ENABLED"] = "false"  # measure LLM round trips, not cache hits
+
+    from app.services.llm.extraction import llm_extract_meds, llm_extract_meds_batch
+
+    # distinct texts so single-flight can't coalesce them either
+    texts = [f"Rx #{i}\nMetformin 500mg BID\nAtorvastatin 10mg OD" for i in range(args.items)]
+
+    try:
+        t0 = time.perf_counter()
+        for t in texts:
+            llm_extract_meds(t)
+        serial = time.perf_counter() - t0
+
+        async def run_batch() -> int:
+            n = 0
+            async for item in llm_extract_meds_batch(texts, concurrency=args.concurrency):
+                n += item["source"] == "llm"
+            return n
+
+        t0 = time.perf_counter()
+        llm_items = asyncio.run(run_batch())
+        batch = time.perf_counter() - t0
+
+        ideal = args.latency_ms / 1000.0 * args.items / args.concurrency
+        print(f"items={args.items} latency={args.latency_ms:.0f}ms concurrency={args.concurrency}")
+        print(f"serial={serial:.2f}s  batch={batch:.2f}s (llm items={llm_items})  ideal~{ideal:.2f}s  speedup={serial / batch:.1f}x")
+    finally:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_facility_rounds.py
+"""
+Facility medication rounds: spread N residents x D doses over round slots with
+app.services.facility_rounds.optimize_rounds, then check the result.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_facility_rounds --residents 1000 --doses 10 --capacity 200
+
+Doses start on the usual default times (08:00/09:00/14:00/20:00...), so before
+optimizing a handful of slots carry most of the facility. Columns: time, doses
+moved/unplaced (a day has 96 slots of 15 min, so residents x doses beyond
+96 x capacity cannot all fit), the busiest slot before and after, and whether every slot is
+within capacity and every resident keeps --spacing minutes between doses.
+"""
+import argparse
+import random
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+from app.services.facility_rounds import optimize_rounds
+from app.utils.time_conflict import _hhmm_to_minutes
+
+_TIMES = {"MORNING": ["07:30", "08:00", "09:00"], "AFTERNOON": ["12:00", "14:00", "16:00"], "NIGHT": ["20:00", "21:00", "22:00"]}
+
+def make_plans(residents: int, doses: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    plans = []
+    for r in range(residents):
+        schedule = []
+        for i in range(doses):
+            bucket = rng.choice(list(_TIMES))
+            schedule.append({"dose_id": f"dose_{i:03d}", "med_name": f"Med{i}", "bucket": bucket, "time_local": rng.choice(_TIMES[bucket])})
+        plans.append({"plan_id": f"plan_{r:05d}", "patient_id": f"resident_{r:05d}", "schedule": schedule})
+    return plans
+
+def check(plans: List[Dict[str, Any]], result: Dict[str, Any], slot: int, capacity: int, spacing: int) -> Dict[str, Any]:
+    unplaced = {(u["plan_id"], u["dose_id"]) for u in result["unplaced"]}
+    load: Counter = Counter()
+    per_patient = defaultdict(list)
+    for p in plans:
+        over = result["dose_time_overrides"].get(p["plan_id"], {})
+        for d in p["schedule"]:
+            if (p["plan_id"], d["dose_id"]) in unplaced:
+                continue
+            m = _hhmm_to_minutes(over.get(d["dose_id"], d["time_local"]))
+            load[m - m % slot] += 1
+            per_patient[p["patient_id"]].append(m)
+    spacing_ok = all(
+        b - a >= spacing for times in per_patient.values() for a, b in zip(sorted(times), sorted(times)[1:])
+    )
+    return {"max_load": max(load.values(), default=0), "capacity_ok": max(load.values(), default=0) <= capacity, "spacing_ok": spacing_ok}
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--residents", default="100,1000,5000")
+    ap.add_argument("--doses", type=int, default=10)
+    ap.add_argument("--capacity", type=int, default=200)
+    ap.add_argument("--slot", type=int, default=15)
+    ap.add_argument("--spacing", type=int, default=30)
+    args = ap.parse_args()
+
+    print(f"{'residents':>9} {'doses':>7} {'ms':>8} {'moved':>7} {'unplaced':>8} {'max_before':>10} {'max_after':>9} {'capacity_ok':>11} {'spacing_ok':>10}")
+    for n in (int(x) for x in args.residents.split(",")):
+        plans = make_plans(n, args.doses)
+        before = Counter(
+            _hhmm_to_minutes(d["time_local"]) // args.slot for p in plans for d in p["schedule"]
+        )
+        result = optimize_rounds(
+            plans,
+            capacity_per_slot=args.capacity,
+            slot_minutes=args.slot,
+            patient_spacing_minutes=args.spacing,
+        )
+        c = check(plans, result, args.slot, args.capacity, args.spacing)
+        print(f"{n:>9} {result['doses']:>7} {result['elapsed_ms']:>8.1f} {result['moved']:>7} {len(result['unplaced']):>8} "
+              f"{max(before.values()):>10} {c['max_load']:>9} {str(c['capacity_ok']):>11} {str(c['spacing_ok']):>10}")
+
+if __name__ == "__main__":
+    main()
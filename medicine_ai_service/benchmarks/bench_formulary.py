@@ -0,0 +1,96 @@
+# benchmarks/bench_formulary.py
+"""
+Formulary index build time, size and lookup latency on a synthetic formulary.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_formulary --names 100000 --queries 20000
+
+Queries mix exact names, OCR-style typos (drop/swap/substitute one or two
+letters), prefixes and unknown words; "recovered" is the share of typos that
+correct back to the original name (the rest are refused as ambiguous/too far).
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+from typing import Callable, List, Tuple
+
+from app.services.formulary import FormularyIndex
+
+_SYLLABLES = ["met", "for", "min", "am", "lo", "di", "pine", "ator", "va", "sta", "tin", "pa", "ra", "ce",
+              "ta", "mol", "pred", "ni", "sone", "lo", "sar", "tan", "cef", "ix", "ime", "zol", "pril", "lol",
+              "xa", "ban", "ox", "cil", "lin", "pro", "fen", "dro", "gli", "cla", "zide", "mab", "nib"]
+
+def make_names(n: int, rng: random.Random) -> List[str]:
+    names = set()
+    while len(names) < n:
+        w = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 5)))
+        if len(w) >= 5:
+            names.add(w.capitalize())
+    return sorted(names)
+
+def typo(word: str, rng: random.Random, edits: int) -> str:
+    w = list(word.lower())
+    for _ in range(edits):
+        op = rng.choice(("drop", "swap", "sub"))
+        i = rng.randrange(1, len(w) - 1)
+        if op == "drop":
+            del w[i]
+        elif op == "swap":
+            w[i], w[i + 1] = w[i + 1], w[i]
+        else:
+            w[i] = rng.choice(string.ascii_lowercase)
+    return "".join(w)
+
+def _time(fn: Callable[[str], object], queries: List[str]) -> Tuple[float, float]:
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99) - 1]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--names", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=20000)
+    ap.add_argument("--max-edit-distance", type=int, default=2)
+    ap.add_argument("--prefix-len", type=int, default=7)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    names = make_names(args.names, rng)
+
+    t0 = time.perf_counter()
+    ix = FormularyIndex(names, max_edit_distance=args.max_edit_distance, prefix_len=args.prefix_len)
+    build_s = time.perf_counter() - t0
+    print(f"build: {len(ix)} names in {build_s:.2f}s {ix.stats()}")
+
+    sample = [rng.choice(names) for _ in range(args.queries)]
+    typos1 = [(typo(n, rng, 1), n) for n in sample]
+    typos2 = [(typo(n, rng, 2), n) for n in sample if len(n) > 8]
+    unknown = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))) for _ in sample]
+
+    rows = [
+        ("exact", ix.exact, sample),
+        ("prefix(4)", lambda q: ix.complete(q[:4]), sample),
+        ("correct exact", ix.correct, sample),
+        ("correct 1 typo", ix.correct, [q for q, _ in typos1]),
+        ("correct 2 typos", ix.correct, [q for q, _ in typos2]),
+        ("correct unknown", ix.correct, unknown),
+    ]
+    print(f"{'lookup':<16} {'mean_us':>8} {'p99_us':>8}")
+    for label, fn, queries in rows:
+        mean, p99 = _time(fn, queries)
+        print(f"{label:<16} {mean:>8.2f} {p99:>8.2f}")
+
+    for label, pairs in (("1 typo", typos1), ("2 typos", typos2)):
+        ok = sum(1 for q, n in pairs if (ix.correct(q) or ("",))[0] == n)
+        wrong = sum(1 for q, n in pairs if ix.correct(q) and ix.correct(q)[0] != n)
+        print(f"{label}: recovered={ok / max(1, len(pairs)):.3f} wrong={wrong / max(1, len(pairs)):.3f}")
+
+if __name__ == "__main__":
+    main()
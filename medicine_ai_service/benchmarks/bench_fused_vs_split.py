@@ -0,0 +1,53 @@
+# benchmarks/bench_fused_vs_split.py
+"""
+OCR text -> meds + plan: two sequential LLM calls (extract, then plan) vs one
+fused call, against the fake LLM server with per-token delays.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_fused_vs_split --runs 10 --latency-ms 300 --token-delay-ms 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.fake_llm_server import start_fake_server
+
+OCR = "Metformin 500mg BID after food\nAtorvastatin 10mg OD at night"
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--token-delay-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    srv = start_fake_server(latency_ms=args.latency_ms, token_delay_ms=args.token_delay_ms)
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+
+    from app.services.llm.extraction import llm_extract_meds
+    from app.services.llm.planner import llm_build_plan
+    from app.services.llm.fused import llm_extract_and_plan
+
+    def split(i: int) -> None:
+        meds = llm_extract_meds(f"{OCR}\n#{i}")
+        llm_build_plan(meds, "", "Asia/Kolkata")
+
+    def fused(i: int) -> None:
+        llm_extract_and_plan(f"{OCR}\n#{i}", "", "Asia/Kolkata")
+
+    try:
+        for label, fn in (("split", split), ("fused", fused)):
+            samples = []
+            for i in range(args.runs):
+                t0 = time.perf_counter()
+                fn(i)
+                samples.append((time.perf_counter() - t0) * 1000.0)
+            print(f"{label:<6} mean={statistics.mean(samples):8.1f}ms  p50={statistics.median(samples):8.1f}ms  max={max(samples):8.1f}ms")
+    finally:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
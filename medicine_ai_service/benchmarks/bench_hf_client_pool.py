@@ -0,0 +1,65 @@
+# benchmarks/bench_hf_client_pool.py
+"""
+Per-call overhead of hf_chat_json: a fresh InferenceClient per call (old behaviour)
+vs the pooled client registry.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_hf_client_pool --calls 200
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Callable, List
+
+from huggingface_hub import InferenceClient
+
+from benchmarks.fake_llm_server import start_fake_server
+
+def _run(label: str, calls: int, fn: Callable[[], None]) -> List[float]:
+    fn()  # warm-up
+    samples: List[float] = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<8} mean={statistics.mean(samples):7.2f}ms  p50={statistics.median(samples):7.2f}ms  p95={p95:7.2f}ms")
+    return samples
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    args = ap.parse_args()
+
+    srv = start_fake_server()
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+
+    from app.services.hf_client import hf_chat_json, reset_hf_clients
+    from app.services.llm.extraction_schema import MEDS_SCHEMA
+
+    messages = [{"role": "system", "content": "x"}, {"role": "user", "content": "Metformin 500mg BID"}]
+
+    def fresh() -> None:
+        client = InferenceClient(base_url=srv.base_url, api_key="hf_fake", timeout=90.0)
+        client.chat_completion(
+            model="fake", messages=messages, max_tokens=900,
+            response_format={"type": "json_schema", "json_schema": {"name": "MedPlan", "schema": MEDS_SCHEMA, "strict": True}},
+        )
+
+    def pooled() -> None:
+        hf_chat_json(model="fake", system="x", user="Metformin 500mg BID", schema=MEDS_SCHEMA)
+
+    try:
+        before = _run("fresh", args.calls, fresh)
+        reset_hf_clients()
+        after = _run("pooled", args.calls, pooled)
+        saved = statistics.mean(before) - statistics.mean(after)
+        print(f"per-call overhead saved: {saved:.2f}ms ({srv.requests_seen} upstream requests)")
+    finally:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
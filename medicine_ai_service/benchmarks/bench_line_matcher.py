@@ -0,0 +1,105 @@
+# benchmarks/bench_line_matcher.py
+"""
+Heuristic line parser: the legacy per-line implementation (uncompiled name
+regex, separate strength/hint searches, FREQ_MAP substring scan in dict order)
+vs the single-pass compiled scanner in app.services.extraction.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_line_matcher --lines 5000 --repeat 5
+
+Also prints the lines where the two disagree on frequency/food, i.e. the
+substring bugs the new matcher fixes ("od" inside "food"/"amlodipine").
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from app.schemas.models import Medication
+from app.services.extraction import FREQ_MAP, _parse_line
+
+_MED_HINT_RE = re.compile(r"\b(tab|tabs|tablet|cap|caps|capsule|mg|mcg|ml|od|bd|bid|tid|qid|daily|weekly|prn)\b", re.I)
+_STRENGTH_RE = re.compile(r"(\d+\s?(mg|mcg|g|ml))", re.IGNORECASE)
+
+def legacy_parse_line(ln: str) -> Optional[Medication]:
+    """The pre-scanner simple_extract_meds per-line logic."""
+    if not (_MED_HINT_RE.search(ln) or _STRENGTH_RE.search(ln)):
+        return None
+    name_match = re.match(r"^([A-Za-z][A-Za-z0-9\- ]+)", ln)
+    if not name_match:
+        return None
+    strength_match = _STRENGTH_RE.search(ln)
+    strength = strength_match.group(1) if strength_match else None
+    ln_low = ln.lower()
+    freq = next((v for k, v in FREQ_MAP.items() if k in ln_low), None)
+    if not freq and not strength:
+        return None
+    with_food = None
+    if "with food" in ln_low or "after food" in ln_low:
+        with_food = True
+    if "before food" in ln_low or "empty stomach" in ln_low:
+        with_food = False
+    name = name_match.group(1).strip()
+    return Medication(name=name, strength=strength, frequency=freq or "OD", with_food=with_food, instructions=ln)
+
+def new_parse_line(ln: str) -> Optional[Medication]:
+    return _parse_line(ln)[0]
+
+def _fields(med: Optional[Medication]) -> Optional[Dict[str, Any]]:
+    if med is None:
+        return None
+    return {"strength": med.strength, "frequency": med.frequency, "with_food": med.with_food}
+
+_NAMES = ["Metformin", "Amlodipine", "Atorvastatin", "Paracetamol", "Omeprazole", "Losartan", "Levothyroxine", "Codeine"]
+_FREQS = ["OD", "BD", "BID", "TID", "QID", "once daily", "twice daily", "as needed", "weekly", "1x", "3x", ""]
+_FOOD = ["", "after food", "before food", "with food", "empty stomach"]
+_NOISE = ["Patient advised rest and fluids", "Review after 2 weeks", "Dr. signature", "Follow up in clinic"]
+
+def make_lines(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n):
+        if rng.random() < 0.2:
+            lines.append(rng.choice(_NOISE))
+            continue
+        parts = [rng.choice(["Tab", "Cap", ""]), rng.choice(_NAMES), f"{rng.choice([5, 10, 250, 500])}mg", rng.choice(_FREQS), rng.choice(_FOOD)]
+        lines.append(" ".join(p for p in parts if p))
+    return lines
+
+def _time(fn, lines: List[str], repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for ln in lines:
+            fn(ln)
+        out.append((time.perf_counter() - t0) * 1e6 / len(lines))
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    lines = make_lines(args.lines, args.seed)
+    for label, fn in (("legacy", legacy_parse_line), ("single-pass", new_parse_line)):
+        samples = _time(fn, lines, args.repeat)
+        print(f"{label:<12} mean={statistics.mean(samples):7.2f}us/line best={min(samples):7.2f}us/line")
+
+    diffs = [(ln, _fields(legacy_parse_line(ln)), _fields(new_parse_line(ln))) for ln in lines]
+    diffs = [d for d in diffs if d[1] != d[2]]
+    print(f"disagreements: {len(diffs)}/{len(lines)}")
+    seen = set()
+    for ln, old, new in diffs:
+        if ln in seen:
+            continue
+        seen.add(ln)
+        print(f"  {ln!r}\n    legacy={old}\n    new   ={new}")
+        if len(seen) >= 8:
+            break
+
+if __name__ == "__main__":
+    main()
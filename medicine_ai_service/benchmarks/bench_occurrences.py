@@ -0,0 +1,101 @@
+# benchmarks/bench_occurrences.py
+"""
+Occurrence expansion (app.services.occurrences).
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_occurrences --plans 10000 --years-in 1,5,20
+
+Range query: "this week's doses" for one ongoing plan that started N years ago,
+walking every occurrence from day 0 (what a consumer without the engine does)
+vs plan_occurrences with t0/t1, which starts at the week directly.
+Batch: occurrence counts over a 30-day window for --plans plans, one generator
+per dose vs count_occurrences_batch; the counts are compared.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+from app.services.occurrences import (
+    count_occurrences_batch,
+    occurrences_between,
+    plan_occurrences,
+    zone,
+)
+
+_TZS = ["Asia/Kolkata", "America/New_York", "Europe/London", "UTC"]
+
+def make_plans(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    plans = []
+    for i in range(n):
+        schedule = [
+            {
+                "dose_id": f"dose_{j}",
+                "time_local": rng.choice(["08:00", "09:00", "14:00", "20:00"]),
+                "repeat_every_days": rng.choice([None, None, 2, 7]),
+                "duration_days": rng.choice([None, 5, 30, 90]),
+            }
+            for j in range(rng.randint(1, 8))
+        ]
+        plans.append({
+            "plan_id": f"plan_{i}",
+            "schedule": schedule,
+            "start_date": date(2026, 1, 1) + timedelta(days=rng.randint(0, 120)),
+            "timezone": rng.choice(_TZS),
+        })
+    return plans
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--plans", type=int, default=10000)
+    ap.add_argument("--years-in", default="1,5,20")
+    args = ap.parse_args()
+
+    tz = "Asia/Kolkata"
+    schedule = [{"dose_id": f"d{i}", "time_local": t} for i, t in enumerate(["08:00", "14:00", "20:00"])]
+    print(f"{'years_in':>8} {'walk_ms':>9} {'range_ms':>9} {'found':>6}")
+    for years in (int(x) for x in args.years_in.split(",")):
+        start = date(2026, 1, 1)
+        t0 = datetime.combine(start + timedelta(days=365 * years), datetime.min.time(), zone(tz))
+        t1 = t0 + timedelta(days=7)
+
+        t = time.perf_counter()
+        walked = []
+        for dt, d in plan_occurrences(schedule, start, tz):
+            if dt >= t1:
+                break
+            if dt >= t0:
+                walked.append(dt)
+        walk_ms = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        ranged = [dt for dt, _ in plan_occurrences(schedule, start, tz, t0=t0, t1=t1)]
+        range_ms = (time.perf_counter() - t) * 1000
+        assert ranged == walked
+        print(f"{years:>8} {walk_ms:>9.2f} {range_ms:>9.3f} {len(ranged):>6}")
+
+    plans = make_plans(args.plans)
+    t0 = datetime(2026, 3, 1, tzinfo=zone("UTC"))
+    t1 = t0 + timedelta(days=30)
+    doses = sum(len(p["schedule"]) for p in plans)
+
+    t = time.perf_counter()
+    loop = {
+        p["plan_id"]: [sum(1 for _ in occurrences_between(d, p["start_date"], p["timezone"], t0, t1)) for d in p["schedule"]]
+        for p in plans
+    }
+    loop_ms = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    batch = count_occurrences_batch(plans, t0, t1)
+    batch_ms = (time.perf_counter() - t) * 1000
+
+    same = all(list(batch[pid]) == counts for pid, counts in loop.items())
+    print(f"\nplans={len(plans)} doses={doses} window=30d")
+    print(f"{'generators_ms':>13} {'batch_ms':>9} {'speedup':>8} {'same':>5}")
+    print(f"{loop_ms:>13.1f} {batch_ms:>9.1f} {loop_ms / batch_ms:>7.1f}x {str(same):>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_ollama_backend.py
+"""
+Local-backend call overhead: requests.post per call (old ollama_client) vs the
+pooled keep-alive session, against the fake server in OpenAI-compatible mode.
+Also checks the streaming paths return the same JSON, and times --concurrency
+async calls (distinct prompts, --latency-ms each) on the aiohttp session, which
+are bounded by OLLAMA_POOL_MAXSIZE connections rather than by worker threads.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_ollama_backend --calls 200 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Callable, List
+
+import requests
+
+from benchmarks.fake_llm_server import start_fake_server
+
+def _run(label: str, calls: int, fn: Callable[[], None]) -> List[float]:
+    fn()  # warm-up
+    samples: List[float] = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<8} mean={statistics.mean(samples):7.2f}ms  p50={statistics.median(samples):7.2f}ms  p95={p95:7.2f}ms")
+    return samples
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--latency-ms", type=float, default=200)
+    args = ap.parse_args()
+
+    srv = start_fake_server()
+    os.environ["OLLAMA_BASE_URL"] = srv.base_url
+    os.environ["OLLAMA_API_STYLE"] = "openai"
+
+    from app.services.llm.extraction_schema import MEDS_SCHEMA
+    from app.services.ollama_client import (
+        ollama_chat_json,
+        aclose_ollama_session,
+        ollama_chat_json_async,
+        ollama_chat_json_stream,
+        ollama_chat_json_stream_async,
+    )
+
+    messages = [{"role": "system", "content": "x"}, {"role": "user", "content": "Metformin 500mg BID"}]
+
+    def fresh() -> None:
+        r = requests.post(
+            f"{srv.base_url}/v1/chat/completions",
+            json={"model": "fake", "messages": messages, "response_format": {"type": "json_object"}},
+            timeout=90,
+        )
+        r.json()
+
+    def pooled() -> None:
+        ollama_chat_json(model="fake", system="x", user="Metformin 500mg BID", schema=MEDS_SCHEMA)
+
+    before = _run("fresh", args.calls, fresh)
+    after = _run("pooled", args.calls, pooled)
+    print(f"per-call overhead saved: {statistics.mean(before) - statistics.mean(after):.2f}ms")
+
+    streamed = "".join(ollama_chat_json_stream(model="fake", system="x", user="Metformin 500mg BID", schema=MEDS_SCHEMA))
+    same = json.loads(streamed) == ollama_chat_json(model="fake", system="x", user="Metformin 500mg BID", schema=MEDS_SCHEMA)
+    print(f"stream matches non-stream: {same}")
+
+    async def run_async() -> None:
+        streamed = "".join([d async for d in ollama_chat_json_stream_async(
+            model="fake", system="x", user="Metformin 500mg BID", schema=MEDS_SCHEMA,
+        )])
+        print(f"async stream matches non-stream: {json.loads(streamed) == ollama_chat_json(model='fake', system='x', user='Metformin 500mg BID', schema=MEDS_SCHEMA)}")
+        srv.latency_s = args.latency_ms / 1000.0
+        t0 = time.perf_counter()
+        await asyncio.gather(*(
+            ollama_chat_json_async(model="fake", system="x", user=f"Metformin 500mg BID #{i}", schema=MEDS_SCHEMA)
+            for i in range(args.concurrency)
+        ))
+        wall = (time.perf_counter() - t0) * 1000.0
+        pool = int(os.environ.get("OLLAMA_POOL_MAXSIZE", "16"))
+        waves = -(-args.concurrency // pool)
+        print(f"async x{args.concurrency}: {wall:.0f}ms (latency {args.latency_ms:.0f}ms, pool {pool} -> >= {waves} waves)")
+        await aclose_ollama_session()
+
+    asyncio.run(run_async())
+    srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_plan_stream.py
+"""
+Time-to-first-event of /ai/plan_stream vs total time of /ai/plan, with the fake
+LLM server streaming tokens at a fixed rate.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_plan_stream --latency-ms 300 --token-delay-ms 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_llm_server import start_fake_server
+
+BODY = {"patient_id": "p1", "extracted_text": "Metformin 500mg BID\nAtorvastatin 10mg OD"}
+
+def _start_app() -> "tuple[uvicorn.Server, threading.Thread, str]":
+    """Serves the app with uvicorn on a free local port (httpx.ASGITransport buffers whole responses)."""
+    from app.main import app
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+async def _run(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        t0 = time.perf_counter()
+        await client.post("/ai/plan", json=BODY)
+        blocking = time.perf_counter() - t0
+
+        firsts = {}
+        t0 = time.perf_counter()
+        async with client.stream("POST", "/ai/plan_stream", json=BODY) as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("event: "):
+                    firsts.setdefault(line[7:], time.perf_counter() - t0)
+        total = time.perf_counter() - t0
+
+    print(f"/ai/plan            total={blocking * 1000:8.1f}ms")
+    for event, t in firsts.items():
+        print(f"/ai/plan_stream     first {event:<14}{t * 1000:8.1f}ms")
+    print(f"/ai/plan_stream     total={total * 1000:8.1f}ms")
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--token-delay-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    srv = start_fake_server(latency_ms=args.latency_ms, token_delay_ms=args.token_delay_ms)
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["HEURISTIC_FASTPATH_ENABLED"] = "false"
+    server, thread, base_url = _start_app()
+    try:
+        asyncio.run(_run(base_url))
+    finally:
+        server.should_exit = True
+        thread.join()
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_prompt_tokens.py
+"""
+Prompt size and max_tokens: repr PLAN_INPUT + fixed HF_MAX_TOKENS (old) vs
+compact canonical JSON + adaptive max_tokens (prompt_builder), then real
+completion sizes from the fake server (usage.completion_tokens).
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_prompt_tokens
+"""
+import os
+import statistics
+
+from benchmarks.fake_llm_server import estimate_tokens, start_fake_server
+
+_FREQS = ["OD", "BID", "TID", "QID", "PRN", "WEEKLY"]
+
+def _meds(n: int):
+    return [
+        {
+            "name": f"Medicine{i}",
+            "strength": f"{(i + 1) * 5}mg",
+            "frequency": _FREQS[i % len(_FREQS)],
+            "with_food": None if i % 2 else True,
+            "duration_days": None,
+            "notes": "",
+        }
+        for i in range(n)
+    ]
+
+def _old_message(meds, input_text, timezone) -> str:
+    user_payload = {
+        "timezone": timezone,
+        "user_goal": input_text,
+        "meds": meds,
+        "rules": "Return schedule entries only for medicines in input meds list."
+    }
+    return f"PLAN_INPUT:\n{user_payload}"
+
+def main() -> None:
+    srv = start_fake_server()
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = srv.base_url
+
+    from app.core.llm_config import HF_MAX_TOKENS
+    from app.services.hf_client import hf_chat_json, hf_usage_stats
+    from app.services.llm.prompt_builder import plan_max_tokens, plan_user_message
+    from app.services.llm.prompts import PLAN_SYSTEM_PROMPT
+    from app.services.llm.schemas import PLAN_SCHEMA
+
+    print(f"{'meds':>4} {'old_prompt':>10} {'new_prompt':>10} {'saved':>6} {'old_max':>7} {'new_max':>7}")
+    saved = []
+    for n in (1, 2, 4, 8, 16):
+        meds = _meds(n)
+        old = estimate_tokens(_old_message(meds, "", "Asia/Kolkata"))
+        new = estimate_tokens(plan_user_message(meds, "", "Asia/Kolkata"))
+        saved.append(1 - new / old)
+        print(f"{n:>4} {old:>10} {new:>10} {1 - new / old:>6.1%} {HF_MAX_TOKENS:>7} {plan_max_tokens(meds):>7}")
+        hf_chat_json(
+            model="fake", system=PLAN_SYSTEM_PROMPT, user=plan_user_message(meds, "", "Asia/Kolkata"),
+            schema=PLAN_SCHEMA, max_tokens=plan_max_tokens(meds),
+        )
+    print(f"mean user-message reduction: {statistics.mean(saved):.1%}")
+    print("provider-reported usage:", hf_usage_stats())
+    srv.shutdown()
+
+if __name__ == "__main__":
+    main()
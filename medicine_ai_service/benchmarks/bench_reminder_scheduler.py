@@ -0,0 +1,114 @@
+# benchmarks/bench_reminder_scheduler.py
+"""
+Reminder scheduler (app.services.reminder_scheduler) at scale: build time,
+memory per scheduled dose, and the cost of one tick.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_reminder_scheduler --doses 100000,1000000 --hours 24
+
+Plans get 1-8 doses on the usual default times (so ticks at 08:00/20:00 carry
+large bursts), some every 2 or 7 days, some with a course length, spread over
+four timezones. Simulated time then advances one minute per tick for --hours.
+Columns: build time, bytes per dose (tracemalloc, with --memory), tick time
+p50/p99/max over all ticks, the busiest tick's fired count, idle tick cost
+(nothing due: one heap peek), and cancel/insert cost per op.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+from app.services.occurrences import zone
+from app.services.reminder_scheduler import ReminderScheduler
+
+_TZS = ["Asia/Kolkata", "America/New_York", "Europe/London", "UTC"]
+_TIMES = ["07:30", "08:00", "08:00", "09:00", "12:00", "14:00", "16:00", "20:00", "20:00", "21:00", "22:00"]
+
+def make_plans(doses: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    plans, n = [], 0
+    while n < doses:
+        k = min(rng.randint(1, 8), doses - n)
+        schedule = [
+            {
+                "dose_id": f"dose_{j}",
+                "time_local": rng.choice(_TIMES),
+                "repeat_every_days": rng.choice([None, None, None, 2, 7]),
+                "duration_days": rng.choice([None, None, 5, 30]),
+            }
+            for j in range(k)
+        ]
+        plans.append({
+            "plan_id": f"plan_{len(plans):07d}",
+            "schedule": schedule,
+            "start_date": date(2026, 3, 1) - timedelta(days=rng.randint(0, 3)),
+            "timezone": rng.choice(_TZS),
+        })
+        n += k
+    return plans
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--doses", default="100000,1000000")
+    ap.add_argument("--hours", type=float, default=24)
+    ap.add_argument("--memory", action="store_true", help="measure bytes/dose with tracemalloc (slower build)")
+    args = ap.parse_args()
+
+    start = datetime(2026, 3, 2, tzinfo=zone("UTC")).timestamp()
+    print(f"{'doses':>8} {'build_s':>8} {'B/dose':>7} {'ticks':>6} {'p50_ms':>7} {'p99_ms':>7} {'max_ms':>7} "
+          f"{'max_fired':>9} {'idle_us':>8} {'cancel_us':>9} {'insert_us':>9}")
+    for n in (int(x) for x in args.doses.split(",")):
+        plans = make_plans(n)
+        sched = ReminderScheduler()
+
+        if args.memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        for p in plans:
+            sched.schedule_plan(p["plan_id"], p["schedule"], p["start_date"], p["timezone"], now=start)
+        build_s = time.perf_counter() - t0
+        per_dose = "-"
+        if args.memory:
+            per_dose = str(tracemalloc.get_traced_memory()[0] // max(1, len(sched)))
+            tracemalloc.stop()
+
+        ticks, max_fired, now = [], 0, start
+        for _ in range(int(args.hours * 60)):
+            now += 60
+            t0 = time.perf_counter()
+            fired = sched.advance(now)
+            ticks.append((time.perf_counter() - t0) * 1000)
+            max_fired = max(max_fired, len(fired))
+
+        # idle tick: nothing due before the next occurrence
+        idle_now = sched.next_due_ts() - 1
+        reps = 10000
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            sched.advance(idle_now)
+        idle_us = (time.perf_counter() - t0) / reps * 1e6
+
+        sample = random.Random(1).sample(plans, min(1000, len(plans)))
+        ops = sum(len(p["schedule"]) for p in sample)
+        t0 = time.perf_counter()
+        for p in sample:
+            for d in p["schedule"]:
+                sched.cancel(p["plan_id"], d["dose_id"])
+        cancel_us = (time.perf_counter() - t0) / ops * 1e6
+        t0 = time.perf_counter()
+        for p in sample:
+            for d in p["schedule"]:
+                sched.insert(p["plan_id"], d, p["start_date"], p["timezone"], now=now)
+        insert_us = (time.perf_counter() - t0) / ops * 1e6
+
+        print(f"{n:>8} {build_s:>8.2f} {per_dose:>7} {len(ticks):>6} {_pct(ticks, 0.5):>7.3f} {_pct(ticks, 0.99):>7.2f} "
+              f"{max(ticks):>7.1f} {max_fired:>9} {idle_us:>8.2f} {cancel_us:>9.2f} {insert_us:>9.2f}")
+
+if __name__ == "__main__":
+    main()
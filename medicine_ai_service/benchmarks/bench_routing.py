@@ -0,0 +1,78 @@
+# benchmarks/bench_routing.py
+"""
+Tail latency and error rate of hf_chat_json through the provider router:
+a primary fake endpoint with a slow tail and injected 503s, plus a healthy
+secondary. Runs once with hedging off, once with hedging on.
+
+    cd medicine_ai_service
+    python -m benchmarks.bench_routing --calls 400 --concurrency 16
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from benchmarks.fake_llm_server import start_fake_server
+
+def _pct(samples: List[float], p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--slow-rate", type=float, default=0.08)
+    ap.add_argument("--slow-ms", type=float, default=1500.0)
+    ap.add_argument("--error-rate", type=float, default=0.05)
+    args = ap.parse_args()
+
+    primary = start_fake_server(
+        latency_ms=args.latency_ms, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_ms=args.slow_ms, seed=1,
+    )
+    secondary = start_fake_server(latency_ms=args.latency_ms * 1.5, seed=2)
+    os.environ["HF_TOKEN"] = "hf_fake"
+    os.environ["HF_BASE_URL"] = primary.base_url
+    os.environ["LLM_ROUTE_TARGETS"] = json.dumps([{"base_url": secondary.base_url}])
+    os.environ["LLM_HEDGE_MIN_SAMPLES"] = "10"
+    os.environ["LLM_SINGLEFLIGHT_ENABLED"] = "false"
+
+    from app.services.hf_client import hf_chat_json
+    from app.services.llm.extraction_schema import MEDS_SCHEMA
+    from app.services.llm.routing import ROUTER
+
+    def one(i: int) -> Tuple[float, bool]:
+        t0 = time.perf_counter()
+        try:
+            hf_chat_json(model="fake", system="x", user=f"Metformin 500mg BID #{i}", schema=MEDS_SCHEMA)
+            ok = True
+        except Exception:
+            ok = False
+        return (time.perf_counter() - t0) * 1000.0, ok
+
+    for hedge in (False, True):
+        ROUTER.reset()
+        ROUTER.hedge_enabled = hedge
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(one, range(args.calls)))
+        lat = sorted(ms for ms, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        st = ROUTER.stats()
+        print(
+            f"hedge={'on ' if hedge else 'off'} p50={statistics.median(lat):7.1f}ms "
+            f"p95={_pct(lat, 0.95):7.1f}ms p99={_pct(lat, 0.99):7.1f}ms "
+            f"errors={errors} hedge_rate={st['hedge_rate']:.3f}"
+        )
+        for label, t in st["targets"].items():
+            print(f"    {label:<40} state={t['state']:<9} req={t['requests']:>4} err={t['errors']:>3} wins={t['wins']:>4} trips={t['trips']}")
+
+    print(f"upstream requests: primary={primary.requests_seen} (503s={primary.errors_injected}) secondary={secondary.requests_seen}")
+    primary.shutdown()
+    secondary.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# benchmarks/fake_llm_server.py
+"""
+Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+
+Run standalone:
+    python -m benchmarks.fake_llm_server --port 8765 --latency-ms 20 --token-delay-ms 15 --error-rate 0.05
+
+Latency model: latency_ms (queue + time to first token) + token_delay_ms per
+completion token (~4 chars of JSON per token). --latency-dist picks how the
+first part is drawn (fixed, uniform, normal, lognormal, exponential; mean =
+latency_ms, spread = --latency-jitter-ms). --error-rate fails that fraction of
+requests with a 503; --slow-rate/--slow-ms add a latency tail. All randomness
+comes from --seed, so a run is repeatable.
+
+Outputs: canned meds/plan answers for the extraction/plan/fused schemas; any
+other json_schema gets a minimal instance that conforms to it. The schema is read
+from response_format in either shape clients send (json_schema.schema, or the
+json_object "value" huggingface_hub uses).
+
+Point the service at it with HF_BASE_URL=http://127.0.0.1:8765 (any HF_TOKEN).
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+CANNED_MEDS = {
+    "meds": [
+        {"name": "Metformin", "strength": "500mg", "frequency": "BID", "with_food": True},
+        {"name": "Atorvastatin", "strength": "10mg", "frequency": "OD"},
+    ]
+}
+
+CANNED_PLAN = {
+    "needs_info": False,
+    "questions": [],
+    "schedule": [
+        {"med_name": "Metformin", "time_local": "08:00", "bucket": "MORNING", "notes": ""},
+        {"med_name": "Metformin", "time_local": "20:00", "bucket": "NIGHT", "notes": ""},
+        {"med_name": "Atorvastatin", "time_local": "21:00", "bucket": "NIGHT", "notes": ""},
+    ],
+    "precautions": [],
+    "why": [],
+    "actions": [],
+}
+
+def schema_instance(schema: Dict[str, Any]) -> Any:
+    """Smallest value that validates against a (strict-mode style) JSON schema."""
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf"):
+        if schema.get(key):
+            return schema_instance(schema[key][0])
+    t = schema.get("type")
+    if isinstance(t, list):
+        t = next((x for x in t if x != "null"), "null")
+    if t == "object" or "properties" in schema:
+        props = schema.get("properties") or {}
+        required = schema.get("required") or list(props)
+        return {k: schema_instance(props[k]) for k in required if k in props}
+    if t == "array":
+        n = int(schema.get("minItems") or 0)
+        return [schema_instance(schema.get("items") or {}) for _ in range(n)]
+    if t == "string":
+        return "x" * int(schema.get("minLength") or 0)
+    if t == "integer":
+        return int(schema.get("minimum") or 0)
+    if t == "number":
+        return float(schema.get("minimum") or 0)
+    if t == "boolean":
+        return False
+    return None
+
+def requested_schema(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    JSON schema of a request, from either response_format shape:
+      {"type": "json_schema", "json_schema": {"schema": ...}}   (OpenAI style)
+      {"type": "json_object", "value": <schema>}                 (huggingface_hub clients)
+    """
+    rf = body.get("response_format") or {}
+    if not isinstance(rf, dict):
+        return {}
+    if rf.get("type") == "json_object":
+        schema = rf.get("value") or {}
+    else:
+        schema = rf.get("json_schema") or {}
+    # a json_schema wrapper ({"name", "schema", "strict"}) passed through as the value
+    if isinstance(schema, dict) and isinstance(schema.get("schema"), dict) and "properties" not in schema:
+        schema = schema["schema"]
+    return schema if isinstance(schema, dict) else {}
+
+def canned_output(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick a canned answer that matches the requested schema."""
+    schema = requested_schema(body)
+    props = schema.get("properties") or {}
+    if "schedule" in props and "meds" in props:
+        return {**CANNED_MEDS, **CANNED_PLAN}
+    if "schedule" in props:
+        return CANNED_PLAN
+    if "meds" in props or not props:
+        return CANNED_MEDS
+    return schema_instance(schema)
+
+LATENCY_DISTS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+def sample_latency_s(rng: random.Random, dist: str, mean_s: float, jitter_s: float) -> float:
+    """One draw of the pre-token latency (seconds, never negative)."""
+    if mean_s <= 0:
+        return 0.0
+    if dist == "uniform":
+        v = rng.uniform(mean_s - jitter_s, mean_s + jitter_s)
+    elif dist == "normal":
+        v = rng.gauss(mean_s, jitter_s)
+    elif dist == "lognormal":
+        # parameterised by mean and std of the latency itself
+        sigma2 = math.log(1.0 + (jitter_s / mean_s) ** 2) if jitter_s > 0 else 0.0
+        v = rng.lognormvariate(math.log(mean_s) - sigma2 / 2.0, math.sqrt(sigma2))
+    elif dist == "exponential":
+        v = rng.expovariate(1.0 / mean_s)
+    else:
+        v = mean_s
+    return max(0.0, v)
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like real providers
+    # headers and body go out in separate writes; with Nagle on, a reused connection
+    # waits for the client's delayed ACK (~40 ms) before the body is sent
+    disable_nagle_algorithm = True
+    server: "FakeLLMServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # silence per-request logs
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body: Dict[str, Any], content: str, latency_s: float) -> None:
+        """OpenAI-style SSE: one chat.completion.chunk per ~token, then [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        cid = "chatcmpl-" + uuid.uuid4().hex[:12]
+        if latency_s > 0:
+            time.sleep(latency_s)
+        for i in range(0, len(content), 4):
+            chunk = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model") or "fake",
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": content[i : i + 4]}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.server.token_delay_s > 0:
+                time.sleep(self.server.token_delay_s)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            body = json.loads(raw or b"{}")
+        except Exception:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+
+        with self.server.lock:
+            self.server.requests_seen += 1
+            fail = self.server.rng.random() < self.server.error_rate
+            slow = self.server.rng.random() < self.server.slow_rate
+            latency_s = sample_latency_s(
+                self.server.rng, self.server.latency_dist, self.server.latency_s, self.server.jitter_s
+            )
+
+        if fail:
+            self.server.errors_injected += 1
+            self._send_json(503, {"error": "injected failure (fake server)"})
+            return
+        if slow:
+            time.sleep(self.server.slow_s)
+
+        content = json.dumps(canned_output(body))
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in body.get("messages") or [])
+        completion_tokens = estimate_tokens(content)
+
+        if body.get("stream"):
+            self._stream(body, content, latency_s)
+            return
+
+        delay = latency_s + self.server.token_delay_s * completion_tokens
+        if delay > 0:
+            time.sleep(delay)
+
+        self._send_json(200, {
+            "id": "chatcmpl-" + uuid.uuid4().hex[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "fake",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog; the default 5 stalls bursts of new connections by ~1 s
+
+    def __init__(
+        self,
+        addr: Tuple[str, int],
+        latency_ms: float = 0.0,
+        token_delay_ms: float = 0.0,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        seed: Optional[int] = None,
+        latency_dist: str = "fixed",
+        latency_jitter_ms: float = 0.0,
+    ):
+        super().__init__(addr, FakeLLMHandler)
+        if latency_dist not in LATENCY_DISTS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTS}")
+        self.latency_dist = latency_dist
+        self.jitter_s = max(0.0, latency_jitter_ms) / 1000.0
+        self.latency_s = max(0.0, latency_ms) / 1000.0
+        self.token_delay_s = max(0.0, token_delay_ms) / 1000.0
+        self.error_rate = min(1.0, max(0.0, error_rate))
+        self.slow_rate = min(1.0, max(0.0, slow_rate))
+        self.slow_s = max(0.0, slow_ms) / 1000.0
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_seen = 0
+        self.errors_injected = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+def start_fake_server(
+    port: int = 0,
+    latency_ms: float = 0.0,
+    token_delay_ms: float = 0.0,
+    host: str = "127.0.0.1",
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_ms: float = 0.0,
+    seed: Optional[int] = None,
+    latency_dist: str = "fixed",
+    latency_jitter_ms: float = 0.0,
+) -> FakeLLMServer:
+    """Start the fake server on a daemon thread and return it (use .base_url / .shutdown())."""
+    srv = FakeLLMServer(
+        (host, port), latency_ms=latency_ms, token_delay_ms=token_delay_ms,
+        error_rate=error_rate, slow_rate=slow_rate, slow_ms=slow_ms, seed=seed,
+        latency_dist=latency_dist, latency_jitter_ms=latency_jitter_ms,
+    )
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    return srv
+
+def main(argv: Optional[list] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--token-delay-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    ap.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests delayed by --slow-ms")
+    ap.add_argument("--slow-ms", type=float, default=0.0)
+    ap.add_argument("--latency-dist", choices=LATENCY_DISTS, default="fixed")
+    ap.add_argument("--latency-jitter-ms", type=float, default=0.0, help="spread (std / half-range) for --latency-dist")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    srv = FakeLLMServer(
+        (args.host, args.port), latency_ms=args.latency_ms, token_delay_ms=args.token_delay_ms,
+        error_rate=args.error_rate, slow_rate=args.slow_rate, slow_ms=args.slow_ms, seed=args.seed,
+        latency_dist=args.latency_dist, latency_jitter_ms=args.latency_jitter_ms,
+    )
+    print(f"fake LLM server listening on {srv.base_url}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
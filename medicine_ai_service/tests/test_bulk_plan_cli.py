@@ -0,0 +1,32 @@
+# tests/test_bulk_plan_cli.py
+import json
+
+import pytest
+
+from app.cli.bulk_plan import main
+
+@pytest.fixture
+def rx(tmp_path):
+    p = tmp_path / "rx.jsonl"
+    p.write_text(json.dumps({"id": 1, "text": "Tab Metformin 500 mg BID"}) + "\n", encoding="utf-8")
+    return p
+
+@pytest.mark.parametrize("name", ["plans.json", "plans.jsnol", "plans.csv"])
+def test_unknown_out_suffix_is_rejected(rx, tmp_path, name):
+    with pytest.raises(SystemExit) as e:
+        main([str(rx), "--out", str(tmp_path / name), "--workers", "1"])
+    assert e.value.code == 2
+    assert not (tmp_path / name).exists()
+
+def test_explicit_format_overrides_suffix(rx, tmp_path):
+    out = tmp_path / "plans.json"
+    assert main([str(rx), "--out", str(out), "--format", "jsonl", "--workers", "1"]) == 0
+    (record,) = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert record["id"] == 1 and record["meds"]
+
+def test_parquet_refuses_an_existing_file(rx, tmp_path):
+    out = tmp_path / "plans"
+    out.write_text("keep me", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        main([str(rx), "--out", str(out), "--workers", "1"])
+    assert out.read_text(encoding="utf-8") == "keep me"
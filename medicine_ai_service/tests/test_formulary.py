@@ -0,0 +1,35 @@
+# tests/test_formulary.py
+import asyncio
+import threading
+
+from app.services import formulary
+from app.services.formulary import FormularyIndex, load_names
+
+def test_csv_header_is_not_a_drug_name(tmp_path):
+    p = tmp_path / "formulary.csv"
+    p.write_text("rxcui,name,form\n1,Metformin,tab\n2,Amlodipine,tab\n", encoding="utf-8")
+    assert load_names(p) == ["Metformin", "Amlodipine"]
+
+def test_headerless_csv_uses_first_column(tmp_path):
+    p = tmp_path / "formulary.csv"
+    p.write_text("# comment\nMetformin,tab\nAmlodipine,tab\n", encoding="utf-8")
+    assert load_names(p) == ["Metformin", "Amlodipine"]
+
+def test_plain_list(tmp_path):
+    p = tmp_path / "formulary.txt"
+    p.write_text("Metformin\n\n# comment\nAmlodipine\n", encoding="utf-8")
+    assert load_names(p) == ["Metformin", "Amlodipine"]
+
+def test_aload_builds_off_the_event_loop(monkeypatch):
+    built = FormularyIndex(["Metformin"])
+    build_threads = []
+
+    def fake_get_formulary():
+        build_threads.append(threading.current_thread())
+        return built
+
+    monkeypatch.setattr(formulary, "_INDEX", None)
+    monkeypatch.setattr(formulary, "get_formulary", fake_get_formulary)
+
+    assert asyncio.run(formulary.aload_formulary()) is built
+    assert build_threads and build_threads[0] is not threading.current_thread()
@@ -0,0 +1,40 @@
+# tests/test_heuristic_fastpath.py
+import pytest
+
+from app.core.llm_config import HEURISTIC_CONFIDENCE_THRESHOLD
+from app.services.extraction import heuristic_fastpath, simple_extract_meds_scored
+
+def _row(text):
+    _, report = simple_extract_meds_scored(text)
+    assert len(report["lines"]) == 1
+    return report["lines"][0]
+
+@pytest.mark.parametrize("text", [
+    "Paracetamol 500mg OD",
+    "Metformin 500mg twice daily after food",
+    "Atorvastatin 10 mg tablet OD",
+])
+def test_clean_line_takes_fast_path(text):
+    meds, report = heuristic_fastpath(text, HEURISTIC_CONFIDENCE_THRESHOLD)
+    assert meds is not None and len(meds) == 1
+    assert report["lines"][0]["reasons"] == []
+
+@pytest.mark.parametrize("text, reason", [
+    ("Paracetamol 500mg OD and Ibuprofen 400mg", "multiple_strengths"),
+    ("Augmentin 625mg BID x 7 days after food", "duration"),
+    ("Amoxicillin 500mg TID for 5 days", "duration"),
+    ("Azithromycin 500mg OD 3 days", "duration"),
+    ("Pantoprazole 40mg OD review in clinic", "residue"),
+])
+def test_leftover_text_goes_to_llm(text, reason):
+    row = _row(text)
+    assert reason in row["reasons"]
+    assert "residue" in row["reasons"]
+    assert row["score"] < HEURISTIC_CONFIDENCE_THRESHOLD
+    assert heuristic_fastpath(text, HEURISTIC_CONFIDENCE_THRESHOLD)[0] is None
+
+def test_one_unsure_line_sends_whole_text_to_llm():
+    text = "Paracetamol 500mg OD\nAugmentin 625mg BID x 7 days"
+    meds, report = heuristic_fastpath(text, HEURISTIC_CONFIDENCE_THRESHOLD)
+    assert meds is None
+    assert report["min_score"] == 0.0
@@ -0,0 +1,116 @@
+# tests/test_singleflight.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.llm.singleflight import SingleFlight
+
+def _in_threads(*fns):
+    out = [None] * len(fns)
+
+    def run(i, fn):
+        try:
+            out[i] = fn()
+        except BaseException as e:
+            out[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, fn)) for i, fn in enumerate(fns)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02)  # first thread leads
+    for t in threads:
+        t.join()
+    return out
+
+def test_do_shares_one_call():
+    flight, runs = SingleFlight("t"), []
+
+    def work():
+        runs.append(1)
+        time.sleep(0.1)
+        return {"meds": []}
+
+    a, b = _in_threads(lambda: flight.do("k", work, 5), lambda: flight.do("k", work, 5))
+    assert a == b == {"meds": []} and a is not b
+    assert len(runs) == 1 and flight.stats()["coalesced"] == 1
+
+def test_do_follower_waits_at_most_its_budget():
+    flight = SingleFlight("t")
+
+    def slow():
+        time.sleep(0.5)
+        return "late"
+
+    def follower():
+        t0 = time.monotonic()
+        try:
+            return flight.do("k", slow, 0.05)
+        finally:
+            follower.elapsed = time.monotonic() - t0
+
+    # same budget -> same call; the follower gives up after 0.05 s, the leader finishes
+    leader_out, follower_out = _in_threads(lambda: flight.do("k", slow, 0.05), follower)
+    assert leader_out == "late"
+    assert isinstance(follower_out, TimeoutError)
+    assert follower.elapsed < 0.3
+    assert flight.stats()["wait_timeouts"] == 1
+
+def test_do_timeout_is_not_shared_across_budgets():
+    flight, runs = SingleFlight("t"), []
+
+    def work(budget):
+        runs.append(budget)
+        time.sleep(0.1)
+        if budget < 1:
+            raise TimeoutError("short budget ran out")
+        return "ok"
+
+    short, long = _in_threads(lambda: flight.do("k", lambda: work(0.1), 0.1), lambda: flight.do("k", lambda: work(5), 5))
+    assert isinstance(short, TimeoutError)
+    assert long == "ok"
+    assert sorted(runs) == [0.1, 5]
+
+def test_ado_follower_waits_at_most_its_budget():
+    flight = SingleFlight("t")
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return {"plan": 1}
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("k", slow, 0.05))
+        await asyncio.sleep(0.01)
+        t0 = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await flight.ado("k", slow, 0.05)
+        assert time.monotonic() - t0 < 0.2
+        assert await leader == {"plan": 1}  # the leader's call was not cancelled
+
+    asyncio.run(main())
+    assert flight.stats()["wait_timeouts"] == 1
+
+def test_ado_timeout_is_not_shared_across_budgets():
+    flight, runs = SingleFlight("t"), []
+
+    async def work(budget):
+        runs.append(budget)
+        await asyncio.sleep(0.05)
+        if budget < 1:
+            raise TimeoutError("short budget ran out")
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(
+            flight.ado("k", lambda: work(0.1), 0.1),
+            flight.ado("k", lambda: work(5), 5),
+            flight.ado("k", lambda: work(5), 5),
+            return_exceptions=True,
+        )
+
+    short, long1, long2 = asyncio.run(main())
+    assert isinstance(short, TimeoutError)
+    assert long1 == long2 == "ok"
+    assert sorted(runs) == [0.1, 5]
+    assert flight.stats()["shared_errors"] == 0